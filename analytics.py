@@ -0,0 +1,271 @@
+import os, time, hashlib, itertools
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func, cast, Integer, BigInteger
+from core import cache, tz_Minsk
+from models import db, PlayedGame, GameSnapshot, latest_snapshots
+from metrics import cache_requests
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Play-session and heatmap analytics over the owner's snapshot history.
+# Snapshots are loaded once per report, one row per playtime change, as
+# columnar arrays; everything after the query is NumPy, so even a year of
+# two-minute snapshots is computed in milliseconds. The query itself still
+# scans every snapshot in the range: under a second for that year on
+# Postgres, about two on SQLite (benchmarks/bench_analytics.py).
+
+ANALYTICS_DAYS = int(os.getenv("ANALYTICS_DAYS", 90))
+# Play separated by a longer pause starts a new session
+SESSION_GAP = timedelta(minutes=int(os.getenv("SESSION_GAP_MINUTES", 15)))
+ANALYTICS_CACHE_SECONDS = int(os.getenv("ANALYTICS_CACHE_SECONDS", 24 * 60 * 60))
+SESSIONS_LIMIT = 200
+BUCKETS = {"day": 1, "week": 7}
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+DAY = 24 * 60 * 60
+
+def _epoch(column):
+    """SQL expression for a naive UTC timestamp column as Unix seconds."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        return cast(func.extract("epoch", column), BigInteger)
+    return cast(func.strftime("%s", column), Integer)
+
+def _local_offset():
+    # Minsk has kept a fixed offset since 2011, as minsk_day() assumes on SQLite
+    return int(datetime.now(tz_Minsk).utcoffset().total_seconds())
+
+def _iso(seconds):
+    return datetime.fromtimestamp(int(seconds), timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+def _local_date(day):
+    """ISO date of a day number counted from 1970-01-01."""
+    return (datetime(1970, 1, 1) + timedelta(days=int(day))).date().isoformat()
+
+def sync_version(account_id):
+    """Changes whenever a sync adds a snapshot for, or drops a game of, the account; memoized reports key on it."""
+    newest = (
+        select(func.max(GameSnapshot.create_at))
+        .where(GameSnapshot.game_id == PlayedGame.id)
+        .correlate(PlayedGame)
+        .scalar_subquery()
+    )
+    games = select(PlayedGame.id, newest.label("newest")).where(PlayedGame.account_id == account_id).subquery()
+    count, last_game, last_at = db.session.execute(
+        select(func.count(games.c.id), func.max(games.c.id), func.max(games.c.newest))
+    ).one()
+    return f"{count}:{last_game}:{last_at}"
+
+def load_intervals(account_id, since, until=None, appid=None):
+    """Play intervals of the account's games in [since, until) as arrays.
+
+    Snapshots are grouped in SQL into plateaus of equal playtime, so only
+    one row per change leaves the database. Every plateau that grew on the
+    one before closes an interval of that many minutes, assumed to have been
+    played right before its first snapshot (and not before the last snapshot
+    of the previous plateau). Returns {"game", "start", "end", "minutes"}
+    arrays sorted by game and time, with start and end in Unix seconds.
+    """
+    games = select(PlayedGame.id).where(PlayedGame.account_id == account_id)
+    if appid is not None:
+        games = games.where(PlayedGame.appid == appid)
+    game_ids = [game_id for (game_id,) in db.session.execute(games)]
+
+    playtime = func.coalesce(GameSnapshot.playtime_forever, 0)
+    query = (
+        select(
+            GameSnapshot.game_id,
+            playtime,
+            _epoch(func.min(GameSnapshot.create_at)),
+            _epoch(func.max(GameSnapshot.create_at))
+        )
+        .where(GameSnapshot.game_id.in_(game_ids), GameSnapshot.create_at >= since)
+        .group_by(GameSnapshot.game_id, playtime)
+    )
+    if until:
+        query = query.where(GameSnapshot.create_at < until)
+    rows = db.session.execute(query).all()
+    # The last snapshot before the range is each game's starting point
+    baseline = latest_snapshots(game_ids, before=since) if game_ids else {}
+
+    plateaus = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=4 * len(rows)).reshape(-1, 4)
+    if baseline:
+        # Placed at the epoch, so the first interval is bounded by its own minutes only
+        base = np.array([(game_id, playtime, 0, 0) for game_id, playtime in baseline.items()], dtype=np.int64)
+        plateaus = np.concatenate([base, plateaus])
+    plateaus = plateaus[np.lexsort((plateaus[:, 2], plateaus[:, 0]))]
+    game, playtime, first_at, last_at = plateaus.T
+
+    minutes = np.diff(playtime)
+    played = (game[1:] == game[:-1]) & (minutes > 0)
+    end = first_at[1:][played]
+    minutes = minutes[played]
+    return {
+        "game": game[1:][played],
+        "start": np.maximum(last_at[:-1][played], end - minutes * 60),
+        "end": end,
+        "minutes": minutes,
+    }
+
+def sessions(intervals, limit=SESSIONS_LIMIT):
+    """Intervals merged into sessions per game; newest first, with totals over all of them."""
+    game, start, end, minutes = intervals["game"], intervals["start"], intervals["end"], intervals["minutes"]
+    if not len(game):
+        return {"count": 0, "minutes": 0, "average_minutes": 0, "longest": None, "sessions": []}
+
+    new_session = np.ones(len(game), dtype=bool)
+    new_session[1:] = (game[1:] != game[:-1]) | (start[1:] - end[:-1] > SESSION_GAP.total_seconds())
+    first = np.flatnonzero(new_session)
+    session_game = game[first]
+    session_start = start[first]
+    session_end = np.maximum.reduceat(end, first)
+    session_minutes = np.add.reduceat(minutes, first)
+
+    names = _game_names(np.unique(session_game))
+    order = np.argsort(-session_start, kind="stable")
+    longest = int(np.argmax(session_minutes))
+
+    def describe(i):
+        name, appid = names[int(session_game[i])]
+        return {
+            "appid": appid,
+            "name": name,
+            "start": _iso(session_start[i]),
+            "end": _iso(session_end[i]),
+            "minutes": int(session_minutes[i])
+        }
+
+    return {
+        "count": len(first),
+        "minutes": int(session_minutes.sum()),
+        "average_minutes": round(float(session_minutes.mean()), 1),
+        "longest": describe(longest),
+        "sessions": [describe(i) for i in order[:limit]]
+    }
+
+def heatmap(intervals):
+    """Minutes played by Minsk weekday (rows, Monday first) and hour of day (columns)."""
+    local = (intervals["start"] + intervals["end"]) // 2 + _local_offset()
+    # 1970-01-01 was a Thursday
+    weekday = (local // DAY + 3) % 7
+    hour = local % DAY // 3600
+    cells = np.bincount(weekday * 24 + hour, weights=intervals["minutes"], minlength=7 * 24).reshape(7, 24)
+    return {
+        "weekdays": list(WEEKDAYS),
+        "minutes": np.rint(cells).astype(int).tolist(),
+        "busiest": {
+            "weekday": WEEKDAYS[int(cells.sum(axis=1).argmax())],
+            "hour": int(cells.sum(axis=0).argmax())
+        } if cells.any() else None
+    }
+
+def streaks(intervals, today=None):
+    """Runs of consecutive Minsk days with play: the longest, and the one still going (through today or yesterday)."""
+    offset = _local_offset()
+    today = today if today is not None else (int(time.time()) + offset) // DAY
+    days = np.unique(((intervals["start"] + intervals["end"]) // 2 + offset) // DAY)
+    if not len(days):
+        return {"days_played": 0, "current": {"days": 0, "start": None}, "longest": None}
+
+    run_starts = np.flatnonzero(np.r_[True, np.diff(days) != 1])
+    run_lengths = np.diff(np.r_[run_starts, len(days)])
+    longest = int(np.argmax(run_lengths))
+    last_start = run_starts[-1]
+    ongoing = days[-1] >= today - 1
+    return {
+        "days_played": len(days),
+        "current": {
+            "days": int(run_lengths[-1]) if ongoing else 0,
+            "start": _local_date(days[last_start]) if ongoing else None
+        },
+        "longest": {
+            "days": int(run_lengths[longest]),
+            "start": _local_date(days[run_starts[longest]]),
+            "end": _local_date(days[run_starts[longest] + run_lengths[longest] - 1])
+        }
+    }
+
+def trends(intervals, since, until, bucket="day"):
+    """Minutes per game per Minsk day or week over the range, with each game's least-squares slope."""
+    offset = _local_offset()
+    width = BUCKETS[bucket] * DAY
+    first_day = (int(since.replace(tzinfo=timezone.utc).timestamp()) + offset) // DAY
+    if bucket == "week":
+        # Weeks start on Monday
+        first_day -= (first_day + 3) % 7
+    origin = first_day * DAY
+    end = int((until or datetime.utcnow()).replace(tzinfo=timezone.utc).timestamp()) + offset
+    count = max(1, -(-(end - origin) // width))
+
+    game_ids, game_index = np.unique(intervals["game"], return_inverse=True)
+    bucket_index = ((intervals["start"] + intervals["end"]) // 2 + offset - origin) // width
+    inside = (bucket_index >= 0) & (bucket_index < count)
+    totals = np.bincount(
+        game_index[inside] * count + bucket_index[inside],
+        weights=intervals["minutes"][inside],
+        minlength=len(game_ids) * count
+    ).reshape(len(game_ids), count)
+
+    x = np.arange(count) - (count - 1) / 2
+    slopes = totals @ x / (x @ x) if count > 1 else np.zeros(len(game_ids))
+    names = _game_names(game_ids)
+    order = np.argsort(-totals.sum(axis=1), kind="stable")
+    return {
+        "bucket": bucket,
+        "buckets": [_local_date(first_day + i * BUCKETS[bucket]) for i in range(count)],
+        "games": [
+            {
+                "appid": names[int(game_ids[i])][1],
+                "name": names[int(game_ids[i])][0],
+                "minutes": int(totals[i].sum()),
+                "series": np.rint(totals[i]).astype(int).tolist(),
+                # Change in minutes per bucket from one bucket to the next
+                "slope": round(float(slopes[i]), 2)
+            }
+            for i in order
+        ]
+    }
+
+def _game_names(game_ids):
+    return {
+        game_id: (name, appid) for game_id, name, appid in
+        db.session.query(PlayedGame.id, PlayedGame.name, PlayedGame.appid)
+        .filter(PlayedGame.id.in_([int(g) for g in game_ids]))
+    }
+
+REPORTS = ("sessions", "heatmap", "streaks", "trends")
+
+def report(name, account_id, since=None, until=None, appid=None, bucket="day", limit=SESSIONS_LIMIT):
+    """The named report (see REPORTS) over [since, until), memoized until the account syncs again.
+
+    since defaults to the start of the UTC day ANALYTICS_DAYS ago, until to no bound.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    if since is None:
+        since = datetime.combine(datetime.utcnow().date() - timedelta(days=ANALYTICS_DAYS), datetime.min.time())
+    if until is not None and until <= since:
+        raise ValueError("until must be after since")
+
+    # Streaks and open-ended trends also depend on what day it is
+    params = (name, account_id, since, until, appid, bucket, limit, datetime.utcnow().date())
+    key = "analytics:" + hashlib.sha1(repr((sync_version(account_id), params)).encode()).hexdigest()
+    value = cache.get(key)
+    if value is not None:
+        cache_requests.inc(cache="analytics", result="hit")
+        return value
+    cache_requests.inc(cache="analytics", result="miss")
+
+    intervals = load_intervals(account_id, since, until, appid)
+    if name == "sessions":
+        body = sessions(intervals, limit)
+    elif name == "heatmap":
+        body = heatmap(intervals)
+    elif name == "streaks":
+        body = streaks(intervals)
+    else:
+        body = trends(intervals, since, until, bucket)
+    value = {"since": since.isoformat() + "Z", "until": until.isoformat() + "Z" if until else None, **body}
+    cache.set(key, value, timeout=ANALYTICS_CACHE_SECONDS)
+    return value
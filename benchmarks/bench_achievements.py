@@ -0,0 +1,143 @@
+"""Steam calls made by the achievements refresh as playtime changes.
+
+    python -m benchmarks.bench_achievements [accounts] [games]
+
+Seeds accounts that all own the same games, half of which have
+achievements in the mock Steam API, then runs refresh_achievements until
+nothing is pending after each step: a cold start, an unchanged library,
+one game of one account gaining playtime, and every game gaining playtime.
+Reports Steam calls per step and the time the /api/achievements payload takes, and
+exits non-zero when an unchanged library still costs a call or a single
+game costs more than one. Last, the achievements of more than a batch of
+games keep failing while every game gains playtime; every other game must
+still be refreshed.
+"""
+import os, sys, time, logging, statistics
+
+accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+games = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+from benchmarks.mock_steam import MockSteam, friend_steamid
+
+steam = MockSteam(games=games).start()
+os.environ["STEAM_API_BASE"] = steam.base_url
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["STEAM_ID"] = friend_steamid(0)
+os.environ["CACHE_TYPE"] = "SimpleCache"
+os.environ.setdefault("STEAM_RATE_BURST", "100000")
+
+import tasks
+from main import app
+from payloads import achievement_progress
+from models import db, PlayedGame, PlayerAchievement, TrackedAccount, ensure_accounts
+
+logging.getLogger().setLevel(logging.WARNING)
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    ids = ensure_accounts([friend_steamid(i) for i in range(accounts)])
+    db.session.execute(PlayedGame.__table__.insert(), [
+        {"account_id": account_id, "name": f"Game {g}", "appid": 200000 + g,
+         "play_time_2weeks": 0, "playtime_forever": 100 * (g + 1)}
+        for account_id in ids.values()
+        for g in range(games)
+    ])
+    db.session.commit()
+    for i in range(accounts):
+        for g in range(0, games, steam.achievements_every):
+            appid = 200000 + g
+            steam.unlocked[(friend_steamid(i), appid)] = {
+                name: 1767225600 + n * 3600 for n, name in enumerate(steam.achievement_names(appid)[:i + g % 7])
+            }
+
+def refresh():
+    """Run until nothing is pending; Steam calls and wall time of the whole step."""
+    steam.calls.clear()
+    started = time.perf_counter()
+    runs = 0
+    while tasks.refresh_achievements()["pending"]:
+        runs += 1
+    return sum(steam.calls.values()), dict(steam.calls), runs, (time.perf_counter() - started) * 1000
+
+def failing_games():
+    """More than a batch of games whose achievements cannot be fetched; the runs until every other game is refreshed."""
+    with_achievements = list(range(0, games, steam.achievements_every))
+    for i in range(tasks.ACHIEVEMENTS_BATCH // len(with_achievements) + 1):
+        steam.failing.update((friend_steamid(i), 200000 + g) for g in with_achievements)
+    play(PlayedGame.id.isnot(None))
+    failing = {
+        game_id for game_id, steamid, appid in
+        db.session.query(PlayedGame.id, TrackedAccount.steamid, PlayedGame.appid)
+        .join(TrackedAccount, PlayedGame.account_id == TrackedAccount.id)
+        if (steamid, appid) in steam.failing
+    }
+    # The failures are deliberate
+    logging.getLogger("tasks").setLevel(logging.ERROR)
+    # Enough runs for every game once, and every failing game once more
+    limit = (accounts * games + len(failing)) // tasks.ACHIEVEMENTS_BATCH + 2
+    for runs in range(1, limit + 1):
+        tasks.refresh_achievements()
+        waiting = [
+            game_id for (game_id,) in db.session.query(PlayedGame.id).filter(
+                PlayedGame.achievements_playtime.is_(None)
+                | (PlayedGame.achievements_playtime != PlayedGame.playtime_forever)
+            )
+            if game_id not in failing
+        ]
+        if not waiting:
+            return len(failing), runs, 0
+    return len(failing), limit, len(waiting)
+
+def play(filter_):
+    PlayedGame.query.filter(filter_).update({"playtime_forever": PlayedGame.playtime_forever + 30})
+    db.session.commit()
+
+def main():
+    problems = []
+    with app.app_context():
+        seed()
+        client = app.test_client()
+        print(f"{accounts} accounts x {games} games, {len(range(0, games, steam.achievements_every))} with achievements")
+        first_game = db.session.query(PlayedGame.id).order_by(PlayedGame.id).limit(1).scalar()
+        steps = (
+            ("cold start", None),
+            ("unchanged library", None),
+            ("one game played", PlayedGame.id == first_game),
+            ("every game played", PlayedGame.id.isnot(None)),
+        )
+        for label, played in steps:
+            if played is not None:
+                play(played)
+            calls, by_endpoint, runs, ms = refresh()
+            detail = ", ".join(f"{n} {c}" for n, c in sorted(by_endpoint.items())) or "none"
+            print(f"  {label:<18} {calls:5d} Steam calls ({detail}) in {runs} runs, {ms:8.1f} ms")
+            if label == "unchanged library" and calls:
+                problems.append(f"{label} made {calls} Steam calls")
+            if label == "one game played" and calls > 1:
+                problems.append(f"{label} made {calls} Steam calls")
+
+        samples = []
+        for _ in range(5):
+            started = time.perf_counter()
+            body = achievement_progress()
+            samples.append((time.perf_counter() - started) * 1000)
+            db.session.rollback()
+        assert client.get("/api/achievements").get_json()["unlocked"] == body["unlocked"]
+        print(
+            f"  /api/achievements payload median {statistics.median(samples):.1f} ms: "
+            f"{body['unlocked']}/{body['total']} over {len(body['games'])} games, "
+            f"{PlayerAchievement.query.count()} unlocks stored for all accounts"
+        )
+        failing, runs, waiting = failing_games()
+        print(f"  {failing} games failing (batch {tasks.ACHIEVEMENTS_BATCH}): "
+              f"{waiting} other games still pending after {runs} runs")
+        if waiting:
+            problems.append(f"{waiting} games never refreshed behind {failing} failing ones")
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
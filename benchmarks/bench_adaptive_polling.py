@@ -0,0 +1,189 @@
+"""Fixed against adaptive polling over a simulated play schedule.
+
+    python -m benchmarks.bench_adaptive_polling [accounts] [days]
+
+Each account gets a seeded schedule of gaming sessions, most of them with
+some idle online time around them; the last account plays while appearing
+offline (invisible), so neither its presence nor its lastlogoff changes.
+The poller runs once per simulated minute against a mock Steam API whose
+presence and playtime follow the schedule. Presence is checked for every
+account each POLL_PRESENCE_INTERVAL, so visible sessions show up within a
+check; the invisible account's first session only shows up at a backed-off
+game fetch, later ones on the fixed schedule it is moved to. Every game
+starts with earlier play in its playtime_2weeks, which the mock lets
+shrink as the window moves on; that must not get a visible account marked
+hidden, and the run exits non-zero if it does.
+
+Reports Steam calls and polls avoided per day, snapshot rows written, and
+how long after a session started or ended the stored playtime first showed
+it (start lag: first snapshot with more playtime; end lag: first snapshot
+with the session's final playtime).
+"""
+import os, sys, random, logging, statistics, tempfile
+from datetime import datetime, timedelta
+
+accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+days = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+from benchmarks.mock_steam import MockSteam, friend_steamid
+
+steam = MockSteam(games=3).start()
+os.environ["STEAM_API_BASE"] = steam.base_url
+os.environ["IMAGE_CDN_BASE"] = steam.base_url
+os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="steam_tracker_bench_images")
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["STEAM_ID"] = friend_steamid(0)
+os.environ["CACHE_TYPE"] = "SimpleCache"
+os.environ.setdefault("STEAM_RATE_BURST", "100000")
+
+import tasks
+from core import app
+from models import db, TrackedAccount, PlayedGame, GameSnapshot, ensure_accounts, poll_offset
+from push import pusher
+
+logging.getLogger().setLevel(logging.WARNING)
+pusher.queue = lambda body: None
+pusher.flush = lambda: None
+
+START = datetime(2026, 1, 5)
+TICK = timedelta(minutes=1)
+GAMES = 3
+# Minutes of each game played in the two weeks before START
+EARLIER_2WEEKS = 600
+
+def schedule(i, rng):
+    """[(online_from, start, end, online_until, game)] per day, in minutes since START."""
+    sessions = []
+    for day in range(days):
+        minute = day * 1440 + rng.randint(7 * 60, 12 * 60)
+        for _ in range(rng.choice((0, 1, 1, 2, 3))):
+            online = rng.choice((0, 5, 15, 30))
+            start = minute + rng.randint(30, 240) + online
+            end = start + rng.randint(20, 180)
+            until = end + rng.choice((0, 5, 20))
+            if until >= (day + 1) * 1440 + 120:
+                break
+            sessions.append((start - online, start, end, until, rng.randrange(GAMES)))
+            minute = until
+    return sessions
+
+def simulate(adaptive):
+    tasks.POLL_ADAPTIVE = adaptive
+    steamids = [friend_steamid(i) for i in range(accounts)]
+    invisible = steamids[-1]
+    rng = random.Random(7)
+    plans = {sid: schedule(i, rng) for i, sid in enumerate(steamids)}
+    playtime = {sid: [1000 * (g + 1) for g in range(GAMES)] for sid in steamids}
+
+    db.drop_all()
+    db.create_all()
+    ids = ensure_accounts(steamids)
+    for sid, account_id in ids.items():
+        TrackedAccount.query.filter_by(id=account_id).update(
+            {"next_poll_at": START + poll_offset(sid, tasks.POLL_INTERVAL)}
+        )
+    db.session.commit()
+    steam.calls.clear()
+    # The mock's two-week window moves with the simulated time
+    steam.epoch = START.timestamp()
+    steam.clock = lambda: now.timestamp()
+
+    totals, wrongly_hidden = {"avoided": 0}, set()
+    for minute in range(days * 1440):
+        now = START + minute * TICK
+        for sid in steamids:
+            state, game, logoff = "offline", None, 0
+            for online_from, start, end, until, g in plans[sid]:
+                if start <= minute < end:
+                    state, game = "in_game", g
+                elif online_from <= minute < until:
+                    state = "online"
+                if until <= minute:
+                    logoff = int((START + until * TICK).timestamp())
+            if game is not None:
+                playtime[sid][game] += 1
+            if sid == invisible:
+                steam.presence[sid] = {"personastate": 0}
+            else:
+                steam.presence[sid] = {"personastate": 0 if state == "offline" else 1, "lastlogoff": logoff}
+                if game is not None:
+                    steam.presence[sid]["gameid"] = str(200000 + game)
+            steam.account_games[sid] = [
+                {"appid": 200000 + g, "name": f"Game {g}",
+                 "playtime_2weeks": EARLIER_2WEEKS + playtime[sid][g] - 1000 * (g + 1),
+                 "playtime_forever": playtime[sid][g]}
+                for g in range(GAMES)
+            ]
+        result = tasks.poll_due_accounts(now=now)
+        totals["avoided"] += result.get("avoided", 0)
+        wrongly_hidden.update(
+            sid for (sid,) in db.session.query(TrackedAccount.steamid).filter(TrackedAccount.presence == "hidden")
+            if sid != invisible
+        )
+
+    # Detection lags from the snapshots each session produced
+    start_lags, end_lags, missed = {True: [], False: []}, {True: [], False: []}, 0
+    for sid in steamids:
+        visible = sid != invisible
+        account_id = ids[sid]
+        before = [1000 * (g + 1) for g in range(GAMES)]
+        for online_from, start, end, until, g in plans[sid]:
+            played_before = before[g]
+            played_after = played_before + (end - start)
+            before[g] = played_after
+            snapshots = (
+                db.session.query(GameSnapshot.create_at, GameSnapshot.playtime_forever)
+                .join(PlayedGame, GameSnapshot.game_id == PlayedGame.id)
+                .filter(PlayedGame.account_id == account_id, PlayedGame.name == f"Game {g}")
+                .order_by(GameSnapshot.create_at)
+                .all()
+            )
+            first_more = next((t for t, p in snapshots if p > played_before), None)
+            first_final = next((t for t, p in snapshots if p >= played_after), None)
+            if first_more is None or first_final is None:
+                missed += 1
+                continue
+            start_lags[visible].append((first_more - (START + start * TICK)).total_seconds() / 60)
+            end_lags[visible].append((first_final - (START + end * TICK)).total_seconds() / 60)
+    sessions = sum(len(p) for p in plans.values())
+    return {
+        "recent_games_calls": steam.calls["GetRecentlyPlayedGames"] / days,
+        "summaries_calls": steam.calls["GetPlayerSummaries"] / days,
+        "avoided": totals["avoided"] / days,
+        "snapshots": GameSnapshot.query.count(),
+        "sessions": sessions,
+        "missed": missed,
+        "wrongly_hidden": len(wrongly_hidden),
+        "lags": {
+            visible: (summary(start_lags[visible]), summary(end_lags[visible]))
+            for visible in (True, False)
+        },
+    }
+
+def summary(lags):
+    return f"{statistics.mean(lags):4.1f}/{max(lags):3.0f}" if lags else "   -/  -"
+
+def main():
+    problems = []
+    print(f"{accounts} accounts over {days} simulated days, polled every simulated minute")
+    with app.app_context():
+        for label, adaptive in (("fixed 15 min", False), ("adaptive", True)):
+            r = simulate(adaptive)
+            print(
+                f"  {label:<13} per day: {r['recent_games_calls']:6.0f} GetRecentlyPlayedGames "
+                f"{r['summaries_calls']:5.0f} GetPlayerSummaries {r['avoided']:6.0f} polls avoided | "
+                f"{r['snapshots']} snapshots | {r['sessions']} sessions"
+                f"{', ' + str(r['missed']) + ' missed' if r['missed'] else ''}"
+            )
+            for visible, name in ((True, "visible"), (False, "invisible")):
+                start, end = r["lags"][visible]
+                print(f"    {name:<10} lag (mean/max min): session start {start}, session end {end}")
+            if r["wrongly_hidden"]:
+                problems.append(f"{label}: {r['wrongly_hidden']} visible accounts were marked hidden")
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
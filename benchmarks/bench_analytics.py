@@ -0,0 +1,166 @@
+"""Analytics over a year of two-minute snapshots.
+
+    python -m benchmarks.bench_analytics [games] [days]
+
+Seeds a snapshot every two minutes for every game over `days` days, with
+playtime growing only inside randomly placed sessions, then times loading
+the year as arrays and computing sessions, the heatmap, streaks and daily
+and weekly trends from them. On Postgres, loading plus every computation
+must stay under MAX_SECONDS. On SQLite only the computation is held to it:
+loading is a scan of every snapshot in the range, about 1.8 s there for
+the default year against 0.8 s on Postgres. The run exits non-zero when
+the limit is exceeded or the seeded sessions are not found again. Each
+/api/analytics report is then timed uncached (load and compute) and
+memoized.
+
+DATABASE_URL defaults to a SQLite file; point it at a scratch Postgres
+database (every table is dropped) for the full check.
+"""
+import os, sys, time, logging, tempfile, statistics
+from datetime import datetime, timedelta
+
+games = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "steam_tracker_bench_analytics.sqlite3")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("STEAM_ID", "76561197960287930")
+os.environ["CACHE_TYPE"] = "SimpleCache"
+
+import numpy as np
+from sqlalchemy import text
+from flask_migrate import upgrade
+import analytics
+from core import cache
+from main import app
+from models import db, PlayedGame, GameSnapshot, ensure_accounts
+
+logging.getLogger().setLevel(logging.WARNING)
+logging.getLogger("alembic").setLevel(logging.WARNING)
+
+MAX_SECONDS = 1.0
+START = datetime(2025, 10, 1)
+TICK = 2  # minutes between snapshots
+TICKS_PER_DAY = 24 * 60 // TICK
+
+def reset():
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(text("DROP SCHEMA public CASCADE"))
+        db.session.execute(text("CREATE SCHEMA public"))
+        db.session.commit()
+    else:
+        db.engine.dispose()
+        if os.path.exists(DB_PATH):
+            os.remove(DB_PATH)
+
+def play_schedule(rng):
+    """Per game, a boolean per tick of whether it was being played, and the number of sessions placed."""
+    ticks = days * TICKS_PER_DAY
+    playing, placed = np.zeros((games, ticks), dtype=bool), 0
+    for g in range(games):
+        for day in range(days):
+            # At most one session per game a day, so sessions never merge across the gap
+            if rng.random() < 0.5:
+                start = day * TICKS_PER_DAY + rng.integers(1, TICKS_PER_DAY - 100)
+                playing[g, start:start + rng.integers(5, 90)] = True
+                placed += 1
+    return playing, placed
+
+def seed(playing):
+    account_id = ensure_accounts([os.environ["STEAM_ID"]])[os.environ["STEAM_ID"]]
+    db.session.execute(PlayedGame.__table__.insert(), [
+        {"id": g + 1, "account_id": account_id, "name": f"Game {g}", "appid": 300000 + g,
+         "play_time_2weeks": 0, "playtime_forever": 0}
+        for g in range(games)
+    ])
+    playtime = np.cumsum(playing * TICK, axis=1) + 1000
+    stamps = [START + timedelta(minutes=TICK * i) for i in range(playing.shape[1])]
+    batch = []
+    for g in range(games):
+        for at, minutes in zip(stamps, playtime[g].tolist()):
+            batch.append({"game_id": g + 1, "playtime_forever": minutes, "create_at": at})
+            if len(batch) >= 50000:
+                db.session.execute(GameSnapshot.__table__.insert(), batch)
+                batch = []
+    if batch:
+        db.session.execute(GameSnapshot.__table__.insert(), batch)
+    db.session.commit()
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+def timed(fn, repeat=5):
+    """(median seconds, last result) of repeat calls."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+def main():
+    problems = []
+    playing, placed = play_schedule(np.random.default_rng(0))
+    until = START + timedelta(days=days)
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        reset()
+        upgrade()
+        started = time.perf_counter()
+        seed(playing)
+        total = playing.size
+        print(f"Seeded {total} snapshots ({games} games x {days} days every {TICK} min) "
+              f"on {dialect} in {time.perf_counter() - started:.0f}s")
+        account_id = ensure_accounts([os.environ["STEAM_ID"]])[os.environ["STEAM_ID"]]
+
+        load_seconds, intervals = timed(lambda: analytics.load_intervals(account_id, START, until), repeat=3)
+        print(f"  load_intervals {len(intervals['game']):>8} intervals in {load_seconds * 1000:7.1f} ms median")
+
+        computations = {
+            "sessions": lambda: analytics.sessions(intervals),
+            "heatmap": lambda: analytics.heatmap(intervals),
+            "streaks": lambda: analytics.streaks(intervals),
+            "trends (day)": lambda: analytics.trends(intervals, START, until, "day"),
+            "trends (week)": lambda: analytics.trends(intervals, START, until, "week"),
+        }
+        compute_seconds, results = 0, {}
+        for label, fn in computations.items():
+            seconds, results[label] = timed(fn)
+            compute_seconds += seconds
+            print(f"  {label:<14} {seconds * 1000:7.1f} ms median")
+        total_seconds = load_seconds + compute_seconds
+        timed_seconds = total_seconds if dialect == "postgresql" else compute_seconds
+        print(f"  loading and computing every report took {total_seconds * 1000:.1f} ms, "
+              f"{load_seconds * 1000:.1f} ms of it loading "
+              f"(limit {MAX_SECONDS * 1000:.0f} ms on {'both' if dialect == 'postgresql' else 'computing only'})")
+        if timed_seconds > MAX_SECONDS:
+            what = "loading and computing" if dialect == "postgresql" else "computing"
+            problems.append(f"{what} the reports took {timed_seconds:.2f}s")
+
+        found = results["sessions"]["count"]
+        played = int(playing.sum()) * TICK
+        if found != placed or results["sessions"]["minutes"] != played:
+            problems.append(f"found {found} sessions and {results['sessions']['minutes']} minutes, "
+                            f"seeded {placed} and {played}")
+        if sum(map(sum, results["heatmap"]["minutes"])) != played:
+            problems.append("heatmap minutes do not add up to the minutes played")
+
+        client = app.test_client()
+        query = f"since={START.date()}&until={(until - timedelta(days=1)).date()}"
+        for name in analytics.REPORTS:
+            cache.clear()
+            started = time.perf_counter()
+            response = client.get(f"/api/analytics/{name}?{query}")
+            uncached = time.perf_counter() - started
+            memoized, _ = timed(lambda: client.get(f"/api/analytics/{name}?{query}"))
+            print(f"  /api/analytics/{name:<9} {response.status_code} | uncached {uncached * 1000:7.1f} ms, "
+                  f"memoized {memoized * 1000:5.2f} ms median")
+            if response.status_code != 200:
+                problems.append(f"/api/analytics/{name} answered {response.status_code}")
+
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Memory of streaming the snapshot export over a large seeded table.
+
+    python -m benchmarks.bench_export [rows] [games]
+
+Seeds game_snapshots, then exports every row through /api/export/snapshots
+(CSV and NDJSON) and `flask export` to /dev/null, sampling this process's
+resident memory as the body streams. The export must stay flat: the run
+exits non-zero when RSS grows by more than ALLOWED_GROWTH_MB between the
+first tenth of the rows and the end. Loading the same rows with .all(), as
+a naive endpoint would, is measured last for comparison.
+
+DATABASE_URL defaults to a SQLite file; point it at a scratch Postgres
+database (every table is dropped) to measure server-side cursors.
+"""
+import os, sys, time, logging, resource, tempfile
+from datetime import datetime, timedelta
+
+rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+games = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "steam_tracker_bench_export.sqlite3")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("STEAM_ID", "76561197960287930")
+os.environ["CACHE_TYPE"] = "SimpleCache"
+
+from sqlalchemy import text
+from flask_migrate import upgrade
+from main import app
+from models import db, PlayedGame, GameSnapshot, ensure_accounts
+from export import snapshots_query
+
+logging.getLogger().setLevel(logging.WARNING)
+logging.getLogger("alembic").setLevel(logging.WARNING)
+
+ALLOWED_GROWTH_MB = 20
+START = datetime(2025, 10, 1)
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+def reset():
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(text("DROP SCHEMA public CASCADE"))
+        db.session.execute(text("CREATE SCHEMA public"))
+        db.session.commit()
+    else:
+        db.engine.dispose()
+        if os.path.exists(DB_PATH):
+            os.remove(DB_PATH)
+
+def seed():
+    account_id = ensure_accounts([os.environ["STEAM_ID"]])[os.environ["STEAM_ID"]]
+    db.session.execute(PlayedGame.__table__.insert(), [
+        {"id": g + 1, "account_id": account_id, "name": f"Game {g}", "appid": 300000 + g,
+         "play_time_2weeks": 0, "playtime_forever": 0}
+        for g in range(games)
+    ])
+    step = timedelta(days=365) / (rows // games)
+    batch = []
+    for i in range(rows // games):
+        at = START + step * i
+        for g in range(games):
+            batch.append({"game_id": g + 1, "playtime_forever": i * (g + 1), "create_at": at})
+        if len(batch) >= 50000:
+            db.session.execute(GameSnapshot.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(GameSnapshot.__table__.insert(), batch)
+    db.session.commit()
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+def watch(chunks, total):
+    """Consume chunks, sampling RSS; (rows, bytes, seconds, rss after a tenth, peak rss, rss at the end)."""
+    started = time.perf_counter()
+    seen, sent, early, peak = 0, 0, None, 0
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode()
+        seen += chunk.count("\n")
+        sent += len(chunk)
+        if seen >= total // 10:
+            rss = rss_mb()
+            early = early or rss
+            peak = max(peak, rss)
+    return seen, sent, time.perf_counter() - started, early, peak, rss_mb()
+
+def report(label, result, problems):
+    seen, sent, seconds, early, peak, end = result
+    growth = peak - early
+    print(
+        f"  {label:<22} {seen:>9} lines {sent / 1024 / 1024:7.1f} MB in {seconds:5.1f}s "
+        f"({seen / seconds:8.0f} rows/s) | RSS {early:6.1f} MB after a tenth, peak {peak:6.1f}, end {end:6.1f} "
+        f"(+{growth:.1f} MB)"
+    )
+    if growth > ALLOWED_GROWTH_MB:
+        problems.append(f"{label}: RSS grew {growth:.1f} MB while streaming")
+
+def main():
+    problems = []
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        reset()
+        upgrade()
+        started = time.perf_counter()
+        seed()
+        total = rows // games * games
+        print(f"Seeded {total} snapshots for {games} games on {dialect} in {time.perf_counter() - started:.0f}s")
+        db.session.close()
+        print(f"RSS before exporting {rss_mb():.1f} MB")
+
+        client = app.test_client()
+        for fmt in ("csv", "ndjson"):
+            response = client.get(f"/api/export/snapshots?format={fmt}", buffered=False)
+            try:
+                report(f"/api/export ({fmt})", watch(response.iter_encoded(), total), problems)
+            finally:
+                response.close()
+
+        runner = app.test_cli_runner()
+        started = time.perf_counter()
+        early = rss_mb()
+        result = runner.invoke(args=["export", "snapshots", "--output", os.devnull])
+        seconds = time.perf_counter() - started
+        end = rss_mb()
+        # Nothing so far went higher than the streams above, so the lifetime peak is this export's
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        if result.exit_code:
+            problems.append(f"flask export failed: {result.output}")
+        print(
+            f"  {'flask export (csv)':<22} {total:>9} rows to /dev/null in {seconds:5.1f}s | "
+            f"RSS {early:6.1f} MB before, peak {peak:6.1f}, end {end:6.1f}"
+        )
+        if peak - early > ALLOWED_GROWTH_MB:
+            problems.append(f"flask export: RSS grew {peak - early:.1f} MB")
+
+        started = time.perf_counter()
+        before = rss_mb()
+        loaded = db.session.execute(snapshots_query()).all()
+        print(
+            f"  {'naive .all()':<22} {len(loaded):>9} rows in memory after {time.perf_counter() - started:5.1f}s | "
+            f"RSS {before:6.1f} -> {rss_mb():6.1f} MB"
+        )
+
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
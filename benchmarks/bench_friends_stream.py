@@ -0,0 +1,95 @@
+"""Friends activity latency with 200 mocked friends, a few of them slow.
+
+    python -m benchmarks.bench_friends_stream [friends] [latency_seconds] [slow_friends]
+
+Compares the former per-call ThreadPoolExecutor(15) fan-out with the
+background refresh job and the table-backed /api/friends/activity, and shows
+when the streaming endpoint delivers its first line, most friends and its
+last line when every friend is stale.
+"""
+import os, sys, time, json, logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+friends = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+slow = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+SLOW_SECONDS = 4
+
+from benchmarks.mock_steam import MockSteam, friend_steamid
+
+steam_mock = MockSteam(
+    friends=friends, latency=latency, jitter=latency,
+    delays={friend_steamid(i): SLOW_SECONDS for i in range(slow)}
+).start()
+os.environ["STEAM_API_BASE"] = steam_mock.base_url
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ.setdefault("STEAM_ID", "76561197960287930")
+os.environ["CACHE_TYPE"] = "SimpleCache"
+os.environ.setdefault("STEAM_RATE_BURST", "100000")
+os.environ.setdefault("STEAM_POOL_SIZE", "32")
+
+from main import app, swr
+from tasks import update_friends, refresh_friend_playtime
+from models import db, Friend
+from steam_client import steam, SteamAPIError
+
+logging.disable(logging.INFO)
+
+def thread_pool_fan_out(steamids):
+    """What get_steam_playtime_batch did before: a new 15-thread pool per call."""
+    def fetch_one(steamid):
+        try:
+            return steamid, sum(g.get("playtime_2weeks", 0) for g in steam.recently_played_games(steamid))
+        except SteamAPIError:
+            return steamid, None
+    with ThreadPoolExecutor(max_workers=15) as executor:
+        return dict(executor.map(fetch_one, steamids))
+
+def main():
+    print(f"{friends} friends, {latency * 1000:.0f}-{latency * 2000:.0f} ms Steam latency, {slow} friends at +{SLOW_SECONDS}s")
+    with app.app_context():
+        db.create_all()
+        update_friends()
+        steamids = [friend_steamid(i) for i in range(friends)] + [os.environ["STEAM_ID"]]
+
+        started = time.perf_counter()
+        thread_pool_fan_out(steamids)
+        print(f"  thread pool fan-out (old)      {time.perf_counter() - started:6.2f}s until any response")
+
+        Friend.query.update({"next_playtime_at": datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        started = time.perf_counter()
+        refresh_friend_playtime()
+        print(f"  refresh job, all friends due   {time.perf_counter() - started:6.2f}s in the background")
+
+        started = time.perf_counter()
+        swr.refresh("friends-activity")
+        print(f"  /api/friends/activity          {time.perf_counter() - started:6.2f}s until any response")
+
+        # Every friend stale: the stream answers from the table, then refreshes live
+        Friend.query.update({"playtime_updated_at": None}, synchronize_session=False)
+        db.session.commit()
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.get("/api/friends/activity/stream", buffered=False)
+        marks, friend_lines = {}, 0
+        for chunk in response.response:
+            message = json.loads(chunk)
+            elapsed = time.perf_counter() - started
+            if message["type"] == "snapshot":
+                marks["first line (cached hours)"] = elapsed
+            elif message["type"] == "friend":
+                friend_lines += 1
+                if friend_lines == int(friends * 0.5):
+                    marks["50% of friends refreshed"] = elapsed
+                if friend_lines == int(friends * 0.95):
+                    marks["95% of friends refreshed"] = elapsed
+            elif message["type"] == "done":
+                marks[f"done ({len(message['missing'])} missing)"] = elapsed
+        response.close()
+        for label, elapsed in marks.items():
+            print(f"  stream: {label:<26} {elapsed:6.2f}s")
+
+if __name__ == "__main__":
+    main()
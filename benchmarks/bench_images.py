@@ -0,0 +1,167 @@
+"""Image proxy against a local stand-in for the Steam CDN.
+
+    python -m benchmarks.bench_images [covers] [avatars] [cdn latency]
+
+Serves covers and friend avatars through /img/<kind>/<id> from an empty
+cache, then again from a warm one, and reports bytes sent against the
+CDN originals, latencies, and how often the CDN was asked. Also checks that
+concurrent first requests fetch once, that ETag revalidation answers 304,
+that covers of newly synced games are queued for and prefetched by the web
+process, and that a capped cache stays under its cap. Exits non-zero when
+one of those does not hold.
+"""
+import os, sys, time, logging, tempfile, statistics
+from concurrent.futures import ThreadPoolExecutor
+
+covers = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+avatars = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+
+from benchmarks.mock_steam import MockSteam, friend_steamid
+
+steam = MockSteam(games=0, latency=latency).start()
+os.environ["STEAM_API_BASE"] = steam.base_url
+os.environ["IMAGE_CDN_BASE"] = steam.base_url
+os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="steam_tracker_bench_images")
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["STEAM_ID"] = friend_steamid(0)
+os.environ["CACHE_TYPE"] = "SimpleCache"
+
+import images, tasks
+from main import app
+from job_queue import QueueWorker, WEB_KINDS
+from models import db, Friend
+from push import pusher
+
+logging.getLogger().setLevel(logging.WARNING)
+pusher.queue = lambda body: None
+pusher.flush = lambda: None
+
+APPIDS = [300000 + i for i in range(covers)]
+FRIENDS = [friend_steamid(1000 + i) for i in range(avatars)]
+
+def seed():
+    db.create_all()
+    db.session.add_all([
+        Friend(steamid=sid, personaname=f"Friend {i}", avatar=f"{steam.base_url}avatars/{sid}.jpg")
+        for i, sid in enumerate(FRIENDS)
+    ])
+    db.session.commit()
+    # Generated up front so the first requests time the proxy, not the mock
+    for appid in APPIDS + [400000 + i for i in range(5)]:
+        steam.image(f"/steam/apps/{appid}/library_hero.jpg")
+    for sid in FRIENDS:
+        steam.image(f"/avatars/{sid}.jpg")
+
+def serve(client, paths):
+    """(median ms, bytes sent, responses) of one GET per path."""
+    samples, sent, responses = [], 0, []
+    for path in paths:
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        sent += len(response.data)
+        responses.append(response)
+    return statistics.median(samples), sent, responses
+
+def main():
+    problems = []
+    with app.app_context():
+        seed()
+        client = app.test_client()
+        kinds = {
+            "cover": ([images.image_path("cover", a) for a in APPIDS],
+                      sum(len(steam.image(f"/steam/apps/{a}/library_hero.jpg")) for a in APPIDS)),
+            "avatar": ([images.image_path("avatar", s) for s in FRIENDS],
+                       sum(len(steam.image(f"/avatars/{s}.jpg")) for s in FRIENDS)),
+        }
+        print(f"{covers} covers and {avatars} avatars, CDN latency {latency * 1000:.0f} ms")
+        for kind, (paths, original) in kinds.items():
+            steam.calls.clear()
+            cold_ms, sent, responses = serve(client, paths)
+            cold_calls = steam.calls["image"]
+            warm_ms, _, _ = serve(client, paths)
+            revalidated = sum(
+                client.get(path, headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
+                for path, r in zip(paths, responses)
+            )
+            failed = [r.status_code for r in responses if r.status_code != 200]
+            print(
+                f"  {kind:<7} {original / len(paths) / 1024:7.1f} KB from the CDN -> "
+                f"{sent / len(paths) / 1024:6.1f} KB {responses[0].mimetype} ({100 * sent / original:4.1f}%) | "
+                f"first {cold_ms:6.1f} ms, cached {warm_ms:5.2f} ms median | {steam.calls['image']} CDN fetches | "
+                f"{revalidated}/{len(paths)} revalidated with 304 | {responses[0].headers['Cache-Control']}"
+            )
+            if failed:
+                problems.append(f"{kind}: {len(failed)} requests failed ({failed[0]})")
+            if cold_calls != len(paths) or steam.calls["image"] != cold_calls:
+                problems.append(f"{kind}: {steam.calls['image']} CDN fetches for {len(paths)} images")
+            if revalidated != len(paths):
+                problems.append(f"{kind}: only {revalidated} of {len(paths)} revalidations answered 304")
+
+        # Concurrent first requests for one image
+        steam.calls.clear()
+        path = images.image_path("cover", APPIDS[0]) + "?w=320"
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(lambda _: app.test_client().get(path).status_code, range(8)))
+        print(f"  8 concurrent first requests: {steam.calls['image']} CDN fetch, statuses {set(statuses)}")
+        if steam.calls["image"] != 1:
+            problems.append(f"8 concurrent first requests made {steam.calls['image']} CDN fetches")
+
+        # Covers of games a sync saves for the first time are fetched before anyone asks
+        steam.calls.clear()
+        new_games = [{"appid": 400000 + i, "name": f"New game {i}", "playtime_2weeks": 10, "playtime_forever": 10}
+                     for i in range(5)]
+        started = time.perf_counter()
+        tasks.save_games_to_db(new_games)
+        sync_ms = (time.perf_counter() - started) * 1000
+        # Queued for the web process: the worker leaves it alone, the web's queue worker fetches
+        if QueueWorker(app, exclude=WEB_KINDS).run_once() or steam.calls["image"]:
+            problems.append("prefetch: the worker's queue claimed the cover prefetch")
+        QueueWorker(app, kinds=WEB_KINDS).run_once()
+        prefetched = steam.calls["image"]
+        _, _, responses = serve(client, [images.image_path("cover", g["appid"]) for g in new_games])
+        print(
+            f"  sync saving {len(new_games)} new games took {sync_ms:.1f} ms; {prefetched} covers prefetched, "
+            f"{steam.calls['image'] - prefetched} fetched on request"
+        )
+        if steam.calls["image"] != len(new_games) or any(r.status_code != 200 for r in responses):
+            problems.append(f"prefetch: {prefetched} of {len(new_games)} covers prefetched")
+
+        # A cache capped at a third of what was served, once the last covers were served again
+        capped = images.ImageCache(tempfile.mkdtemp(prefix="steam_tracker_bench_images_capped"), 1 << 40)
+        for appid in APPIDS:
+            capped.get(images.cover_url(appid), 640)
+        full = capped.size()
+        recent = [images.cover_url(a) for a in APPIDS[-3:]]
+        time.sleep(0.01)
+        for url in recent:
+            capped.get(url, 640)
+        capped.max_bytes = full // 3
+        capped.evict()
+        kept = capped.size()
+        steam.calls.clear()
+        capped.get(images.cover_url(APPIDS[0]), 640)
+        refetched = steam.calls["image"]
+        steam.calls.clear()
+        for url in recent:
+            capped.get(url, 640)
+        print(
+            f"  capped at {capped.max_bytes / 1024:.0f} KB of {full / 1024:.0f} KB: {kept / 1024:.0f} KB kept, "
+            f"least recently served cover refetched ({refetched} CDN fetch), "
+            f"{len(recent) - steam.calls['image']}/{len(recent)} recently served still cached"
+        )
+        if kept > capped.max_bytes or capped.size() > capped.max_bytes:
+            problems.append(f"capped cache holds {max(kept, capped.size())} bytes over its {capped.max_bytes} cap")
+        if refetched != 1:
+            problems.append("least recently served cover was not evicted")
+        if steam.calls["image"]:
+            problems.append(f"{steam.calls['image']} recently served covers were evicted")
+
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
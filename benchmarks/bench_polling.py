@@ -0,0 +1,66 @@
+"""Accounts synced per minute by poll_due_accounts against a mock Steam API.
+
+    python -m benchmarks.bench_polling [accounts] [latency_seconds]
+
+Every account is made due at once and the tick is repeated until all are
+synced, for several POLL_CONCURRENCY values.
+"""
+import os, sys, time, logging, tempfile
+from datetime import datetime
+
+accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+from benchmarks.mock_steam import MockSteam, friend_steamid
+
+steam = MockSteam(games=10, latency=latency).start()
+os.environ["STEAM_API_BASE"] = steam.base_url
+os.environ["IMAGE_CDN_BASE"] = steam.base_url
+os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="steam_tracker_bench_images")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("STEAM_ID", friend_steamid(0))
+# Measure the poller, not the client-side quota
+os.environ.setdefault("STEAM_RATE_BURST", "100000")
+os.environ.setdefault("STEAM_POOL_SIZE", "32")
+
+import tasks as tracker
+from core import app
+from tasks import poll_due_accounts
+from models import db, TrackedAccount, PlayedGame, ensure_accounts
+from push import pusher
+
+logging.getLogger().setLevel(logging.WARNING)
+pusher.queue = lambda body: None
+pusher.flush = lambda: None
+tracker.swr.warm = lambda *names: None
+
+def run(concurrency):
+    tracker.POLL_CONCURRENCY = concurrency
+    db.drop_all()
+    db.create_all()
+    ensure_accounts([friend_steamid(i) for i in range(accounts)])
+    TrackedAccount.query.update({"next_poll_at": datetime.utcnow()})
+    db.session.commit()
+
+    steam.calls.clear()
+    started = time.perf_counter()
+    synced = 0
+    while True:
+        result = poll_due_accounts()
+        if not result["due"]:
+            break
+        synced += result["synced"]
+    elapsed = time.perf_counter() - started
+    print(
+        f"  concurrency={concurrency:<3} synced={synced:<5} games={PlayedGame.query.count():<6} "
+        f"time={elapsed:6.2f}s  {synced / elapsed * 60:8.0f} accounts/min"
+    )
+
+def main():
+    print(f"{accounts} accounts, {latency * 1000:.0f} ms Steam latency")
+    with app.app_context():
+        for concurrency in (1, 8, 32):
+            run(concurrency)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Job queue throughput with several worker processes sharing one database.
+
+    python -m benchmarks.bench_queue [jobs] [job_seconds] [failure_rate]
+
+Queues jobs that sleep for job_seconds (standing in for Steam calls), some
+of which fail once and are retried, then drains them with 1, 2 and 4
+processes of JOB_WORKER_THREADS threads each. Checks that every job
+succeeded and that no job ran more often than its retries explain.
+DATABASE_URL defaults to a SQLite file; point it at a scratch Postgres
+database to measure SKIP LOCKED claiming (every table is dropped).
+"""
+import os, sys, time, json, subprocess, tempfile
+
+jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+job_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+failure_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "steam_tracker_bench_queue.sqlite3"))
+os.environ.setdefault("STEAM_ID", "76561197960287930")
+os.environ["JOB_BACKOFF_BASE"] = "0.05"
+os.environ.setdefault("JOB_POLL_SECONDS", "0.05")
+
+WORKER = """
+import os, time, logging
+logging.disable(logging.WARNING)
+from core import app
+from models import db, QueuedJob
+from job_queue import QueueWorker, handler
+
+@handler("bench")
+def bench(n, seconds, fail):
+    time.sleep(seconds)
+    marker = os.path.join(os.environ["BENCH_QUEUE_MARKERS"], str(n))
+    if fail and not os.path.exists(marker):
+        open(marker, "w").close()
+        raise RuntimeError("first attempt fails")
+    return n
+
+worker = QueueWorker(app).start()
+with app.app_context():
+    while QueuedJob.query.filter(QueuedJob.status.in_(("queued", "running"))).count():
+        db.session.commit()
+        time.sleep(0.05)
+worker.stop()
+"""
+
+def run(processes):
+    from core import app
+    from models import db, QueuedJob
+    from job_queue import enqueue
+
+    with app.app_context():
+        QueuedJob.query.delete()
+        failing = set(range(0, jobs, round(1 / failure_rate))) if failure_rate else set()
+        for n in range(jobs):
+            enqueue("bench", {"n": n, "seconds": job_seconds, "fail": n in failing})
+        db.session.commit()
+
+    with tempfile.TemporaryDirectory() as markers:
+        started = time.perf_counter()
+        children = [
+            subprocess.Popen([sys.executable, "-c", WORKER], env={**os.environ, "BENCH_QUEUE_MARKERS": markers})
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.wait()
+        elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        rows = QueuedJob.query.all()
+        succeeded = sum(1 for r in rows if r.status == "succeeded")
+        extra = sum(r.attempts - 1 for r in rows)
+        duplicated = sum(1 for r in rows if r.attempts - 1 > (1 if json.loads(r.payload)["fail"] else 0))
+    print(
+        f"  processes={processes}  {elapsed:6.2f}s  {jobs / elapsed:7.1f} jobs/s  "
+        f"succeeded={succeeded}/{jobs}  retries={extra} (expected {len(failing)})  over-run jobs={duplicated}"
+    )
+
+def main():
+    from core import app
+    from models import db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    threads = os.getenv("JOB_WORKER_THREADS", "2")
+    print(f"{jobs} jobs of {job_seconds * 1000:.0f} ms, {failure_rate:.0%} fail once, {threads} threads per process")
+    for processes in (1, 2, 4):
+        run(processes)
+
+if __name__ == "__main__":
+    main()
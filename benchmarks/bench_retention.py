@@ -0,0 +1,76 @@
+"""Snapshot retention on a seeded table with millions of rows.
+
+    python -m benchmarks.bench_retention [rows] [games] [days]
+
+Checks that every game's first playtime and its last playtime of each UTC
+day are the same before and after compaction.
+"""
+import os, sys, time, logging, tempfile
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "steam_tracker_bench_retention.sqlite3")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("STEAM_ID", "76561197960287930")
+
+from sqlalchemy import func, text
+from main import app
+from models import db, PlayedGame, GameSnapshot, ensure_accounts
+from retention import run_retention
+
+logging.getLogger().setLevel(logging.WARNING)
+
+def seed(rows, games, days):
+    now = datetime.utcnow()
+    start = now - timedelta(days=days)
+    step = timedelta(days=days) / (rows // games)
+    account_id = ensure_accounts([os.environ["STEAM_ID"]])[os.environ["STEAM_ID"]]
+    db.session.execute(PlayedGame.__table__.insert(), [
+        {"id": g + 1, "account_id": account_id, "name": f"Game {g}", "appid": 300000 + g,
+         "play_time_2weeks": 0, "playtime_forever": 0}
+        for g in range(games)
+    ])
+    batch = []
+    for i in range(rows // games):
+        at = start + step * i
+        for g in range(games):
+            batch.append({"game_id": g + 1, "playtime_forever": i * (g + 1), "create_at": at})
+        if len(batch) >= 50000:
+            db.session.execute(GameSnapshot.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(GameSnapshot.__table__.insert(), batch)
+    db.session.commit()
+
+def fingerprint():
+    day = func.date(GameSnapshot.create_at)
+    per_day = (
+        db.session.query(GameSnapshot.game_id, day, func.max(GameSnapshot.playtime_forever))
+        .group_by(GameSnapshot.game_id, day)
+        .all()
+    )
+    first = db.session.query(GameSnapshot.game_id, func.min(GameSnapshot.playtime_forever)).group_by(GameSnapshot.game_id).all()
+    return sorted(per_day), sorted(first)
+
+def main():
+    defaults = [2_000_000, 20, 365]
+    rows, games, days = [int(a) for a in sys.argv[1:4]] + defaults[len(sys.argv[1:4]):]
+    with app.app_context():
+        if db.engine.url.get_backend_name() == "sqlite":
+            db.session.execute(text("PRAGMA journal_mode=WAL"))
+        db.drop_all()
+        db.create_all()
+
+        started = time.perf_counter()
+        seed(rows, games, days)
+        print(f"Seeded {rows} snapshots for {games} games over {days} days in {time.perf_counter() - started:.1f}s")
+
+        before = fingerprint()
+        print(f"First run:  {run_retention()}")
+        print(f"Second run: {run_retention()}")
+        after = fingerprint()
+
+        print(f"Remaining snapshots: {GameSnapshot.query.count()}")
+        print(f"Daily totals exact: {before == after}")
+
+if __name__ == "__main__":
+    main()
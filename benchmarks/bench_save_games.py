@@ -0,0 +1,76 @@
+"""Query count and wall time of save_games_to_db for 10, 100 and 1000 games.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_save_games
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_save_games
+"""
+import os, time, logging
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("STEAM_ID", "76561197960287930")
+
+from sqlalchemy import event
+from main import app
+import tasks
+from tasks import save_games_to_db
+from models import db
+from push import pusher
+
+logging.getLogger().setLevel(logging.WARNING)
+
+# Push delivery is not part of the sync path being measured
+pusher.queue = lambda body: None
+pusher.flush = lambda: None
+# Nor are the covers fetched for new games
+tasks.prefetch_covers = lambda appids: None
+
+SIZES = (10, 100, 1000)
+
+def make_games(n, minutes=0):
+    return [
+        {
+            "appid": 100000 + i,
+            "name": f"Game {i}",
+            "playtime_2weeks": 60 + minutes,
+            "playtime_forever": 1000 + i + minutes
+        }
+        for i in range(n)
+    ]
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+def run(label, games):
+    with QueryCounter(db.engine) as counter:
+        started = time.perf_counter()
+        result = save_games_to_db(games)
+        elapsed = time.perf_counter() - started
+    print(f"  {label:<10} queries={counter.count:<4} time={elapsed * 1000:8.1f} ms  {result}")
+
+def main():
+    with app.app_context():
+        print(f"Backend: {db.engine.url.get_backend_name()}")
+        for n in SIZES:
+            db.drop_all()
+            db.create_all()
+            print(f"{n} games")
+            run("insert", make_games(n))
+            run("update", make_games(n, minutes=30))
+            run("unchanged", make_games(n, minutes=30))
+            run("shrink", make_games(n // 2, minutes=60))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Snapshot query plans and timings before and after migration 0008 on a large seeded table.
+
+    python -m benchmarks.bench_snapshot_partitions [rows] [games] [days]
+
+Migrates a scratch database to 0007, seeds game_snapshots, times the hot
+snapshot queries, then upgrades to 0008 (monthly partitions on Postgres, the
+composite index everywhere) and times them again. Each query is the one the
+app runs: the newest snapshot per game (every sync), a playtime range of one
+game, a retention compaction day window, and expiring the oldest month.
+
+After the upgrade the query plans are checked with EXPLAIN, and the run
+exits non-zero if one regressed: a full scan of game_snapshots, a sort for
+the newest snapshot, or (on Postgres) a range query touching more than the
+partitions its dates fall in.
+
+DATABASE_URL defaults to a SQLite file; point it at a scratch Postgres
+database (every table is dropped) to measure the partitions.
+"""
+import os, sys, json, time, logging, tempfile, statistics
+from datetime import datetime, timedelta
+
+rows, games, days = [int(a) for a in sys.argv[1:4]] + [10_000_000, 100, 365][len(sys.argv[1:4]):]
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "steam_tracker_bench_partitions.sqlite3")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("STEAM_ID", "76561197960287930")
+
+from sqlalchemy import event, func, text
+from flask_migrate import upgrade
+from main import app
+from models import db, PlayedGame, GameSnapshot, ensure_accounts, latest_snapshots
+from retention import _redundant_ids, expire_snapshots
+
+logging.getLogger().setLevel(logging.WARNING)
+logging.getLogger("alembic").setLevel(logging.WARNING)
+
+REPEAT = 5
+NOW = datetime(2026, 10, 1)
+START = NOW - timedelta(days=days)
+
+def reset():
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(text("DROP SCHEMA public CASCADE"))
+        db.session.execute(text("CREATE SCHEMA public"))
+        db.session.commit()
+    else:
+        db.engine.dispose()
+        if os.path.exists(DB_PATH):
+            os.remove(DB_PATH)
+
+def seed():
+    account_id = ensure_accounts([os.environ["STEAM_ID"]])[os.environ["STEAM_ID"]]
+    db.session.execute(PlayedGame.__table__.insert(), [
+        {"id": g + 1, "account_id": account_id, "name": f"Game {g}", "appid": 300000 + g,
+         "play_time_2weeks": 0, "playtime_forever": 0}
+        for g in range(games)
+    ])
+    step = timedelta(days=days) / (rows // games)
+    batch = []
+    for i in range(rows // games):
+        at = START + step * i
+        for g in range(games):
+            batch.append({"game_id": g + 1, "playtime_forever": i * (g + 1), "create_at": at})
+        if len(batch) >= 50000:
+            db.session.execute(GameSnapshot.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(GameSnapshot.__table__.insert(), batch)
+    db.session.commit()
+    analyze()
+
+def analyze():
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+def game_range():
+    week = NOW - timedelta(days=7)
+    return (
+        db.session.query(func.min(GameSnapshot.playtime_forever), func.max(GameSnapshot.playtime_forever))
+        .filter(GameSnapshot.game_id == games // 2, GameSnapshot.create_at >= week, GameSnapshot.create_at < NOW)
+        .one()
+    )
+
+def day_window():
+    day = NOW - timedelta(days=30)
+    return _redundant_ids(day, day + timedelta(days=1), "hour", set())
+
+QUERIES = {
+    "latest_snapshots": lambda: latest_snapshots(list(range(1, games + 1))),
+    "game_week_range": game_range,
+    "retention_day_window": day_window,
+}
+
+class Capture:
+    """The last SELECT a function sends, with its parameters, for EXPLAIN."""
+
+    def __enter__(self):
+        self.statement = None
+        event.listen(db.engine, "before_cursor_execute", self.record)
+        return self
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.statement, self.parameters = statement, parameters
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, "before_cursor_execute", self.record)
+
+def explain(fn):
+    with Capture() as captured:
+        fn()
+    with db.engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + captured.statement, captured.parameters).scalar()
+            return _pg_nodes(plan[0]["Plan"] if isinstance(plan, list) else json.loads(plan)[0]["Plan"])
+        return [
+            {"Node Type": detail}
+            for *_, detail in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + captured.statement, captured.parameters)
+        ]
+
+def _pg_nodes(node):
+    nodes = [node]
+    for child in node.get("Plans", []):
+        nodes.extend(_pg_nodes(child))
+    return nodes
+
+def _months(start, end):
+    return {(start + timedelta(days=d)).strftime("%Y_%m") for d in range((end - start).days + 1)}
+
+def check_plans():
+    """[(query, problem)] for every plan that lost its index or its partition pruning."""
+    problems = []
+    postgres = db.engine.dialect.name == "postgresql"
+    expected_partitions = {
+        "game_week_range": _months(NOW - timedelta(days=7), NOW - timedelta(seconds=1)),
+        "retention_day_window": _months(NOW - timedelta(days=30), NOW - timedelta(days=29, seconds=1)),
+    }
+    for name, fn in QUERIES.items():
+        nodes = explain(fn)
+        if postgres:
+            relations = {n["Relation Name"] for n in nodes if n.get("Relation Name", "").startswith("game_snapshots")}
+            seq_scans = {
+                n["Relation Name"] for n in nodes
+                if n["Node Type"] == "Seq Scan" and n["Relation Name"].startswith("game_snapshots")
+            }
+            print(f"  {name:<22} scans {', '.join(sorted(relations))}")
+            if name == "latest_snapshots" and seq_scans - {"game_snapshots_default"}:
+                problems.append((name, f"sequential scan of {', '.join(sorted(seq_scans))}"))
+            if name in expected_partitions:
+                allowed = {f"game_snapshots_p{month}" for month in expected_partitions[name]}
+                if relations - allowed:
+                    problems.append((name, f"not pruned to {', '.join(sorted(allowed))}"))
+            if name == "game_week_range" and seq_scans:
+                problems.append((name, "sequential scan"))
+        else:
+            details = [n["Node Type"] for n in nodes]
+            print(f"  {name:<22} {' | '.join(details)}")
+            if any(d.startswith("SCAN game_snapshots") for d in details):
+                problems.append((name, "full scan of game_snapshots"))
+            if name == "latest_snapshots" and any("TEMP B-TREE" in d for d in details):
+                problems.append((name, "sorts snapshots instead of reading the index backwards"))
+            if name in ("latest_snapshots", "game_week_range") and not any(
+                "ix_game_snapshots_game_id_create_at" in d for d in details
+            ):
+                problems.append((name, "does not use ix_game_snapshots_game_id_create_at"))
+    return problems
+
+def timings(label, expire_before):
+    results = {}
+    for name, fn in QUERIES.items():
+        samples = []
+        for _ in range(REPEAT):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+            db.session.rollback()
+        results[name] = statistics.median(samples)
+    started = time.perf_counter()
+    deleted, dropped = expire_snapshots(expire_before)
+    expire_ms = (time.perf_counter() - started) * 1000
+    # Leave no transaction open to block the migration's ALTER TABLE
+    db.session.commit()
+    print(
+        f"  {label:<8} " + "  ".join(f"{name} {ms:8.2f} ms" for name, ms in results.items())
+        + f"  expire month {expire_ms:9.1f} ms ({deleted} rows deleted, {len(dropped)} partitions dropped)"
+    )
+
+def main():
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        reset()
+        upgrade(revision="0007_adaptive_polling")
+        started = time.perf_counter()
+        seed()
+        print(f"Seeded {rows} snapshots for {games} games over {days} days on {dialect} in {time.perf_counter() - started:.0f}s")
+
+        first_month = datetime(START.year, START.month, 1)
+        second_month = datetime(first_month.year + first_month.month // 12, first_month.month % 12 + 1, 1)
+        third_month = datetime(second_month.year + second_month.month // 12, second_month.month % 12 + 1, 1)
+        print(f"Median of {REPEAT} runs:")
+        timings("0007", second_month)
+
+        started = time.perf_counter()
+        upgrade(revision="0008_snapshot_partitions")
+        analyze()
+        print(f"Upgraded to 0008 in {time.perf_counter() - started:.0f}s")
+        timings("0008", third_month)
+
+        print("Plans:")
+        problems = check_plans()
+        for name, problem in problems:
+            print(f"FAIL {name}: {problem}")
+        if problems:
+            sys.exit(1)
+        print("Plans OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Idle /api/stream connections held by one gunicorn worker.
+
+    python -m benchmarks.bench_stream [clients ...]
+
+For each client count a single gthread worker is started with enough
+threads, every client connects and idles, then one event is published from
+this process (standing in for the worker service) and the time until all
+clients received it is measured.
+"""
+import os, sys, time, socket, selectors, subprocess, tempfile, logging
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "steam_tracker_bench_stream.sqlite3")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("STEAM_ID", "76561197960265728")
+
+from main import app
+from models import db
+from stream import stream
+
+logging.disable(logging.INFO)
+
+PORT = 18765
+REQUEST = b"GET /api/stream HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n"
+
+def rss_mb(pid):
+    children = open(f"/proc/{pid}/task/{pid}/children").read().split()
+    total = 0
+    for p in [pid] + [int(c) for c in children]:
+        for line in open(f"/proc/{p}/status"):
+            if line.startswith("VmRSS:"):
+                total += int(line.split()[1])
+    return total / 1024
+
+def wait_for(sockets, marker, timeout):
+    """Read from every socket until each has sent marker; returns how many did."""
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    for s in sockets:
+        selector.register(s, selectors.EVENT_READ)
+        buffers[s] = b""
+    done = 0
+    deadline = time.monotonic() + timeout
+    while done < len(sockets) and time.monotonic() < deadline:
+        for key, _ in selector.select(timeout=0.5):
+            try:
+                chunk = key.fileobj.recv(65536)
+            except ConnectionResetError:
+                chunk = b""
+            buffers[key.fileobj] += chunk
+            if marker in buffers[key.fileobj] or not chunk:
+                selector.unregister(key.fileobj)
+                done += marker in buffers[key.fileobj]
+    selector.close()
+    return done
+
+def run(clients):
+    env = dict(
+        os.environ,
+        STREAM_MAX_CLIENTS=str(clients),
+        WEB_THREADS=str(clients + 8),
+        STREAM_POLL_SECONDS="0.5",
+        CACHE_TYPE="SimpleCache"
+    )
+    server = subprocess.Popen(
+        [
+            "gunicorn", "main:app", "-w", "1", "-b", f"127.0.0.1:{PORT}",
+            "--worker-connections", str(clients + 16), "--graceful-timeout", "1", "--log-level", "warning"
+        ],
+        env=env
+    )
+    sockets = []
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", PORT)).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        idle_rss = rss_mb(server.pid)
+
+        started = time.perf_counter()
+        for _ in range(clients):
+            s = socket.create_connection(("127.0.0.1", PORT))
+            s.sendall(REQUEST)
+            sockets.append(s)
+        connected = wait_for(sockets, b"retry:", timeout=60)
+        connect_time = time.perf_counter() - started
+
+        extra = socket.create_connection(("127.0.0.1", PORT), timeout=10)
+        extra.sendall(REQUEST)
+        over_cap = extra.recv(64).split(b"\r\n")[0].decode()
+        extra.close()
+
+        started = time.perf_counter()
+        with app.app_context():
+            stream.publish("playtime", {"games": [], "removed": [], "at": "bench"})
+            db.session.commit()
+        received = wait_for(sockets, b"event: playtime", timeout=30)
+        fanout_time = time.perf_counter() - started
+
+        print(
+            f"  clients={clients:<5} connected={connected:<5} in {connect_time:5.2f}s  "
+            f"rss {idle_rss:5.0f} -> {rss_mb(server.pid):5.0f} MB  "
+            f"event reached {received} in {fanout_time:5.2f}s  next client: {over_cap}"
+        )
+    finally:
+        for s in sockets:
+            s.close()
+        server.terminate()
+        server.wait()
+
+def main():
+    counts = [int(a) for a in sys.argv[1:]] or [100, 500, 1000]
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    with app.app_context():
+        db.create_all()
+    print("One gthread worker; connect, idle, then publish one event")
+    for clients in counts:
+        run(clients)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""HTTP call count and wall time of update_friends against a local mock Steam API.
+
+    python -m benchmarks.bench_update_friends
+"""
+import os, time, logging
+from benchmarks.mock_steam import MockSteam, friend_steamid
+
+SIZES = (10, 300, 1000)
+
+steam = MockSteam().start()
+os.environ["STEAM_API_BASE"] = steam.base_url
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("STEAM_ID", "76561197960287930")
+
+from main import app
+from tasks import update_friends
+from models import db, Friend
+
+logging.getLogger().setLevel(logging.WARNING)
+
+def run(label):
+    steam.calls.clear()
+    started = time.perf_counter()
+    result = update_friends()
+    elapsed = time.perf_counter() - started
+    print(
+        f"  {label:<10} http={sum(steam.calls.values()):<4} time={elapsed * 1000:8.1f} ms  "
+        f"rows={Friend.query.count():<5} {result}"
+    )
+
+def main():
+    with app.app_context():
+        for n in SIZES:
+            db.drop_all()
+            db.create_all()
+            print(f"{n} friends")
+            steam.friends = [friend_steamid(i) for i in range(n)]
+            run("initial")
+            run("unchanged")
+            steam.friends = steam.friends[: n // 2]
+            run("shrink")
+
+if __name__ == "__main__":
+    main()
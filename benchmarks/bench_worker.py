@@ -0,0 +1,57 @@
+"""Startup time and memory of the worker against starting the jobs from the web app.
+
+    python -m benchmarks.bench_worker [runs]
+
+Each variant runs in a fresh interpreter against a throwaway SQLite file and
+reports the time until the scheduler is running (including the imports) and
+the peak RSS at that point. "web app" is what the worker did before worker.py
+stopped importing main: the routes, Flask-Migrate and everything they pull in.
+"""
+import os, sys, json, statistics, subprocess, tempfile
+
+runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+VARIANTS = {
+    "web app (import main)": "import main",
+    "worker.py": "import worker",
+}
+
+PROBE = """
+import time, json, resource
+started = time.perf_counter()
+{import_line}
+from jobs import start_scheduler
+scheduler, lock = start_scheduler()
+elapsed = time.perf_counter() - started
+scheduler.shutdown(wait=False)
+lock.release()
+print(json.dumps({{"seconds": elapsed, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+def probe(import_line, workdir):
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + os.path.join(workdir, "worker.sqlite3"),
+        SCHEDULER_LOCK_PATH=os.path.join(workdir, "scheduler.lock"),
+        CACHE_DIR=os.path.join(workdir, "cache"),
+        STEAM_ID="76561197960287930",
+        # Jobs start immediately; keep them from reaching Steam while the probe runs
+        STEAM_API_BASE="http://127.0.0.1:9",
+    )
+    out = subprocess.check_output(
+        [sys.executable, "-c", PROBE.format(import_line=import_line)],
+        env=env, stderr=subprocess.DEVNULL, text=True
+    )
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    print(f"{runs} runs per variant, fresh interpreter each")
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, import_line in VARIANTS.items():
+            results = [probe(import_line, workdir) for _ in range(runs)]
+            seconds = statistics.median(r["seconds"] for r in results)
+            rss = statistics.median(r["rss_mb"] for r in results)
+            print(f"  {label:<24} startup {seconds:6.2f}s   peak RSS {rss:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
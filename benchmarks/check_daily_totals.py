@@ -0,0 +1,168 @@
+"""Daily totals from the grouped query against the old per-row logic.
+
+    python -m benchmarks.check_daily_totals [days] [games]
+
+Replays 15-minute polls of a random play schedule through
+save_games_to_db, with sessions that run across Minsk midnight every few
+days, then compares for every Minsk day:
+- daily_totals(), update_daily_stat() and `flask backfill-daily` with each other
+- those with the minutes the schedule actually played in that day's polls
+- those with the old update_daily_stat loop over the day's snapshots, plus
+  the minutes it could not see: per game, the growth from the last snapshot
+  before the day to the first one in it, which is where a session crossing
+  midnight lands
+Exits non-zero on any mismatch.
+"""
+import os, sys, random, logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+days = int(sys.argv[1]) if len(sys.argv) > 1 else 21
+games = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ.setdefault("STEAM_ID", "76561197960287930")
+os.environ["CACHE_TYPE"] = "SimpleCache"
+
+import pytz
+from sqlalchemy import asc
+from core import tz_Minsk
+from main import app
+from models import db, PlayedGame, GameSnapshot, DailyStat, ensure_accounts
+from push import pusher
+import tasks
+
+logging.getLogger().setLevel(logging.WARNING)
+pusher.flush = pusher.discard
+# Covers are beside the point and there is no CDN to fetch them from
+tasks.prefetch_covers = lambda appids: None
+
+POLL = timedelta(minutes=15)
+# Midnight in Minsk (UTC+3) is 21:00 UTC
+START = datetime(2026, 9, 1, 0, 0)
+
+def old_daily_total(day):
+    """update_daily_stat's loop before the grouped query, minus the push: {name: minutes}."""
+    start, end = tasks.minsk_day_bounds(day)
+    snapshots = GameSnapshot.query.filter(
+            GameSnapshot.create_at >= start,
+            GameSnapshot.create_at < end
+        ).order_by(asc(GameSnapshot.create_at)).all()
+
+    stats_dict = {}
+    for snap in snapshots:
+        game = db.session.get(PlayedGame, snap.game_id)
+        if not game:
+            continue
+        name = game.name
+        if name not in stats_dict:
+            stats_dict[name] = {"start": snap.playtime_forever, "end": snap.playtime_forever}
+        else:
+            stats_dict[name]["end"] = snap.playtime_forever
+    return {name: v["end"] - v["start"] for name, v in stats_dict.items()}
+
+def unseen_by_old(day):
+    """{name: minutes} the old loop missed: growth into each game's first snapshot of the day."""
+    start, end = tasks.minsk_day_bounds(day)
+    missed = {}
+    for game in PlayedGame.query:
+        first = (
+            GameSnapshot.query.filter(GameSnapshot.game_id == game.id, GameSnapshot.create_at >= start,
+                                      GameSnapshot.create_at < end)
+            .order_by(GameSnapshot.create_at).first()
+        )
+        before = (
+            GameSnapshot.query.filter(GameSnapshot.game_id == game.id, GameSnapshot.create_at < start)
+            .order_by(GameSnapshot.create_at.desc()).first()
+        )
+        if first and before and first.playtime_forever > before.playtime_forever:
+            missed[game.name] = first.playtime_forever - before.playtime_forever
+    return missed
+
+def minsk_date(at):
+    return pytz.utc.localize(at).astimezone(tz_Minsk).date()
+
+def replay(rng):
+    """Poll a random schedule through save_games_to_db; ({day: {name: minutes}} played, midnight sessions)."""
+    playtime = {f"Game {g}": 1000 * (g + 1) for g in range(games)}
+    # Per game, the minute ranges (from START) being played
+    sessions = defaultdict(list)
+    midnight = 0
+    for day in range(days):
+        for name in playtime:
+            if rng.random() < 0.4:
+                begin = day * 1440 + rng.randrange(0, 1440 - 240)
+                sessions[name].append((begin, begin + rng.randrange(10, 240)))
+        if day % 3 == 1:
+            # 22:30 to 01:45 Minsk
+            name = rng.choice(list(playtime))
+            begin = day * 1440 + 19 * 60 + 30
+            sessions[name].append((begin, begin + 195))
+            midnight += 1
+
+    played = defaultdict(lambda: defaultdict(int))
+    at, last = START, 0
+    while at < START + timedelta(days=days + 1):
+        now = int((at - START).total_seconds() // 60)
+        for name, ranges in sessions.items():
+            # Minutes of this game's sessions since the previous poll
+            minutes = sum(max(0, min(end, now) - max(begin, last)) for begin, end in ranges)
+            if minutes:
+                playtime[name] += minutes
+                played[minsk_date(at)][name] += minutes
+        tasks.save_games_to_db([
+            {"appid": 300000 + i, "name": name, "playtime_2weeks": 0, "playtime_forever": minutes}
+            for i, (name, minutes) in enumerate(playtime.items())
+        ], now=at)
+        at, last = at + POLL, now
+    return played, midnight
+
+def main():
+    problems = []
+    with app.app_context():
+        db.create_all()
+        ensure_accounts([os.environ["STEAM_ID"]])
+        db.session.commit()
+        played, midnight = replay(random.Random(0))
+
+        first_day = minsk_date(START)
+        last_day = datetime.now(tz_Minsk).date() - timedelta(days=1)
+        result = app.test_cli_runner().invoke(args=["backfill-daily", "--since", first_day.isoformat()])
+        if result.exit_code:
+            problems.append(f"backfill-daily failed: {result.output}")
+        backfilled = {d.date: d.total_minutes for d in DailyStat.query}
+        grouped = tasks.daily_totals(first_day, last_day)
+
+        compared, missed_minutes, day = 0, 0, first_day
+        while day <= last_day:
+            new = grouped.get(day, {})
+            old = old_daily_total(day)
+            missed = unseen_by_old(day)
+            expected = {name: old.get(name, 0) + missed.get(name, 0) for name in set(old) | set(missed)}
+            expected = {name: minutes for name, minutes in expected.items() if minutes}
+            stored = tasks.update_daily_stat(day)["total_minutes"]
+            if new != expected:
+                problems.append(f"{day}: grouped {new}, old loop {old} plus unseen {missed}")
+            if new != dict(played.get(day, {})):
+                problems.append(f"{day}: grouped {new}, schedule played {dict(played.get(day, {}))}")
+            if not (sum(new.values()) == backfilled.get(day) == stored):
+                problems.append(f"{day}: grouped {sum(new.values())}, backfill-daily {backfilled.get(day)}, "
+                                f"update_daily_stat {stored}")
+            compared += 1
+            missed_minutes += sum(missed.values())
+            day += timedelta(days=1)
+
+        print(
+            f"  {compared} Minsk days, {games} games, {midnight} sessions across midnight, "
+            f"{GameSnapshot.query.count()} snapshots | {sum(map(len, grouped.values()))} game-days totalled, "
+            f"{missed_minutes} minutes the old loop could not see"
+        )
+
+    for problem in problems[:20]:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
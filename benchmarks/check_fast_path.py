@@ -0,0 +1,210 @@
+"""Unchanged-poll skipping and minimal-diff writes against a full sync.
+
+    python -m benchmarks.check_fast_path [ticks] [accounts] [seed]
+
+Replays randomized GetRecentlyPlayedGames payloads (games played, two-week
+hours decaying, games added, dropped and coming back, unchanged and
+reordered polls) through poll_due_accounts against a mock Steam API. The
+same payloads go through a plain full sync into a second database: every
+game row rewritten and a snapshot and rollup decided per game from its
+latest snapshot, as save_games_to_db did before the fast path. After every
+tick played_games, game_snapshots and playtime_rollups must match between
+the two; the run exits non-zero on the first tick where they do not.
+"""
+import os, sys, random, logging, tempfile
+from collections import Counter
+from datetime import datetime
+
+ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+accounts = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+from benchmarks.mock_steam import MockSteam, friend_steamid
+
+steam = MockSteam(games=0).start()
+os.environ["STEAM_API_BASE"] = steam.base_url
+os.environ["IMAGE_CDN_BASE"] = steam.base_url
+os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="steam_tracker_bench_images")
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["STEAM_ID"] = friend_steamid(0)
+os.environ["CACHE_TYPE"] = "SimpleCache"
+os.environ.setdefault("STEAM_RATE_BURST", "100000")
+# Every due account is fetched, so each poll exercises the fingerprint
+os.environ["POLL_ADAPTIVE"] = "false"
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+import tasks
+from core import app
+from models import db, TrackedAccount, PlayedGame, GameSnapshot, PlaytimeRollup, ensure_accounts, hour_bucket
+from push import pusher
+
+logging.getLogger().setLevel(logging.WARNING)
+pusher.queue = lambda body: None
+pusher.flush = lambda: None
+tasks.swr.warm = lambda *names: None
+tasks.prefetch_covers = lambda appids: None
+
+START = datetime(2026, 9, 1)
+STEAMIDS = [friend_steamid(i) for i in range(accounts)]
+
+def full_sync(session, account_id, games, now):
+    """Every game written, one latest-snapshot lookup per game, no fingerprint."""
+    current = {}
+    for g in games:
+        if g.get("name"):
+            current[g["name"]] = g
+    for game in session.query(PlayedGame).filter_by(account_id=account_id):
+        if game.name not in current:
+            session.query(GameSnapshot).filter_by(game_id=game.id).delete()
+            session.delete(game)
+    session.flush()
+
+    for name, g in current.items():
+        game = session.query(PlayedGame).filter_by(account_id=account_id, name=name).first()
+        if game is None:
+            game = PlayedGame(account_id=account_id, name=name)
+            session.add(game)
+        game.appid = g.get("appid")
+        game.play_time_2weeks = g.get("playtime_2weeks", 0)
+        game.playtime_forever = g.get("playtime_forever", 0)
+        session.flush()
+
+        last = (
+            session.query(GameSnapshot).filter_by(game_id=game.id)
+            .order_by(GameSnapshot.create_at.desc(), GameSnapshot.id.desc()).first()
+        )
+        if last is None or last.playtime_forever != game.playtime_forever:
+            session.add(GameSnapshot(game_id=game.id, playtime_forever=game.playtime_forever, create_at=now))
+        if last is not None and game.playtime_forever > last.playtime_forever:
+            rollup = (
+                session.query(PlaytimeRollup)
+                .filter_by(account_id=account_id, name=name, bucket_start=hour_bucket(now)).first()
+            )
+            if rollup is None:
+                rollup = PlaytimeRollup(account_id=account_id, name=name, bucket_start=hour_bucket(now), minutes=0)
+                session.add(rollup)
+            rollup.appid = game.appid
+            rollup.minutes += game.playtime_forever - last.playtime_forever
+    session.commit()
+
+def state(session):
+    """Everything a sync writes, keyed by steamid and game name rather than ids."""
+    games = sorted(
+        session.query(TrackedAccount.steamid, PlayedGame.name, PlayedGame.appid,
+                      PlayedGame.play_time_2weeks, PlayedGame.playtime_forever)
+        .join(TrackedAccount, PlayedGame.account_id == TrackedAccount.id)
+    )
+    snapshots = sorted(
+        session.query(TrackedAccount.steamid, PlayedGame.name, GameSnapshot.playtime_forever, GameSnapshot.create_at)
+        .join(PlayedGame, GameSnapshot.game_id == PlayedGame.id)
+        .join(TrackedAccount, PlayedGame.account_id == TrackedAccount.id)
+    )
+    rollups = sorted(
+        session.query(TrackedAccount.steamid, PlaytimeRollup.name, PlaytimeRollup.appid,
+                      PlaytimeRollup.bucket_start, PlaytimeRollup.minutes)
+        .join(TrackedAccount, PlaytimeRollup.account_id == TrackedAccount.id)
+    )
+    return {"played_games": games, "game_snapshots": snapshots, "playtime_rollups": rollups}
+
+def next_payload(rng, games, pool):
+    """The account's next payload: usually unchanged, sometimes reordered, otherwise a few random changes."""
+    games = [dict(g) for g in games]
+    roll = rng.random()
+    if roll < 0.45:
+        return games
+    if roll < 0.55:
+        rng.shuffle(games)
+        return games
+    for _ in range(rng.randint(1, 3)):
+        change = rng.random()
+        if games and change < 0.5:
+            game = rng.choice(games)
+            minutes = rng.randint(1, 15)
+            game["playtime_forever"] += minutes
+            game["playtime_2weeks"] += minutes
+        elif games and change < 0.65:
+            game = rng.choice(games)
+            game["playtime_2weeks"] = max(0, game["playtime_2weeks"] - rng.randint(1, 60))
+        elif games and change < 0.75:
+            pool[games.pop(rng.randrange(len(games)))["name"]]["playtime_2weeks"] = 0
+        else:
+            # A new game, or one that dropped out coming back with more playtime
+            absent = [name for name in pool if name not in {g["name"] for g in games}]
+            if absent:
+                game = pool[rng.choice(absent)]
+                game["playtime_forever"] += rng.randint(0, 30)
+                game["playtime_2weeks"] = rng.randint(1, 30)
+                games.append(dict(game))
+    for g in games:
+        pool[g["name"]].update(g)
+    return games
+
+def main():
+    problems = []
+    rng = random.Random(seed)
+    reference = create_engine("sqlite://")
+    db.metadata.create_all(reference)
+    full = Session(reference)
+
+    with app.app_context():
+        db.create_all()
+        ensure_accounts(STEAMIDS)
+        full_ids = {}
+        for steamid in STEAMIDS:
+            account = TrackedAccount(steamid=steamid)
+            full.add(account)
+            full.flush()
+            full_ids[steamid] = account.id
+        full.commit()
+        db.session.commit()
+
+        pools = {
+            steamid: {
+                f"Game {a}-{g}": {"appid": 300000 + 100 * a + g, "name": f"Game {a}-{g}",
+                                  "playtime_2weeks": 0, "playtime_forever": 100 * g}
+                for g in range(8)
+            }
+            for a, steamid in enumerate(STEAMIDS)
+        }
+        payloads = {steamid: [] for steamid in STEAMIDS}
+        totals = Counter()
+        for tick in range(ticks):
+            now = START + tasks.POLL_INTERVAL * tick
+            for steamid in STEAMIDS:
+                payloads[steamid] = next_payload(rng, payloads[steamid], pools[steamid])
+                steam.account_games[steamid] = payloads[steamid]
+                full_sync(full, full_ids[steamid], payloads[steamid], now)
+            TrackedAccount.query.update({"next_poll_at": now})
+            db.session.commit()
+            result = tasks.poll_due_accounts(now=now)
+            totals.update(synced=result["synced"], skipped=result["skipped"], failed=result["failed"])
+
+            fast, expected = state(db.session), state(full)
+            for table in expected:
+                if fast[table] != expected[table]:
+                    missing = sorted(set(expected[table]) - set(fast[table]))[:3]
+                    extra = sorted(set(fast[table]) - set(expected[table]))[:3]
+                    problems.append(f"tick {tick}: {table} differ; full sync only {missing}, fast path only {extra}")
+            if result["failed"]:
+                problems.append(f"tick {tick}: {result['failed']} syncs failed")
+            if problems:
+                break
+
+        sizes = {table: len(rows) for table, rows in state(full).items()}
+        print(
+            f"  {tick + 1} ticks x {accounts} accounts: {totals['synced']} applied, {totals['skipped']} skipped "
+            f"as unchanged | compared {sizes}"
+        )
+        if not totals["skipped"] or not totals["synced"]:
+            problems.append("the replay never exercised both skipped and applied polls")
+
+    steam.stop()
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""PushDispatcher against a local fake push service.
+
+    python -m benchmarks.check_push
+
+Subscribes endpoints that accept, answer 404, 410 or 500, or hang past the
+dispatcher's timeout, then flushes queued messages and checks that:
+- each subscriber gets one payload that decrypts to all queued messages
+- a hanging endpoint fails within the timeout instead of stalling the flush
+- 404 and 410 subscriptions are deleted, the others are kept
+- the sent/failed/pruned counters add up over several flushes
+Exits non-zero when one of those does not hold.
+"""
+import os, sys, json, time, base64, logging, tempfile, threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ.setdefault("STEAM_ID", "76561197960287930")
+os.environ["CACHE_TYPE"] = "SimpleCache"
+os.environ["VAPID_ADMIN_EMAIL"] = "bench@example.com"
+
+import http_ece
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from py_vapid import Vapid
+from main import app
+from models import db, PushSubscription
+from push import PushDispatcher
+
+logging.getLogger().setLevel(logging.WARNING)
+# The failures below are deliberate
+logging.getLogger("push").setLevel(logging.ERROR)
+
+TIMEOUT = 0.5
+HANG = 3.0
+# Endpoint name -> status the fake push service answers
+BEHAVIOUR = {"ok-1": 201, "ok-2": 201, "ok-3": 201, "gone-404": 404, "gone-410": 410, "error": 500, "hang": 201}
+
+class FakePushService:
+    """Records every POST /push/<name> body and answers as BEHAVIOUR says."""
+
+    def __init__(self):
+        self.received = {}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}/push/"
+
+    def start(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                name = self.path.rsplit("/", 1)[-1]
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with service._lock:
+                    service.calls[name] += 1
+                    service.received.setdefault(name, []).append(body)
+                if name == "hang":
+                    time.sleep(HANG)
+                self.send_response(BEHAVIOUR.get(name, 404))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+def b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def subscriber(endpoint):
+    """A PushSubscription with real browser-side keys, and those keys to decrypt with."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    auth = os.urandom(16)
+    public = key.public_key().public_bytes(serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint)
+    return PushSubscription(endpoint=endpoint, p256dh=b64(public), auth=b64(auth)), (key, auth)
+
+def decrypt(body, keys):
+    key, auth = keys
+    return json.loads(http_ece.decrypt(body, private_key=key, auth_secret=auth, version="aes128gcm"))
+
+def main():
+    problems = []
+    service = FakePushService().start()
+    vapid = Vapid()
+    vapid.generate_keys()
+    key_file = os.path.join(tempfile.mkdtemp(prefix="steam_tracker_check_push"), "vapid.pem")
+    vapid.save_key(key_file)
+    os.environ["VAPID_PRIVATE_KEY"] = key_file
+
+    with app.app_context():
+        db.create_all()
+        keys = {}
+        for name in BEHAVIOUR:
+            subscription, keys[name] = subscriber(service.base_url + name)
+            db.session.add(subscription)
+        db.session.commit()
+        dispatcher = PushDispatcher(max_workers=len(BEHAVIOUR), timeout=TIMEOUT)
+
+        # Nothing queued: no request at all
+        if dispatcher.flush() != {"sent": 0, "failed": 0, "pruned": 0} or service.calls:
+            problems.append("an empty flush contacted the push service")
+
+        messages = ["Game 1: +30 min", "Game 2: +15 min", "Game 3: +45 min"]
+        for message in messages:
+            dispatcher.queue(message)
+        started = time.perf_counter()
+        first = dispatcher.flush()
+        seconds = time.perf_counter() - started
+        print(f"  flush of {len(messages)} messages to {len(BEHAVIOUR)} subscribers in {seconds * 1000:.0f} ms: {first}")
+
+        # Coalescing: one request per subscriber carrying every message
+        for name in BEHAVIOUR:
+            if service.calls[name] != 1:
+                problems.append(f"{name} got {service.calls[name]} requests for one flush")
+                continue
+            body = decrypt(service.received[name][0], keys[name])["body"]
+            if body != "\n".join(messages):
+                problems.append(f"{name} got {body!r}")
+        print(f"  requests per subscriber: {dict(service.calls)}")
+
+        # Timeout: the hanging endpoint fails and does not hold the flush for HANG seconds
+        if seconds > TIMEOUT + 1.5:
+            problems.append(f"flush took {seconds:.1f}s with a {TIMEOUT}s timeout")
+        if first != {"sent": 3, "failed": 2, "pruned": 2}:
+            problems.append(f"first flush returned {first}, expected 3 sent, 2 failed (500, timeout), 2 pruned")
+
+        # Pruning: only 404 and 410 subscriptions are gone
+        remaining = sorted(endpoint.rsplit("/", 1)[-1] for (endpoint,) in db.session.query(PushSubscription.endpoint))
+        expected = sorted(name for name in BEHAVIOUR if not name.startswith("gone"))
+        print(f"  subscriptions left: {remaining}")
+        if remaining != expected:
+            problems.append(f"subscriptions left {remaining}, expected {expected}")
+
+        # Counters accumulate; pruned subscriptions are not contacted again
+        service.calls.clear()
+        second = dispatcher.send("Game 4: +10 min")
+        if any(service.calls[name] for name in BEHAVIOUR if name.startswith("gone")):
+            problems.append("a pruned subscription was contacted again")
+        expected_stats = {key: first[key] + second[key] for key in first}
+        print(f"  second flush {second}, counters {dispatcher.stats}")
+        if second != {"sent": 3, "failed": 2, "pruned": 0} or dispatcher.stats != expected_stats:
+            problems.append(f"second flush {second}, counters {dispatcher.stats}, expected {expected_stats}")
+
+        # discard() drops what was queued
+        service.calls.clear()
+        dispatcher.queue("never sent")
+        dispatcher.discard()
+        if dispatcher.flush()["sent"] or service.calls:
+            problems.append("discarded messages were sent")
+
+    service.stop()
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Two worker.py processes started together on one host.
+
+    python -m benchmarks.check_workers
+
+Starts two workers against a throwaway SQLite file with the same METRICS_PORT
+and checks that:
+- both keep running, the second without metrics instead of dying on the port
+- exactly one holds the scheduler lock, the other waits for it
+- the waiting worker takes the lock once the holder is killed
+Exits non-zero when one of those does not hold.
+"""
+import os, sys, time, socket, signal, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_SECONDS = 20
+HOLDS = "holds the scheduler lock"
+
+SCHEMA = """
+from core import app
+from models import db
+with app.app_context():
+    db.create_all()
+"""
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(predicate, seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.2)
+    return predicate()
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            DATABASE_URL="sqlite:///" + os.path.join(workdir, "workers.sqlite3"),
+            SCHEDULER_LOCK_PATH=os.path.join(workdir, "scheduler.lock"),
+            SCHEDULER_LOCK_RETRY_SECONDS="1",
+            CACHE_TYPE="FileSystemCache",
+            CACHE_DIR=os.path.join(workdir, "cache"),
+            IMAGE_CACHE_DIR=os.path.join(workdir, "images"),
+            METRICS_PORT=str(free_port()),
+            STEAM_ID="76561197960287930",
+            # Jobs start immediately; keep them from reaching Steam
+            STEAM_API_BASE="http://127.0.0.1:9",
+            PYTHONUNBUFFERED="1",
+        )
+        env.pop("REDIS_URL", None)
+        subprocess.check_call([sys.executable, "-c", SCHEMA], cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+
+        logs = [os.path.join(workdir, f"worker{i}.log") for i in range(2)]
+        workers = []
+        for path in logs:
+            with open(path, "w") as log:
+                workers.append(subprocess.Popen(
+                    [sys.executable, "worker.py"], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+                ))
+            # The second one starts once the first is serving metrics, so its bind is sure to fail
+            wait_for(lambda: "Metrics served" in open(path).read(), STARTUP_SECONDS)
+
+        def holders():
+            return [i for i, path in enumerate(logs) if HOLDS in open(path).read()]
+
+        try:
+            wait_for(lambda: holders(), STARTUP_SECONDS)
+            time.sleep(2)
+            for i, worker in enumerate(workers):
+                if worker.poll() is not None:
+                    failures.append(f"worker {i} exited with {worker.returncode}:\n{open(logs[i]).read()}")
+            if len(holders()) != 1:
+                failures.append(f"{len(holders())} workers hold the scheduler lock, expected 1")
+            if not any("Metrics not served" in open(path).read() for path in logs):
+                failures.append("neither worker reported the metrics port as taken")
+
+            if not failures:
+                holder = holders()[0]
+                standby = 1 - holder
+                workers[holder].send_signal(signal.SIGKILL)
+                workers[holder].wait()
+                if not wait_for(lambda: HOLDS in open(logs[standby]).read(), STARTUP_SECONDS):
+                    failures.append("the waiting worker did not take the scheduler lock after the holder died")
+        finally:
+            for worker in workers:
+                if worker.poll() is None:
+                    worker.kill()
+                    worker.wait()
+
+    for failure in failures:
+        print("FAIL", failure)
+    if failures:
+        sys.exit(1)
+    print("OK: two workers start together; the standby takes over the scheduler")
+
+if __name__ == "__main__":
+    main()
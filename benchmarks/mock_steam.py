@@ -0,0 +1,217 @@
+"""Local stand-in for the Steam Web API endpoints the app calls.
+
+Start it before importing main so STEAM_API_BASE points at it:
+
+    steam = MockSteam(friends=300).start()
+    os.environ["STEAM_API_BASE"] = steam.base_url
+    os.environ["IMAGE_CDN_BASE"] = steam.base_url
+
+It also stands in for the image CDN: /steam/apps/<appid>/library_hero.jpg
+and /avatars/<steamid>.jpg answer generated JPEGs (Pillow is needed for
+those), counted under calls["image"].
+
+latency (plus up to jitter more) is added to every response, plus
+delays[steamid] for that account's requests, and a seeded error_rate share
+of requests answers error_status instead.
+
+presence[steamid] (a dict of GetPlayerSummaries fields such as gameid and
+personastate) and account_games[steamid] may be changed while it runs to
+simulate players starting and stopping games, and unlocked[(steamid, appid)]
+({apiname: unlock time}) to simulate achievements being earned. Every
+achievements_every-th game has achievements_per_game achievements; the
+others have none. GetPlayerAchievements answers error_status for every
+(steamid, appid) in failing.
+
+As on Steam, earlier play keeps leaving the two-week window: every game's
+playtime_2weeks is answered a minute lower for each hour clock() has moved
+past epoch. Benchmarks that simulate time replace clock and epoch.
+"""
+import io, json, time, random, threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+def friend_steamid(i):
+    return str(76561198000000000 + i)
+
+class MockSteam:
+    def __init__(self, friends=0, games=10, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500, seed=0,
+                 delays=None, achievements_per_game=20, achievements_every=2):
+        self.latency = latency
+        self.jitter = jitter
+        self.delays = delays or {}
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.friends = [friend_steamid(i) for i in range(friends)]
+        self.games = [
+            {
+                "appid": 200000 + i,
+                "name": f"Game {i}",
+                "playtime_2weeks": 30 * (i + 1),
+                "playtime_forever": 1000 * (i + 1)
+            }
+            for i in range(games)
+        ]
+        self.achievements_per_game = achievements_per_game
+        self.achievements_every = achievements_every
+        self.presence = {}
+        self.unlocked = {}
+        self.failing = set()
+        self.account_games = {}
+        self.clock = time.time
+        self.epoch = time.time()
+        self.images = {}
+        self.calls = Counter()
+        self.errors = Counter()
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def start(self):
+        steam = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path.endswith(".jpg"):
+                    self.send_image(url.path)
+                    return
+                endpoint = url.path.strip("/").split("/")[1]
+                steam.calls[endpoint] += 1
+                with steam._random_lock:
+                    delay = steam.latency + steam.jitter * steam._random.random() + steam.delays.get(params.get("steamid"), 0)
+                    fail = steam._random.random() < steam.error_rate
+                if endpoint == "GetPlayerAchievements":
+                    fail = fail or (params.get("steamid"), int(params.get("appid", 0))) in steam.failing
+                if delay:
+                    time.sleep(delay)
+                if fail:
+                    steam.errors[endpoint] += 1
+                    self.send_response(steam.error_status)
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                handler = getattr(steam, endpoint, None)
+                if handler is None:
+                    self.send_error(404)
+                    return
+                response = handler(params)
+                if response is None:
+                    self.send_error(400)
+                    return
+                body = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_image(self, path):
+                steam.calls["image"] += 1
+                if steam.latency:
+                    time.sleep(steam.latency)
+                body = steam.image(path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def GetFriendList(self, params):
+        return {"friendslist": {"friends": [
+            {"steamid": sid, "relationship": "friend", "friend_since": 0}
+            for sid in self.friends
+        ]}}
+
+    def GetPlayerSummaries(self, params):
+        ids = params.get("steamids", "").split(",")
+        return {"response": {"players": [
+            {
+                "steamid": sid,
+                "personaname": f"Player {sid[-4:]}",
+                "avatar": f"{self.base_url}avatars/{sid}.jpg",
+                **self.presence.get(sid, {})
+            }
+            for sid in ids if sid
+        ]}}
+
+    def GetRecentlyPlayedGames(self, params):
+        games = self.account_games.get(params.get("steamid"), self.games)
+        left = int(self.clock() - self.epoch) // 3600
+        games = [dict(g, playtime_2weeks=max(0, g["playtime_2weeks"] - left)) for g in games]
+        return {"response": {"total_count": len(games), "games": games}}
+
+    def image(self, path):
+        """JPEG bytes for a cover (1920x620, like a library hero) or an avatar (184x184), distinct per path; None if unknown."""
+        if path.startswith("/steam/apps/") and path.endswith("/library_hero.jpg"):
+            size = (1920, 620)
+        elif path.startswith("/avatars/"):
+            size = (184, 184)
+        else:
+            return None
+        if path not in self.images:
+            from PIL import Image, ImageDraw
+            rng = random.Random(path)
+            image = Image.merge("RGB", [Image.effect_noise(size, 48).point(lambda v, c=c: v * c // 3) for c in (1, 2, 3)])
+            draw = ImageDraw.Draw(image)
+            for _ in range(60):
+                x, y = rng.randrange(size[0]), rng.randrange(size[1])
+                r = rng.randrange(10, size[1] // 3)
+                draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+            out = io.BytesIO()
+            image.save(out, "JPEG", quality=90)
+            self.images[path] = out.getvalue()
+        return self.images[path]
+
+    def achievement_names(self, appid):
+        if (appid - 200000) % self.achievements_every:
+            return []
+        return [f"ACH_{appid}_{i}" for i in range(self.achievements_per_game)]
+
+    def GetSchemaForGame(self, params):
+        appid = int(params["appid"])
+        achievements = [
+            {"name": name, "displayName": name.title(), "description": f"Earn {name}", "hidden": i % 5 == 4,
+             "icon": f"https://icons.example/{name}.jpg", "icongray": f"https://icons.example/{name}_gray.jpg"}
+            for i, name in enumerate(self.achievement_names(appid))
+        ]
+        game = {"gameName": f"ValveTestApp{appid}"}
+        if achievements:
+            game["availableGameStats"] = {"achievements": achievements}
+        return {"game": game}
+
+    def GetPlayerAchievements(self, params):
+        appid = int(params["appid"])
+        names = self.achievement_names(appid)
+        if not names:
+            # What Steam answers for a game without stats
+            return None
+        unlocked = self.unlocked.get((params.get("steamid"), appid), {})
+        return {"playerstats": {"steamID": params.get("steamid"), "success": True, "achievements": [
+            {"apiname": name, "achieved": int(name in unlocked), "unlocktime": unlocked.get(name, 0)}
+            for name in names
+        ]}}
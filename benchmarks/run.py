@@ -0,0 +1,210 @@
+"""Timed scenarios over a seeded database and a mock Steam API, saved as JSON.
+
+    python -m benchmarks.run [--scale small|medium|large] [--repeat 5]
+                             [--latency 0.02] [--jitter 0] [--error-rate 0]
+                             [--scenario NAME ...] [--output FILE]
+    python -m benchmarks.run --compare OLD.json NEW.json
+
+DATABASE_URL defaults to a fresh SQLite file; point it at a scratch
+Postgres database to measure that instead (every table is dropped).
+Results go to benchmarks/results/<commit>-<scale>.json unless --output is
+given, so runs on two commits can be compared with --compare.
+"""
+import os, json, time, random, logging, argparse, platform, statistics, subprocess, tempfile
+from datetime import datetime
+
+from benchmarks.mock_steam import MockSteam
+from benchmarks.seed import SCALES, seed
+
+STEAM_ID = "76561197960287930"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock Steam latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency up to this many seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of mock Steam requests that fail.")
+    parser.add_argument("--scenario", action="append", help="Run only these scenarios.")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    return parser.parse_args()
+
+def git_revision():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+def scenarios(tracker, tasks, client):
+    """name -> (setup(rep) or None, run(rep)); only run() is timed."""
+    from models import db, PlayedGame, Friend
+
+    payload = {}
+
+    def next_sync(rep):
+        # Half the games gained playtime since the last sync, as in a busy evening
+        rng = random.Random(rep)
+        payload["games"] = [
+            {
+                "appid": g.appid,
+                "name": g.name,
+                "playtime_2weeks": g.play_time_2weeks + (15 if rng.random() < 0.5 else 0),
+                "playtime_forever": g.playtime_forever + (15 if rng.random() < 0.5 else 0),
+            }
+            for g in PlayedGame.query.filter_by(account_id=tasks.primary_account_id())
+        ]
+
+    def friends_due(rep):
+        Friend.query.update({"next_playtime_at": datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+
+    return {
+        "save_games_to_db": (next_sync, lambda rep: tasks.save_games_to_db(payload["games"])),
+        "update_daily_stat": (None, lambda rep: tasks.update_daily_stat()),
+        "api_week_activity": (None, lambda rep: tracker.swr.refresh("week-activity")),
+        "api_week_activity_cached": (None, lambda rep: client.get("/api/week-activity?compact=1").close()),
+        "friends_activity_api": (None, lambda rep: tracker.swr.refresh("friends-activity")),
+        "friends_activity_api_warm": (None, lambda rep: client.get("/api/friends/activity").close()),
+        "refresh_friend_playtime": (friends_due, lambda rep: tasks.refresh_friend_playtime()),
+        "update_friends": (None, lambda rep: tasks.update_friends()),
+    }
+
+def measure(setup, run, repeat, steam, engine):
+    from sqlalchemy import event
+    from models import db
+
+    timings, queries, failures = [], [], 0
+    calls_before, errors_before = sum(steam.calls.values()), sum(steam.errors.values())
+    for rep in range(repeat):
+        if setup:
+            setup(rep)
+        count = [0]
+
+        def on_execute(*args):
+            count[0] += 1
+
+        event.listen(engine, "before_cursor_execute", on_execute)
+        started = time.perf_counter()
+        try:
+            run(rep)
+        except Exception as e:
+            db.session.rollback()
+            failures += 1
+            logging.getLogger(__name__).warning(f"Scenario run failed: {e}")
+        finally:
+            timings.append(time.perf_counter() - started)
+            event.remove(engine, "before_cursor_execute", on_execute)
+        queries.append(count[0])
+    ms = [t * 1000 for t in timings]
+    return {
+        "runs": repeat,
+        "failures": failures,
+        "min_ms": round(min(ms), 2),
+        "median_ms": round(statistics.median(ms), 2),
+        "mean_ms": round(statistics.mean(ms), 2),
+        "max_ms": round(max(ms), 2),
+        "queries": statistics.median(queries),
+        "steam_calls": round((sum(steam.calls.values()) - calls_before) / repeat, 2),
+        "steam_errors": round((sum(steam.errors.values()) - errors_before) / repeat, 2),
+    }
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta']['commit']} ({old['meta']['scale']}) -> {new['meta']['commit']} ({new['meta']['scale']})")
+    print(f"  {'scenario':<28} {'old ms':>10} {'new ms':>10} {'change':>8}   queries")
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            print(f"  {name:<28} {'-':>10} {result['median_ms']:>10.1f}")
+            continue
+        change = (result["median_ms"] / before["median_ms"] - 1) * 100 if before["median_ms"] else 0
+        print(
+            f"  {name:<28} {before['median_ms']:>10.1f} {result['median_ms']:>10.1f} {change:>+7.1f}%"
+            f"   {before['queries']:g} -> {result['queries']:g}"
+        )
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    params = SCALES[args.scale]
+    steam = MockSteam(
+        friends=params["friends"], games=params["games"],
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate
+    ).start()
+    os.environ["STEAM_API_BASE"] = steam.base_url
+    os.environ["IMAGE_CDN_BASE"] = steam.base_url
+    os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="steam_tracker_bench_images")
+    os.environ["STEAM_ID"] = STEAM_ID
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "steam_tracker_bench.sqlite3"))
+    os.environ["CACHE_TYPE"] = "SimpleCache"
+    # Measure the app, not the client-side quota
+    os.environ.setdefault("STEAM_RATE_BURST", "100000")
+
+    import main as tracker
+    import tasks
+    from models import db
+    from push import pusher
+
+    logging.disable(logging.INFO)
+    # Messages are still built and queued; delivery would only time the network
+    pusher.flush = pusher.discard
+
+    commit, dirty = git_revision()
+    with tracker.app.app_context():
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        seeded = seed(STEAM_ID, **params)
+        print(f"Seeded {args.scale} in {time.perf_counter() - started:.1f}s: {seeded}")
+
+        selected = scenarios(tracker, tasks, tracker.app.test_client())
+        results = {}
+        for name, (setup, run) in selected.items():
+            if args.scenario and name not in args.scenario:
+                continue
+            results[name] = measure(setup, run, args.repeat, steam, db.engine)
+            r = results[name]
+            print(
+                f"  {name:<28} median {r['median_ms']:9.1f} ms  min {r['min_ms']:9.1f}  "
+                f"queries {r['queries']:<5g} steam calls {r['steam_calls']:g}"
+                + (f"  failures {r['failures']}" if r["failures"] else "")
+            )
+        backend = db.engine.url.get_backend_name()
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": backend,
+            "scale": args.scale,
+            "params": params,
+            "seeded": seeded,
+            "repeat": args.repeat,
+            "steam_latency": args.latency,
+            "steam_jitter": args.jitter,
+            "steam_error_rate": args.error_rate,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}-{args.scale}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    steam.stop()
+
+if __name__ == "__main__":
+    main()
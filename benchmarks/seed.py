@@ -0,0 +1,104 @@
+"""Deterministic data for benchmarks: games, snapshots, rollups, friends and push subscriptions.
+
+    python -m benchmarks.seed [small|medium|large]
+
+seeds DATABASE_URL (after dropping every table). Games and friends use the
+same names and steamids as MockSteam, so syncing against the mock updates
+the seeded rows instead of replacing them.
+"""
+import os, sys, time, random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+SCALES = {
+    "small": {"games": 20, "days": 14, "interval_minutes": 30, "friends": 50, "subscriptions": 5},
+    "medium": {"games": 50, "days": 60, "interval_minutes": 15, "friends": 300, "subscriptions": 50},
+    "large": {"games": 100, "days": 180, "interval_minutes": 15, "friends": 1000, "subscriptions": 500},
+}
+# Chance that a game is being played during any one sync interval
+PLAY_PROBABILITY = 0.3
+INSERT_BATCH = 50000
+
+def _insert(table, rows):
+    from models import db
+    for i in range(0, len(rows), INSERT_BATCH):
+        db.session.execute(table.insert(), rows[i:i + INSERT_BATCH])
+
+def seed(steamid, games, days, interval_minutes, friends, subscriptions, now=None, rng_seed=1):
+    """Fill an empty schema for one tracked account; returns row counts per table."""
+    from models import (
+        db, PlayedGame, GameSnapshot, PlaytimeRollup, Friend, PushSubscription, ensure_accounts, hour_bucket
+    )
+    from benchmarks.mock_steam import friend_steamid
+
+    rng = random.Random(rng_seed)
+    now = now or datetime.utcnow()
+    start = now - timedelta(days=days)
+    step = timedelta(minutes=interval_minutes)
+    steps = int(timedelta(days=days) / step)
+    two_weeks_ago = now - timedelta(days=14)
+
+    account_id = ensure_accounts([steamid])[steamid]
+    _insert(PlayedGame.__table__, [
+        {"id": g + 1, "account_id": account_id, "appid": 200000 + g, "name": f"Game {g}",
+         "play_time_2weeks": 0, "playtime_forever": 0}
+        for g in range(games)
+    ])
+
+    snapshots, rollups = [], defaultdict(int)
+    totals, two_weeks = [1000 * (g + 1) for g in range(games)], [0] * games
+    for g in range(games):
+        snapshots.append({"game_id": g + 1, "playtime_forever": totals[g], "create_at": start})
+    for i in range(1, steps + 1):
+        at = start + step * i
+        for g in range(games):
+            if rng.random() >= PLAY_PROBABILITY:
+                continue
+            totals[g] += interval_minutes
+            snapshots.append({"game_id": g + 1, "playtime_forever": totals[g], "create_at": at})
+            rollups[(g, hour_bucket(at))] += interval_minutes
+            if at >= two_weeks_ago:
+                two_weeks[g] += interval_minutes
+    _insert(GameSnapshot.__table__, snapshots)
+    _insert(PlaytimeRollup.__table__, [
+        {"account_id": account_id, "name": f"Game {g}", "appid": 200000 + g, "bucket_start": bucket, "minutes": minutes}
+        for (g, bucket), minutes in rollups.items()
+    ])
+    for g in range(games):
+        PlayedGame.query.filter_by(id=g + 1).update(
+            {"playtime_forever": totals[g], "play_time_2weeks": two_weeks[g]}, synchronize_session=False
+        )
+
+    _insert(Friend.__table__, [
+        {"steamid": friend_steamid(i), "personaname": f"Player {friend_steamid(i)[-4:]}",
+         "avatar": f"https://avatars.example/{friend_steamid(i)}.jpg"}
+        for i in range(friends)
+    ])
+    # Unroutable endpoints: scenarios measure queueing, not delivery
+    _insert(PushSubscription.__table__, [
+        {"endpoint": f"http://127.0.0.1:9/push/{i}", "p256dh": "bench", "auth": "bench", "created_at": now}
+        for i in range(subscriptions)
+    ])
+    db.session.commit()
+    return {
+        "played_games": games,
+        "game_snapshots": len(snapshots),
+        "playtime_rollups": len(rollups),
+        "friends": friends,
+        "push_subscriptions": subscriptions,
+    }
+
+def main():
+    scale = sys.argv[1] if len(sys.argv) > 1 else "small"
+    os.environ.setdefault("STEAM_ID", "76561197960287930")
+    from main import app
+    from models import db
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        counts = seed(os.environ["STEAM_ID"], **SCALES[scale])
+        print(f"Seeded {scale} in {time.perf_counter() - started:.1f}s: {counts}")
+
+if __name__ == "__main__":
+    main()
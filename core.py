@@ -0,0 +1,41 @@
+import os, logging, tempfile, pytz
+from flask import Flask
+from flask_caching import Cache
+from dotenv import load_dotenv
+from models import db
+from swr import StaleWhileRevalidate
+
+# The Flask app, its database and cache, shared by the web app (main.py) and
+# the background worker (worker.py); routes are only registered by main.
+app = Flask(__name__)
+
+# maybe move to utils/logging_setup.py later
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+
+load_dotenv()
+REDIS_URL = os.getenv("REDIS_URL")
+app.config.update(
+    SQLALCHEMY_DATABASE_URI=os.getenv("DATABASE_URL"),
+    SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    # Redis when there is one, so payloads the worker warms are what the web
+    # service serves (render.yaml provides it to both); otherwise file-backed,
+    # shared by every process on one host
+    CACHE_TYPE=os.getenv("CACHE_TYPE", "RedisCache" if REDIS_URL else "FileSystemCache"),
+    CACHE_REDIS_URL=REDIS_URL,
+    CACHE_DIR=os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "steam_tracker_cache")),
+    CACHE_DEFAULT_TIMEOUT=600
+)
+
+cache= Cache(app)
+swr = StaleWhileRevalidate(cache)
+
+STEAM_ID = os.getenv("STEAM_ID")
+
+# On Railway -3
+tz_Minsk = pytz.timezone('Europe/Minsk')
+
+db.init_app(app)
@@ -0,0 +1,104 @@
+import io, os, csv, json
+from datetime import datetime, date, timedelta, timezone
+from sqlalchemy import select
+from models import db, PlayedGame, GameSnapshot, DailyStat, TrackedAccount
+
+# Rows fetched per round trip; on Postgres they come from a server-side cursor,
+# so memory holds one batch however large the export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 2000))
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def parse_bound(value, end=False):
+    """A date or ISO datetime (UTC) query bound; a bare date as end covers that whole day."""
+    if not value:
+        return None
+    try:
+        if len(value) == 10:
+            day = datetime.combine(date.fromisoformat(value), datetime.min.time())
+            return day + timedelta(days=1) if end else day
+        at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Not a date or datetime: {value}")
+    # Stored timestamps are naive UTC
+    return at.astimezone(timezone.utc).replace(tzinfo=None) if at.tzinfo else at
+
+def snapshots_query(since=None, until=None, appid=None, steamid=None):
+    """Every snapshot with its game and account, in (game_id, create_at) order, which the index already holds."""
+    query = (
+        select(
+            TrackedAccount.steamid,
+            PlayedGame.appid,
+            PlayedGame.name,
+            GameSnapshot.game_id,
+            GameSnapshot.playtime_forever,
+            GameSnapshot.create_at
+        )
+        .join(PlayedGame, GameSnapshot.game_id == PlayedGame.id)
+        .join(TrackedAccount, PlayedGame.account_id == TrackedAccount.id)
+        .order_by(GameSnapshot.game_id, GameSnapshot.create_at)
+    )
+    if since:
+        query = query.where(GameSnapshot.create_at >= since)
+    if until:
+        query = query.where(GameSnapshot.create_at < until)
+    if appid is not None:
+        query = query.where(PlayedGame.appid == appid)
+    if steamid:
+        query = query.where(TrackedAccount.steamid == steamid)
+    return query
+
+def daily_query(since=None, until=None, appid=None, steamid=None):
+    """The owner's daily totals by Minsk day; they are not kept per game or per account."""
+    if appid is not None or steamid:
+        raise ValueError("Daily stats cannot be filtered by game or account")
+    query = select(DailyStat.date, DailyStat.total_minutes, DailyStat.message).order_by(DailyStat.date)
+    if since:
+        query = query.where(DailyStat.date >= since.date())
+    if until:
+        # A day is in when until falls after its start
+        first_out = until.date() if until.time() == datetime.min.time() else until.date() + timedelta(days=1)
+        query = query.where(DailyStat.date < first_out)
+    return query
+
+EXPORTS = {
+    "snapshots": snapshots_query,
+    "daily": daily_query,
+}
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat() + "Z"
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def export_chunks(kind, fmt, **filters):
+    """Build the query (raising ValueError on bad filters) and return a generator of text chunks, one per batch."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    query = EXPORTS[kind](**filters)
+    columns = [c.name for c in query.selected_columns]
+
+    def generate():
+        result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        try:
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(columns)
+                for rows in result.partitions():
+                    writer.writerows([_value(v) for v in row] for row in rows)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                yield buffer.getvalue()
+            else:
+                for rows in result.partitions():
+                    yield "".join(
+                        json.dumps(dict(zip(columns, map(_value, row)))) + "\n" for row in rows
+                    )
+        finally:
+            result.close()
+
+    return generate()
@@ -0,0 +1,12 @@
+import os
+
+# Every /api/stream client holds a thread for as long as it is connected,
+# so the web service runs threaded workers; keep WEB_THREADS above
+# STREAM_MAX_CLIENTS so ordinary requests still get served.
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", 64))
+
+def post_worker_init(worker):
+    # Covers are prefetched into this service's IMAGE_CACHE_DIR, so the web process runs those jobs
+    from main import start_web_jobs
+    start_web_jobs()
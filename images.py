@@ -0,0 +1,204 @@
+import os, io, hashlib, logging, tempfile, threading
+import requests
+from metrics import cache_requests
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "steam_tracker_images"))
+CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_MB", 256)) * 1024 * 1024
+# Eviction frees down to this share of the cap, so the next few misses do not evict again
+EVICT_TO = 0.9
+CDN_BASE = os.getenv("IMAGE_CDN_BASE", "https://cdn.cloudflare.steamstatic.com/")
+# Browsers reuse a variant this long without asking; the ETag covers revalidation after
+MAX_AGE = int(os.getenv("IMAGE_MAX_AGE", 7 * 24 * 60 * 60))
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", 80))
+FETCH_TIMEOUT = (3.05, 15)
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+# Widths each kind may be served at; the first is the default. Sources are never upscaled.
+VARIANTS = {
+    "cover": (640, 320, 1280),
+    "avatar": (64, 32, 184),
+}
+
+class ImageError(Exception):
+    pass
+
+def image_path(kind, id):
+    """Where the app serves an image, for payloads built outside a request."""
+    return f"/img/{kind}/{id}"
+
+def cover_url(appid):
+    return f"{CDN_BASE}steam/apps/{appid}/library_hero.jpg"
+
+class ImageCache:
+    """Resized images on disk, shared by every process on the host.
+
+    Variants are stored content-addressed under objects/ (the SHA-256 of the
+    bytes, which doubles as the ETag), and refs/ maps a source URL and width
+    to one. A hit touches its object, so once the cache grows past max_bytes
+    the least recently served objects are evicted; refs left pointing at
+    them count as misses.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.session = requests.Session()
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _ref_path(self, url, width):
+        key = hashlib.sha256(f"{url}\n{width}".encode()).hexdigest()
+        return os.path.join(self.directory, "refs", key[:2], key)
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _lookup(self, url, width):
+        try:
+            with open(self._ref_path(url, width)) as f:
+                digest, mimetype = f.read().split()
+            path = self._object_path(digest)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return digest, path, mimetype
+
+    def get(self, url, width):
+        """(digest, path, mimetype) of url resized to width, fetched on the first request only."""
+        found = self._lookup(url, width)
+        if found:
+            cache_requests.inc(cache="images", result="hit")
+            return found
+
+        # One fetch per variant in this process, however many requests wait for it
+        with self._locks_lock:
+            lock = self._locks.setdefault((url, width), threading.Lock())
+        try:
+            with lock:
+                found = self._lookup(url, width)
+                if found:
+                    cache_requests.inc(cache="images", result="hit")
+                    return found
+                cache_requests.inc(cache="images", result="miss")
+                data, mimetype = self._resize(self._fetch(url), width)
+                found = self._store(url, width, data, mimetype)
+        finally:
+            with self._locks_lock:
+                self._locks.pop((url, width), None)
+        self.evict()
+        return found
+
+    def _fetch(self, url):
+        try:
+            response = self.session.get(url, timeout=FETCH_TIMEOUT)
+        except requests.RequestException as e:
+            raise ImageError(f"{url}: {e}")
+        if response.status_code != 200:
+            raise ImageError(f"{url}: HTTP {response.status_code}")
+        if not response.headers.get("Content-Type", "").startswith("image/"):
+            raise ImageError(f"{url}: not an image")
+        if len(response.content) > MAX_SOURCE_BYTES:
+            raise ImageError(f"{url}: {len(response.content)} bytes")
+        return response.content, response.headers["Content-Type"].split(";")[0].strip()
+
+    def _resize(self, source, width):
+        data, mimetype = source
+        # Without Pillow the source is kept as is, which still saves the trip to the CDN
+        if Image is None:
+            return data, mimetype
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.load()
+                if image.width > width:
+                    image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+                if image.mode not in ("RGB", "RGBA"):
+                    alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+                    image = image.convert("RGBA" if alpha else "RGB")
+                out = io.BytesIO()
+                image.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+        except (OSError, ValueError) as e:
+            raise ImageError(f"Could not convert image: {e}")
+        return out.getvalue(), "image/webp"
+
+    def _store(self, url, width, data, mimetype):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            _write(path, data)
+        _write(self._ref_path(url, width), f"{digest} {mimetype}".encode())
+        return digest, path, mimetype
+
+    def size(self):
+        return sum(size for _, size, _ in self._objects())
+
+    def _objects(self):
+        objects = []
+        for root, _, files in os.walk(os.path.join(self.directory, "objects")):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                objects.append((name, stat.st_size, stat.st_mtime))
+        return objects
+
+    def evict(self):
+        """Delete the least recently served objects while the cache is over its cap; returns bytes freed."""
+        objects = self._objects()
+        total = sum(size for _, size, _ in objects)
+        if total <= self.max_bytes:
+            return 0
+        freed, evicted = 0, set()
+        for digest, size, _ in sorted(objects, key=lambda o: o[2]):
+            if total - freed <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(self._object_path(digest))
+            except OSError:
+                continue
+            freed += size
+            evicted.add(digest)
+        self._drop_refs(evicted)
+        logger.info(f"Image cache: evicted {len(evicted)} images, {freed} bytes")
+        return freed
+
+    def _drop_refs(self, digests):
+        for root, _, files in os.walk(os.path.join(self.directory, "refs")):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    with open(path) as f:
+                        if f.read().split(" ", 1)[0] in digests:
+                            os.remove(path)
+                except OSError:
+                    continue
+
+    def prefetch(self, urls, width):
+        """Fetch urls ahead of their first request; failures are logged, never raised."""
+        fetched = 0
+        for url in urls:
+            try:
+                self.get(url, width)
+                fetched += 1
+            except ImageError as e:
+                logger.warning(f"Image prefetch failed: {e}")
+        return fetched
+
+def _write(path, data):
+    # Written aside and renamed, so readers in other processes never see half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+image_cache = ImageCache()
@@ -0,0 +1,222 @@
+import os, json, time, random, socket, logging, threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from sqlalchemy.exc import OperationalError
+from models import db, QueuedJob, dialect_insert
+from metrics import registry, job_duration
+
+logger = logging.getLogger(__name__)
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+# Retry n waits a random time up to min(JOB_BACKOFF_CAP, JOB_BACKOFF_BASE * 2**(n-1)) seconds
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", 30))
+JOB_BACKOFF_CAP = float(os.getenv("JOB_BACKOFF_CAP", 3600))
+# A job running longer than this is assumed to have lost its worker and is queued again
+JOB_LEASE = timedelta(minutes=int(os.getenv("JOB_LEASE_MINUTES", 10)))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1))
+JOB_WORKER_THREADS = int(os.getenv("JOB_WORKER_THREADS", 2))
+JOB_RETENTION = timedelta(days=int(os.getenv("JOB_RETENTION_DAYS", 14)))
+# Kinds that write to the web service's own disk, so only a queue worker in the web process claims them
+WEB_KINDS = {"prefetch_covers"}
+
+queue_jobs = registry.counter("queue_jobs_total", "Queued jobs finished by kind and outcome.", ["kind", "outcome"])
+
+# kind -> function(**payload); its return value is stored as the job's result
+handlers = {}
+
+def handler(kind):
+    def decorator(f):
+        handlers[kind] = f
+        return f
+    return decorator
+
+def enqueue(kind, payload=None, run_at=None, dedupe_key=None, max_attempts=JOB_MAX_ATTEMPTS):
+    """Add a job to the current transaction; returns its id, or None if dedupe_key was already used."""
+    row = {
+        "kind": kind,
+        "payload": json.dumps(payload or {}),
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": run_at or datetime.utcnow(),
+        "dedupe_key": dedupe_key,
+        "created_at": datetime.utcnow()
+    }
+    stmt = dialect_insert(QueuedJob).values(row)
+    if dedupe_key is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["dedupe_key"])
+    return db.session.execute(stmt.returning(QueuedJob.id)).scalar()
+
+def claim(worker_id, limit=1, kinds=None, exclude=()):
+    """Mark up to limit due jobs as running by worker_id and commit; returns them.
+
+    kinds, if given, limits the claim to those kinds; exclude leaves those out.
+
+    On Postgres concurrent workers skip each other's rows (FOR UPDATE SKIP
+    LOCKED). SQLite has no row locks and ignores the clause, but it runs one
+    writer at a time, so the single UPDATE still hands each job out once.
+    """
+    now = datetime.utcnow()
+    due = (
+        select(QueuedJob.id)
+        .where(QueuedJob.status == "queued", QueuedJob.run_at <= now)
+        .order_by(QueuedJob.run_at, QueuedJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if kinds is not None:
+        due = due.where(QueuedJob.kind.in_(kinds))
+    if exclude:
+        due = due.where(QueuedJob.kind.not_in(exclude))
+    table = QueuedJob.__table__
+    jobs = db.session.execute(
+        table.update()
+        .where(table.c.id.in_(due.scalar_subquery()), table.c.status == "queued")
+        .values(status="running", locked_by=worker_id, locked_at=now, attempts=table.c.attempts + 1)
+        .returning(table.c.id, table.c.kind, table.c.payload, table.c.attempts, table.c.max_attempts)
+    ).all()
+    db.session.commit()
+    return jobs
+
+def _finish(job_id, worker_id, **values):
+    # Only the worker that still holds the job may finish it
+    table = QueuedJob.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.id == job_id, table.c.status == "running", table.c.locked_by == worker_id)
+        .values(locked_by=None, locked_at=None, **values)
+    )
+    db.session.commit()
+
+def retry_delay(attempts):
+    return random.uniform(0, min(JOB_BACKOFF_CAP, JOB_BACKOFF_BASE * 2 ** (attempts - 1)))
+
+def run(job, worker_id):
+    """Run one claimed job inside an app context; retries or fails it on error."""
+    started = time.perf_counter()
+    try:
+        result = handlers[job.kind](**json.loads(job.payload))
+    except Exception as e:
+        db.session.rollback()
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            logger.warning(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}, retrying in {delay:.0f}s: {e}")
+            _finish(
+                job.id, worker_id, status="queued", last_error=str(e),
+                run_at=datetime.utcnow() + timedelta(seconds=delay)
+            )
+            queue_jobs.inc(kind=job.kind, outcome="retried")
+        else:
+            logger.error(f"Job {job.id} ({job.kind}) failed after {job.attempts} attempts: {e}", exc_info=True)
+            _finish(job.id, worker_id, status="failed", last_error=str(e), finished_at=datetime.utcnow())
+            queue_jobs.inc(kind=job.kind, outcome="failed")
+        return False
+    finally:
+        job_duration.observe(time.perf_counter() - started, job=f"queue:{job.kind}")
+    _finish(
+        job.id, worker_id, status="succeeded", result=json.dumps(result, default=str), finished_at=datetime.utcnow()
+    )
+    queue_jobs.inc(kind=job.kind, outcome="succeeded")
+    return True
+
+def requeue_expired():
+    """Queue again the jobs whose worker went away mid-run; their attempt still counts."""
+    count = QueuedJob.query.filter(
+        QueuedJob.status == "running", QueuedJob.locked_at < datetime.utcnow() - JOB_LEASE
+    ).update(
+        {"status": "queued", "locked_by": None, "locked_at": None, "last_error": "Lease expired"},
+        synchronize_session=False
+    )
+    db.session.commit()
+    if count:
+        logger.warning(f"Requeued {count} jobs whose worker stopped responding")
+    return count
+
+def prune():
+    """Drop finished jobs past JOB_RETENTION."""
+    count = QueuedJob.query.filter(
+        QueuedJob.finished_at < datetime.utcnow() - JOB_RETENTION
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+def job_status(job_id):
+    job = db.session.get(QueuedJob, job_id)
+    if job is None:
+        return None
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_at": job.run_at.isoformat() + "Z",
+        "created_at": job.created_at.isoformat() + "Z" if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() + "Z" if job.finished_at else None,
+        "last_error": job.last_error,
+        "result": json.loads(job.result) if job.result else None
+    }
+
+def queue_stats():
+    counts = (
+        db.session.query(QueuedJob.kind, QueuedJob.status, func.count())
+        .group_by(QueuedJob.kind, QueuedJob.status)
+        .all()
+    )
+    stats = {}
+    for kind, status, count in counts:
+        stats.setdefault(kind, {})[status] = count
+    return stats
+
+class QueueWorker:
+    """Threads that claim and run queued jobs; any number of processes may run one."""
+
+    def __init__(self, app, threads=JOB_WORKER_THREADS, poll_seconds=JOB_POLL_SECONDS, kinds=None, exclude=()):
+        self.app = app
+        self.threads = threads
+        self.poll_seconds = poll_seconds
+        self.kinds = kinds
+        self.exclude = exclude
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._loop, args=(f"{self.name}:{i}",), name=f"queue-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job queue worker {self.name} started with {self.threads} threads")
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_once(self, worker_id=None):
+        """Claim and run one due job; False if there was none."""
+        worker_id = worker_id or f"{self.name}:{threading.current_thread().name}"
+        jobs = claim(worker_id, kinds=self.kinds, exclude=self.exclude)
+        for job in jobs:
+            run(job, worker_id)
+        return bool(jobs)
+
+    def _loop(self, worker_id):
+        last_requeue = 0
+        while not self._stop.is_set():
+            worked = False
+            with self.app.app_context():
+                try:
+                    if time.monotonic() - last_requeue > JOB_LEASE.total_seconds() / 2:
+                        requeue_expired()
+                        last_requeue = time.monotonic()
+                    worked = self.run_once(worker_id)
+                except OperationalError as e:
+                    # e.g. SQLite busy under many writers, or the database restarting
+                    db.session.rollback()
+                    logger.warning(f"Job queue unavailable: {e}")
+                finally:
+                    db.session.remove()
+            if not worked:
+                self._stop.wait(self.poll_seconds * random.uniform(0.5, 1.5))
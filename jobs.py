@@ -0,0 +1,165 @@
+import os, time, zlib, logging, tempfile
+from datetime import datetime, timezone
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.pool import NullPool
+from core import app, tz_Minsk
+from models import db, DailyStat, QueuedJob
+from metrics import instrument_scheduler
+from tasks import (
+    POLL_TICK_SECONDS, scheduled_update, daily_stat_job, snapshot_retention, friend_playtime_job, achievements_job,
+    enqueue_daily_stats
+)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Every scheduled job, by id. Jobs are kept in JOB_STORE_TABLE so a restart
+# resumes the stored schedule: a daily job missed while no scheduler was up
+# still runs once (coalesced) when one comes back. The daily stat job only
+# queues work (job_queue.py), so it is retried if it fails.
+JOBS = {
+    "steam_update": {"func": scheduled_update, "trigger": IntervalTrigger(seconds=POLL_TICK_SECONDS), "run_at_start": True},
+    "daily_stat_job": {"func": daily_stat_job, "trigger": CronTrigger(hour=9, minute=40, timezone=tz_Minsk)},
+    "snapshot_retention_job": {"func": snapshot_retention, "trigger": CronTrigger(hour=4, minute=20, timezone=tz_Minsk)},
+    "friend_playtime_job": {
+        "func": friend_playtime_job, "trigger": IntervalTrigger(seconds=POLL_TICK_SECONDS), "run_at_start": True
+    },
+    # Picks up the games each sync moved; a run with nothing pending only costs one query
+    "achievements_job": {
+        "func": achievements_job, "trigger": IntervalTrigger(seconds=POLL_TICK_SECONDS), "run_at_start": True
+    },
+}
+
+JOB_STORE_TABLE = "apscheduler_jobs"
+# How long a standby worker waits before trying for the scheduler lock again
+SCHEDULER_LOCK_RETRY_SECONDS = int(os.getenv("SCHEDULER_LOCK_RETRY_SECONDS", 30))
+SCHEDULER_LOCK_PATH = os.getenv(
+    "SCHEDULER_LOCK_PATH", os.path.join(tempfile.gettempdir(), "steam_tracker_scheduler.lock")
+)
+
+def exclude_job_store(obj, name, type_, reflected, compare_to):
+    """Alembic include_object hook: the job store table belongs to APScheduler, not to migrations."""
+    return not (type_ == "table" and name == JOB_STORE_TABLE)
+
+class SchedulerLock:
+    """Held for the life of the process by the one instance that runs the scheduler.
+
+    On Postgres this is a session advisory lock on a dedicated connection, so it
+    is released as soon as the holder's connection goes away. Other databases
+    (SQLite) can only be shared by processes on one host, so a file lock will do.
+    """
+
+    KEY = zlib.crc32(b"steam_tracker_scheduler")
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._conn = None
+        self._file = None
+
+    def acquire(self):
+        if self.engine.dialect.name == "postgresql":
+            engine = create_engine(self.engine.url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+            conn = engine.connect()
+            if conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.KEY}).scalar():
+                self._conn = conn
+                return True
+            conn.close()
+            return False
+        if fcntl is None:
+            return True
+        f = open(SCHEDULER_LOCK_PATH, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def alive(self):
+        """False once the lock can no longer be vouched for (its connection dropped)."""
+        if self._conn is None:
+            return True
+        try:
+            self._conn.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            logger.error(f"Lost the scheduler lock connection: {e}")
+            return False
+
+    def release(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def create_scheduler():
+    with app.app_context():
+        engine = db.engine
+    if engine.url.get_backend_name() == "sqlite" and engine.url.database in (None, "", ":memory:"):
+        # Another connection would see another in-memory database
+        store = MemoryJobStore()
+    else:
+        store = SQLAlchemyJobStore(engine=engine, tablename=JOB_STORE_TABLE)
+    scheduler = BackgroundScheduler(
+        jobstores={"default": store},
+        job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": None}
+    )
+    instrument_scheduler(scheduler)
+    return scheduler
+
+def sync_jobs(scheduler):
+    """Make the stored jobs match JOBS, keeping the next run time of jobs that did not change."""
+    for job in scheduler.get_jobs():
+        if job.id not in JOBS:
+            logger.info(f"Removing job {job.id} that is no longer registered")
+            job.remove()
+    for job_id, spec in JOBS.items():
+        stored = scheduler.get_job(job_id)
+        func_ref = f"{spec['func'].__module__}:{spec['func'].__name__}"
+        if stored is not None and stored.func_ref == func_ref and str(stored.trigger) == str(spec["trigger"]):
+            continue
+        options = {"next_run_time": datetime.now(timezone.utc)} if spec.get("run_at_start") else {}
+        scheduler.add_job(
+            func=func_ref, trigger=spec["trigger"], id=job_id, replace_existing=True, **options
+        )
+
+def start_scheduler(wait=False):
+    """Start the jobs in this process if no other process runs them; returns (scheduler, lock) or None.
+
+    With wait=True this blocks, retrying the lock, until the other instance goes away.
+    """
+    with app.app_context():
+        lock = SchedulerLock(db.engine)
+    while not lock.acquire():
+        if not wait:
+            logger.info("Another process holds the scheduler lock; not starting jobs here.")
+            return None
+        time.sleep(SCHEDULER_LOCK_RETRY_SECONDS)
+
+    scheduler = create_scheduler()
+    scheduler.start(paused=True)
+    sync_jobs(scheduler)
+    scheduler.resume()
+    with app.app_context():
+        # Days whose stat was missed for longer than the job store remembers
+        tables = inspect(db.engine)
+        if tables.has_table(DailyStat.__tablename__) and tables.has_table(QueuedJob.__tablename__):
+            enqueue_daily_stats()
+        else:
+            logger.warning("Database schema not created yet (run `flask init-db`); skipping the daily stat catch-up.")
+    return scheduler, lock
@@ -1,400 +1,236 @@
-import requests, os, random, json, time, logging, pytz
-from flask import Flask, render_template, jsonify, request, g
-from models import db, PlayedGame, GameSnapshot, Friend, DailyStat, PushSubscription
-from dotenv import load_dotenv
-from apscheduler.schedulers.background import BackgroundScheduler
+import os, json, logging, click
+from flask import Response, render_template, jsonify, request, send_file, stream_with_context, url_for
+from core import app, swr, tz_Minsk
+from models import (
+    db, PlayedGame, GameSnapshot, Friend, DailyStat, PushSubscription, PlaytimeRollup, TrackedAccount,
+    Achievement, PlayerAchievement, upsert, hour_bucket, ensure_accounts
+)
+from tasks import (
+    POLL_INTERVAL, FRIEND_REFRESH_INTERVAL,
+    daily_totals, daily_message, primary_account_id, store_friend_playtime
+)
+from jobs import start_scheduler, exclude_job_store
+from job_queue import QueueWorker, WEB_KINDS, enqueue, job_status, queue_stats
+from push import pusher
+from steam_client import steam
+from steam_async import fetcher
+from stream import stream, StreamFull
+from metrics import registry, instrument_app, CONTENT_TYPE
+from retention import run_retention, exclude_snapshot_partitions
+from images import VARIANTS, MAX_AGE, ImageError, image_cache, cover_url
+from export import EXPORTS, FORMATS, export_chunks, parse_bound
+from payloads import friend_leaderboard
+import analytics
 from datetime import datetime, timedelta
-from pywebpush import webpush, WebPushException
 from collections import defaultdict
-from sqlalchemy import func, and_, asc
-from flask_migrate import Migrate
-from concurrent.futures import ThreadPoolExecutor
-from flask_caching import Cache
-
-app = Flask(__name__)
-migrate = Migrate(app, db)
-
-# maybe move to utils/logging_setup.py later
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
+from sqlalchemy import func
+from flask_migrate import Migrate, upgrade
 
-logger = logging.getLogger(__name__)
-
-load_dotenv()
-app.config.update(
-    SQLALCHEMY_DATABASE_URI=os.getenv("DATABASE_URL"),
-    SQLALCHEMY_TRACK_MODIFICATIONS=False,
-    CACHE_TYPE='simple',
-    CACHE_DEFAULT_TIMEOUT=600
+migrate = Migrate(
+    app, db, include_object=lambda *args: exclude_job_store(*args) and exclude_snapshot_partitions(*args)
 )
+instrument_app(app)
 
-cache= Cache(app)
-
-STEAM_API_KEY = os.getenv("STEAM_API_KEY")
-STEAM_ID = os.getenv("STEAM_ID")
-STEAM_BASE = "http://api.steampowered.com/"
-STEAM_RECENTLY_PLAYED_GAMES = f"{STEAM_BASE}IPlayerService/GetRecentlyPlayedGames/v0001/"
-STEAM_FRIEND_LIST = f"{STEAM_BASE}ISteamUser/GetFriendList/v0001/"
-STEAM_PLAYER_SUMMARIES = f"{STEAM_BASE}ISteamUser/GetPlayerSummaries/v0002/"
-
-# On Railway -3
-tz_Minsk = pytz.timezone('Europe/Minsk')
-
-db.init_app(app)
+logger = logging.getLogger(__name__)
 
 @app.cli.command("init-db")
 def init_db_command():
+    # Schema changes live in migrations/; the baseline revision adopts databases made by create_all()
     with app.app_context():
-        db.create_all()         
-
-def save_games_to_db(games_list):
-    saved, updated, deleted = 0, 0, 0
-    
-    current_games = [g.get("name") for g in games_list if g.get("name")]
-    old_games = PlayedGame.query.filter(~PlayedGame.name.in_(current_games)).all()
-    
-    phrases_for_deleted = [
-        "\"{}\" has dropped out of the recent",
-        "\"{}\" did not start for more than two weeks",
-        "Goodbye, \"{}\""
-    ]
-    
-    phrases_for_saved = [
-        "You started playing \"{}\"",
-        "Welcome aboard, \"{}\"",
-        "\"{}\" added to statistics"
-    ]
-    
-    for game in old_games:
-        name = game.name
-        GameSnapshot.query.filter_by(game_id=game.id).delete(synchronize_session='fetch')
-        db.session.delete(game)
-        deleted += 1
-        
-        message = random.choice(phrases_for_deleted).format(name)
-        send_push(message)
-    
-    snapshots_to_add = []
-    game_map = {}
+        upgrade()
+
+@app.cli.command("backfill-daily")
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), required=True, help="First Minsk day to fill.")
+def backfill_daily_command(since):
+    """Fill every missing DailyStat row from --since up to yesterday."""
+    first_day = since.date()
+    last_day = datetime.now(tz_Minsk).date() - timedelta(days=1)
+    if first_day > last_day:
+        print("Nothing to backfill")
+        return
     
-    for g in games_list:
-        name = g.get("name")
-        appid = g.get("appid")
-        
-        if not name:
-            continue
-        
-        playtime_2weeks = g.get("playtime_2weeks", 0)
-        playtime_forever = g.get("playtime_forever", 0)
-        
-        game = PlayedGame.query.filter_by(name=name).first()
-        
-        if game is None:
-            game = PlayedGame(
-                name=name,
-                appid=appid,
-                play_time_2weeks=playtime_2weeks,
-                playtime_forever=playtime_forever
-            )
-            db.session.add(game)
-            saved += 1
-            
-            message = random.choice(phrases_for_saved).format(name)
-            send_push(message)
-        else:
-            #  check later
-            game.appid = appid
-            game.play_time_2weeks = playtime_2weeks
-            game.playtime_forever = playtime_forever
-            updated += 1
-        
-        game_map[name] = game
+    existing = {
+        d for (d,) in db.session.query(DailyStat.date)
+        .filter(DailyStat.date >= first_day, DailyStat.date <= last_day)
+    }
+    totals = daily_totals(first_day, last_day)
     
-    db.session.flush()
-
-    for name, game in game_map.items():
-        if not game.id:
-            continue
-        
-        last_snapshot = (
-            GameSnapshot.query
-            .filter_by(game_id=game.id)
-            .order_by(GameSnapshot.create_at.desc())
-            .first()
-        )
-
-        if not last_snapshot or last_snapshot.playtime_forever != game.playtime_forever:
-            snapshot = GameSnapshot(
-                game_id=game.id,
-                playtime_forever=game.playtime_forever
-            )
-            snapshots_to_add.append(snapshot)
-            
-    if snapshots_to_add:
-        db.session.bulk_save_objects(snapshots_to_add)
+    rows = []
+    day = first_day
+    while day <= last_day:
+        if day not in existing:
+            total_minutes = sum(totals.get(day, {}).values())
+            rows.append({
+                "date": day,
+                "total_minutes": total_minutes,
+                "message": daily_message(round(total_minutes / 60, 1))
+            })
+        day += timedelta(days=1)
     
-    # Remove old snapshots    
-    non_actual_snapshots_Minsk = datetime.now(tz_Minsk) - timedelta(days=8)
-    non_actual_snapshots = non_actual_snapshots_Minsk.astimezone(pytz.utc).replace(tzinfo=None)
-    deleted_count = GameSnapshot.query.filter(
-        GameSnapshot.create_at < non_actual_snapshots
-    ).delete(synchronize_session='fetch')
-    if deleted_count > 0:
-        logger.info(f"Removed {deleted_count} old snapshots")
-            
-    db.session.commit()
-    return {"saved": saved, "updated": updated, "deleted": deleted}
-
-def update_daily_stat():
-    with app.app_context():
-        logger.info("Starting daily statistics update.")
-        
-        now_Minsk = datetime.now(tz_Minsk)
-        today = now_Minsk.date()
-        yesterday = today - timedelta(days=1)
-        
-        start_Minsk = datetime.combine(yesterday, datetime.min.time(), tzinfo=tz_Minsk)
-        end_Minsk = datetime.combine(today, datetime.min.time(), tzinfo=tz_Minsk)
-        
-        start = start_Minsk.astimezone(pytz.utc).replace(tzinfo=None)
-        end = end_Minsk.astimezone(pytz.utc).replace(tzinfo=None)
-        
-        snapshots = GameSnapshot.query.filter(
-                GameSnapshot.create_at >= start,
-                GameSnapshot.create_at < end
-            ).order_by(asc(GameSnapshot.create_at)).all()
-        
-        if not snapshots:
-            logger.info(f"No snapshots from {start} to {end}")
-            send_push("Are you alive? 🙂‍")
-            return
-        
-        stats_dict = {}
-        for snap in snapshots:
-            game = PlayedGame.query.get(snap.game_id)
-            if not game:
-                logger.debug(f"Skipping snapshot {snap.id}, game {snap.game_id} not found in PlayedGame.")
-                continue
-            name = game.name
-            if name not in stats_dict:
-                stats_dict[name] = {"start": snap.playtime_forever, "end": snap.playtime_forever}
-            else:
-                stats_dict[name]["end"] = snap.playtime_forever
-                
-        total_minutes = sum(v["end"] - v["start"] for v in stats_dict.values())
-        total_hours = round(total_minutes / 60, 1)
-        
-        phrases = (
-                    [
-                        f"Come on! {total_hours}h! Really? Go touch the grass today!",
-                        f"{total_hours}h! You can't live yesterday again",
-                        f"If you spent {total_hours} hours every day learning programming, you would have been on the Forbes list a long time ago.",
-                        f"You played for {total_hours} hours yesterday. 🥴",
-                        f"{total_hours} hours! 🖕"
-                    ]
-                    if total_hours > 2 else
-                    [
-                        f"{total_hours}h! I hope yesterday was a really great day!",
-                        f"Just {total_hours}h. Life really is beautiful, isn't it?",
-                        f"Well... {total_hours}h. This is truly a success.",
-                        f"You played for {total_hours} hours yesterday. 😎",
-                        f"{total_hours} hours! 🤘"
-                    ]
-                )
-            
-        message = random.choice(phrases)
-        
-        if total_minutes > 0:
-            send_push(message)
-        else:
-            send_push("0h! Need to fix a bug.")
-            logger.info("Total playtime was 0 hours.")
-            logger.debug(f"Debug stats dictionary for {yesterday}: {stats_dict}")
-        
-        stat = DailyStat(date=yesterday, total_minutes=int(total_minutes), message=message)
-        db.session.merge(stat)
+    if rows:
+        db.session.execute(DailyStat.__table__.insert(), rows)
         db.session.commit()
-        
-        logger.info(f"Daily stat updated for {yesterday}. Total hours: {total_hours}")  
-
-def scheduled_update():
-    with app.app_context():
-        logger.info("Starting automatic updates...")
-        try:
-            params = {
-                "key": STEAM_API_KEY,
-                "steamid": STEAM_ID,
-                "format": "json"
-            }
-            r = requests.get(STEAM_RECENTLY_PLAYED_GAMES, params=params)  
-            data = r.json().get("response", {})
-            games = data.get("games", [])
-            
-            result = save_games_to_db(games)
-            logger.info(f"Updated: {result}")
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"An error occurred during scheduled update: {e}", exc_info=True)
-            
-def update_friends():
-    params = {
-        "key": STEAM_API_KEY,
-        "steamid": STEAM_ID,
-        "relationship": "friend"
-    }
-    r = requests.get(STEAM_FRIEND_LIST, params=params)
-    friends_data = r.json().get("friendslist", {}).get("friends", [])
-    
-    count = 0
-    for f in friends_data:
-        friend_id = f["steamid"]
-        info_params = {"key": STEAM_API_KEY, "steamids": friend_id}
-        info_r = requests.get(STEAM_PLAYER_SUMMARIES, params=info_params)
-        player = info_r.json().get("response", {}).get("players", [])
-        
-        if not player:
-            continue
-        
-        name = player[0].get("personaname", "Unknown")
-        avatar = player[0].get("avatar", "")
-        
-        existing = Friend.query.filter_by(steamid=friend_id).first()
-        if existing:
-            existing.personaname = name
-            existing.avatar = avatar
-        else:
-            db.session.add(Friend(steamid=friend_id, personaname=name, avatar=avatar))
-        count += 1
-        
+    print(f"Backfilled {len(rows)} daily stats from {first_day} to {last_day}")
+
+@app.cli.command("track-account")
+@click.argument("steamids", nargs=-1, required=True)
+def track_account_command(steamids):
+    """Start polling the given Steam accounts."""
+    ids = ensure_accounts(steamids, interval=POLL_INTERVAL)
+    TrackedAccount.query.filter(TrackedAccount.id.in_(ids.values())).update(
+        {"enabled": True}, synchronize_session=False
+    )
     db.session.commit()
-    return f"Updated {count} friends"
+    print(f"Tracking {len(ids)} accounts")
 
-def send_push(body):
-    subscriptions = PushSubscription.query.all()
-    if not subscriptions:
-        logger.info("No active push subscriptions found.")
-        return
+@app.cli.command("track-friends")
+def track_friends_command():
+    """Start polling every stored friend."""
+    steamids = [sid for (sid,) in db.session.query(Friend.steamid)]
+    ids = ensure_accounts(steamids, interval=POLL_INTERVAL)
+    db.session.commit()
+    print(f"Tracking {len(ids)} friend accounts")
+
+@app.cli.command("untrack-account")
+@click.argument("steamids", nargs=-1, required=True)
+def untrack_account_command(steamids):
+    """Stop polling the given accounts; their history is kept."""
+    count = TrackedAccount.query.filter(TrackedAccount.steamid.in_(steamids)).update(
+        {"enabled": False}, synchronize_session=False
+    )
+    db.session.commit()
+    print(f"Disabled {count} accounts")
+
+@app.cli.command("compact-snapshots")
+def compact_snapshots_command():
+    """Run the snapshot retention tiers once."""
+    print(run_retention())
+
+@app.cli.command("export")
+@click.argument("kind", type=click.Choice(sorted(EXPORTS)))
+@click.option("--format", "fmt", type=click.Choice(sorted(FORMATS)), default="csv", show_default=True)
+@click.option("--since", help="First date or UTC datetime to include.")
+@click.option("--until", help="Last date to include, or UTC datetime to stop before.")
+@click.option("--appid", type=int, help="Only this game.")
+@click.option("--steamid", help="Only this tracked account.")
+@click.option("--output", type=click.File("w"), default="-", help="File to write; stdout by default.")
+def export_command(kind, fmt, since, until, appid, steamid, output):
+    """Write snapshot or daily-stat history as CSV or NDJSON, streamed in batches."""
+    try:
+        chunks = export_chunks(
+            kind, fmt,
+            since=parse_bound(since), until=parse_bound(until, end=True), appid=appid, steamid=steamid
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    for chunk in chunks:
+        output.write(chunk)
+
+@app.cli.command("backfill-rollup")
+def backfill_rollup_command():
+    """Rebuild hourly playtime rollups from the raw snapshots still stored."""
+    previous = func.lag(GameSnapshot.playtime_forever).over(
+        partition_by=GameSnapshot.game_id,
+        order_by=(GameSnapshot.create_at, GameSnapshot.id)
+    )
+    rows = (
+        db.session.query(
+            PlayedGame.account_id,
+            PlayedGame.name,
+            PlayedGame.appid,
+            GameSnapshot.create_at,
+            GameSnapshot.playtime_forever,
+            previous.label("previous")
+        )
+        .join(PlayedGame, GameSnapshot.game_id == PlayedGame.id)
+        .all()
+    )
     
-    payload = json.dumps({
-        "body": body,
-        "icon": "/static/pics/icon0.png"
-    })
+    buckets = defaultdict(int)
+    appids = {}
+    for account_id, name, appid, create_at, playtime, prev in rows:
+        if prev is not None and playtime > prev:
+            buckets[(account_id, name, hour_bucket(create_at))] += playtime - prev
+            appids[(account_id, name)] = appid
     
-    for sub in subscriptions:
-        try:
-            webpush(
-                subscription_info={
-                    "endpoint": sub.endpoint,
-                    "keys": {
-                        "p256dh": sub.p256dh,
-                        "auth": sub.auth
-                    }
-                },
-                data=payload,
-                vapid_private_key=os.getenv("VAPID_PRIVATE_KEY"),
-                vapid_claims={
-                    "sub": f"mailto:{os.getenv('VAPID_ADMIN_EMAIL')}"
-                }
-            )
-            logger.debug(f"Push successfully sent to endpoint: {sub.endpoint[:60]}.")
-        except WebPushException as e:
-            logger.warning(f"Push notification failed for endpoint {sub.endpoint[:60]}.")
+    upsert(
+        PlaytimeRollup,
+        [
+            {
+                "account_id": account_id,
+                "name": name,
+                "appid": appids[(account_id, name)],
+                "bucket_start": bucket,
+                "minutes": minutes
+            }
+            for (account_id, name, bucket), minutes in buckets.items()
+        ],
+        index_elements=["account_id", "name", "bucket_start"],
+        update_columns=["appid", "minutes"]
+    )
+    db.session.commit()
+    print(f"Backfilled {len(buckets)} hourly rollups from {len(rows)} snapshots")
 
 @app.route('/')
 def home():
     return render_template("index.html", vapid_public_key=os.getenv("VAPID_PUBLIC_KEY"))
 
 @app.route('/api/recent-games')
-@cache.cached(timeout=600)
 def api_recent_games():
-    params = {
-        "key": STEAM_API_KEY,
-        "steamid": STEAM_ID,
-        "format": "json"
-    }
+    return swr.serve("recent-games")
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events with per-game playtime changes from each sync of the owner's account."""
     try:
-        response = requests.get(STEAM_RECENTLY_PLAYED_GAMES, params=params)
-        if response.status_code != 200:
-            return jsonify([])
-        
-        games = response.json().get("response", {}).get("games", [])
-        return jsonify(games)
-    except Exception as e:
-        logger.error(f"Error fetching recent games: {e}")
-        return jsonify([])
+        events = stream.subscribe(request.headers.get("Last-Event-ID", type=int))
+    except StreamFull:
+        return jsonify({"error": "Too many stream clients"}), 503
+    
+    def generate():
+        yield "retry: 5000\n\n"
+        for event in events:
+            if event is None:
+                yield ": ping\n\n"
+                continue
+            event_id, kind, data = event
+            yield f"id: {event_id}\nevent: {kind}\ndata: {data}\n\n"
+    
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/api/stream/stats')
+def stream_stats():
+    return jsonify({**stream.stats, "clients": stream.clients()})
+
+def queued(kind, payload=None):
+    """202 response for work handed to the job queue; poll status_url for the outcome."""
+    job_id = enqueue(kind, payload)
+    db.session.commit()
+    status_url = url_for("job_status_api", job_id=job_id)
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": status_url}), 202, {"Location": status_url}
 
 @app.route('/save_recent')
 def save_recent():
-    params = {
-        "key": STEAM_API_KEY,
-        "steamid": STEAM_ID,
-        "format": "json"
-    }
-    r = requests.get(STEAM_RECENTLY_PLAYED_GAMES, params=params)  
-    data = r.json().get("response", {})
-    games = data.get("games", []) 
-    
-    result = save_games_to_db(games)
-    return jsonify(result)
-
-@app.route('/api/week-activity')
-@cache.cached(timeout=600)
-def api_week_activity():
-    week_ago_Minsk = datetime.now(tz_Minsk) - timedelta(days=7)
-    week_ago = week_ago_Minsk.astimezone(pytz.utc).replace(tzinfo=None)
-    
-    snapshots = (
-            db.session.query(
-                GameSnapshot.game_id,
-                func.min(GameSnapshot.playtime_forever).label('min_pt'),
-                func.max(GameSnapshot.playtime_forever).label('max_pt'),
-                PlayedGame.name,
-                PlayedGame.appid
-            )
-            .join(PlayedGame, GameSnapshot.game_id == PlayedGame.id)
-            .filter(GameSnapshot.create_at >= week_ago)
-            .group_by(GameSnapshot.game_id, PlayedGame.name, PlayedGame.appid)
-            .all()
-        )
-    
-    stats_data = []
-    for _, min_pt, max_pt, name, appid in snapshots:
-        hours = round((max_pt - min_pt) / 60, 1)
-        if hours >= 0.1:
-            stats_data.append({"name": name, "hours": hours, "appid": appid})
+    return queued("sync_recent")
 
-    stats_data.sort(key=lambda x: x["hours"], reverse=True)
+@app.route('/api/jobs/<int:job_id>')
+def job_status_api(job_id):
+    status = job_status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(status)
 
-    labels = [row["name"] for row in stats_data]
-    values = [row["hours"] for row in stats_data]
-    
-    single_game_cover = None
-    if len(stats_data) == 1:
-        game = PlayedGame.query.filter_by(name=stats_data[0]["name"]).first()
-        if game and game.appid:
-            single_game_cover = f"https://cdn.cloudflare.steamstatic.com/steam/apps/{game.appid}/library_hero.jpg"
-            
-    games = PlayedGame.query.order_by(PlayedGame.id.desc()).all()
-
-    games_list = [
-        {
-            "id": g.id,
-            "name": g.name,
-            "play_time_2weeks": g.play_time_2weeks,
-            "playtime_forever": g.playtime_forever
-        } for g in games
-    ]
+@app.route('/api/jobs/stats')
+def job_stats_api():
+    return jsonify(queue_stats())
 
-    return jsonify({
-        "stats": stats_data,
-        "labels": labels,
-        "values": values,
-        "single_game_cover": single_game_cover,
-        "games": games_list
-    })
+@app.route('/api/week-activity')
+def api_week_activity():
+    return swr.serve("week-activity")
 
 @app.route('/week')
 def week_activity():
@@ -406,95 +242,152 @@ def achievements():
         "achievements.html"
     )
 
-scheduler = BackgroundScheduler()
-
-scheduler.add_job(
-    func=scheduled_update,
-    trigger="interval",
-    minutes=15,
-    id="steam_update",
-    replace_existing=True
-)
-
-scheduler.add_job(
-    func=update_daily_stat,
-    trigger="cron",
-    hour=9, minute=40,
-    timezone=tz_Minsk,
-    id="daily_stat_job",
-    replace_existing=True
-)
+@app.route('/api/achievements')
+def achievements_api():
+    return swr.serve("achievements")
+
+@app.route('/api/achievements/<int:appid>')
+def game_achievements_api(appid):
+    """Every achievement of one game with the owner's unlock time; hidden ones keep their description until unlocked."""
+    rows = (
+        db.session.query(Achievement, PlayerAchievement.apiname.isnot(None), PlayerAchievement.unlocked_at)
+        .outerjoin(
+            PlayerAchievement,
+            (PlayerAchievement.appid == Achievement.appid)
+            & (PlayerAchievement.apiname == Achievement.apiname)
+            & (PlayerAchievement.account_id == primary_account_id())
+        )
+        .filter(Achievement.appid == appid)
+        .order_by(PlayerAchievement.unlocked_at.desc().nullslast(), Achievement.id)
+        .all()
+    )
+    if not rows:
+        return jsonify({"error": "No achievements stored for this game"}), 404
+    return jsonify({
+        "appid": appid,
+        "achievements": [
+            {
+                "apiname": a.apiname,
+                "name": a.display_name,
+                "description": a.description if achieved or not a.hidden else None,
+                "icon": a.icon if achieved else a.icon_gray,
+                "hidden": a.hidden,
+                "achieved": achieved,
+                "unlocked_at": unlocked_at.isoformat() + "Z" if unlocked_at else None
+            }
+            for a, achieved, unlocked_at in rows
+        ]
+    })
 
-@app.route('/update_friends')
-def update_friends_route():
-    result = update_friends()
-    return result
+@app.route('/api/export/<any(snapshots, daily):kind>')
+def export_api(kind):
+    """Snapshot or daily-stat history as ?format=csv (default) or ndjson, streamed from a server-side cursor.
 
-_PLAYTIME_CACHE = {}
-CACHE_TTL = 8 * 60
+    ?since= and ?until= take a date or UTC datetime (a bare until date is
+    included); snapshots also filter by ?appid= and ?steamid=.
+    """
+    fmt = request.args.get("format", "csv")
+    try:
+        chunks = export_chunks(
+            kind, fmt,
+            since=parse_bound(request.args.get("since")),
+            until=parse_bound(request.args.get("until"), end=True),
+            appid=request.args.get("appid", type=int),
+            steamid=request.args.get("steamid")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return Response(
+        stream_with_context(chunks),
+        mimetype=FORMATS[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{kind}.{fmt}"',
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
-def get_steam_playtime_batch(steamids):
-    if not steamids:
-        return {}
+@app.route('/api/analytics/<any(sessions, heatmap, streaks, trends):name>')
+def analytics_api(name):
+    """Play sessions, weekday-by-hour heatmap, streaks or per-game trends of the owner, from snapshot history.
 
-    def fetch_one(steamid):
-        try:
-            params = {
-                "key": STEAM_API_KEY,
-                "steamid": steamid,
-            }
-            r = requests.get(STEAM_RECENTLY_PLAYED_GAMES, params=params, timeout=12)
-            if r.status_code != 200:
-                return steamid, 0.0
-            data = r.json().get("response", {}).get("games", [])
-            total_min = sum(g.get("playtime_2weeks", 0) for g in data)
-            return steamid, round(total_min / 60, 1)
-        except:
-            return steamid, 0,0
-        
-    with ThreadPoolExecutor(max_workers=15) as executor:
-        results = dict(executor.map(fetch_one, steamids))
-        
-    now = time.time()
-    for sid, hours in results.items():
-        _PLAYTIME_CACHE[sid] = (hours, now)
-    
-    return results
+    ?since= and ?until= as for the exports (default: the last analytics.ANALYTICS_DAYS days);
+    ?appid= limits it to one game, ?bucket=day|week sets the trend buckets, ?limit= the sessions listed.
+    """
+    if analytics.np is None:
+        return jsonify({"error": "Analytics need NumPy installed"}), 503
+    try:
+        return jsonify(analytics.report(
+            name,
+            primary_account_id(),
+            since=parse_bound(request.args.get("since")),
+            until=parse_bound(request.args.get("until"), end=True),
+            appid=request.args.get("appid", type=int),
+            bucket=request.args.get("bucket", "day"),
+            limit=request.args.get("limit", analytics.SESSIONS_LIMIT, type=int)
+        ))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/steam/stats')
+def steam_stats():
+    return jsonify(steam.stats())
+
+@app.route('/api/push/stats')
+def push_stats():
+    return jsonify(pusher.stats)
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
 
-def get_steam_playtime_cached_or_fresh(steamid):
-    cached = _PLAYTIME_CACHE.get(steamid)
-    if cached and time.time() - cached[1] < CACHE_TTL:
-        return cached[0]
-    
-    hours = get_steam_playtime_batch([steamid]).get(steamid, 0.0)
-    return hours
+@app.route('/update_friends')
+def update_friends_route():
+    return queued("update_friends")
 
 @app.route('/api/friends/activity')
-@cache.cached(timeout=600)
 def friends_activity_api():
-    my_total = get_steam_playtime_cached_or_fresh(STEAM_ID)
-    friends = Friend.query.with_entities(Friend.steamid, Friend.personaname, Friend.avatar).all()
-    friend_ids = [f.steamid for f in friends]
+    return swr.serve("friends-activity")
+
+@app.route('/api/friends/activity/stream')
+def friends_activity_stream():
+    """NDJSON: the stored leaderboard at once, then a line per friend refreshed live from Steam.
+
+    Only friends the background job has not refreshed within FRIEND_REFRESH_INTERVAL are fetched.
+    """
+    leaderboard = friend_leaderboard()
+    stale_before = datetime.utcnow() - FRIEND_REFRESH_INTERVAL
+    stale = [
+        sid for (sid,) in
+        db.session.query(Friend.steamid)
+        .filter((Friend.playtime_updated_at.is_(None)) | (Friend.playtime_updated_at < stale_before))
+    ]
+    db.session.close()
     
-    batch_results = get_steam_playtime_batch(friend_ids + [STEAM_ID])
-
-    comparisons = []
-    for friend in friends:
-        friend_hours = batch_results.get(friend.steamid, 0.0)
-        diff = round(my_total - friend_hours, 1)
-        comparisons.append({
-            "name": friend.personaname,
-            "avatar": friend.avatar,
-            "friend_hours": friend_hours,
-            "diff": diff
-        })
+    def line(payload):
+        return json.dumps(payload) + "\n"
     
-    comparisons.sort(key=lambda x: x["friend_hours"], reverse=True)
-
-    return jsonify({
-        "me": round(my_total, 1),
-        "comparisons": comparisons
-    })
+    def generate():
+        yield line({"type": "snapshot", "pending": len(stale), **leaderboard})
+        fetched = {}
+        try:
+            for steamid, friend_hours in fetcher.iter_playtimes(stale):
+                if friend_hours is None:
+                    continue
+                fetched[steamid] = friend_hours
+                yield line({"type": "friend", "steamid": steamid, "friend_hours": friend_hours})
+            yield line({"type": "done", "missing": [sid for sid in stale if sid not in fetched]})
+        finally:
+            # Also keep what arrived before a client went away
+            if fetched:
+                store_friend_playtime(fetched, datetime.utcnow())
+                db.session.commit()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
     
 @app.route('/friends')
 def friends_activity():
@@ -506,6 +399,33 @@ def profile():
         "profile.html"
     )
 
+@app.route('/img/<kind>/<id>')
+def image(kind, id):
+    """A game cover (id is the appid) or friend avatar (id is the steamid), resized and cached on disk.
+
+    ?w= picks one of the widths in images.VARIANTS.
+    """
+    if kind not in VARIANTS or not id.isdigit():
+        return jsonify({"error": "Unknown image"}), 404
+    width = request.args.get("w", VARIANTS[kind][0], type=int)
+    if width not in VARIANTS[kind]:
+        return jsonify({"error": f"w must be one of {', '.join(map(str, VARIANTS[kind]))}"}), 400
+
+    if kind == "cover":
+        url = cover_url(id)
+    else:
+        url = db.session.query(Friend.avatar).filter_by(steamid=id).scalar()
+        db.session.close()
+        if not url:
+            return jsonify({"error": "Unknown image"}), 404
+
+    try:
+        digest, path, mimetype = image_cache.get(url, width)
+    except ImageError as e:
+        logger.warning(f"Image {kind}/{id} unavailable: {e}")
+        return jsonify({"error": "Image unavailable"}), 502
+    return send_file(path, mimetype=mimetype, etag=digest, max_age=MAX_AGE, conditional=True)
+
 @app.route('/subscribe', methods=['POST'])
 def subscribe():
     data = request.get_json()
@@ -540,13 +460,22 @@ def unsubscribe():
     db.session.commit()
     
     return jsonify({"status": "unsubscribed", "deleted": deleted})
-            
-if os.getenv("RUN_SCHEDULER", "false").lower() in ("1", "true", "yes"):
-    scheduler.start()
-    logger.info("Background scheduler enabled and started.")
+
+# worker.py is the usual place for jobs; this runs them inside the web app instead.
+# Only one process holding the scheduler lock actually starts them.
+RUN_SCHEDULER = os.getenv("RUN_SCHEDULER", "false").lower() in ("1", "true", "yes")
+if RUN_SCHEDULER:
+    QueueWorker(app).start()
+    if start_scheduler():
+        logger.info("Background scheduler enabled and started.")
+
+def start_web_jobs():
+    """Run the queued jobs that must land on this process's disk (cover prefetches); gunicorn calls this per worker."""
+    if not RUN_SCHEDULER:
+        QueueWorker(app, threads=1, kinds=WEB_KINDS).start()
 
 if __name__ == "__main__":
-        
+    start_web_jobs()
     app.run(
             host="0.0.0.0",
             port=int(os.getenv("PORT", 5000)),
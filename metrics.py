@@ -0,0 +1,234 @@
+import time, logging, threading
+from bisect import bisect_left
+from datetime import datetime, timezone
+from functools import wraps
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "steam_tracker_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, float("inf"))
+LAG_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, float("inf"))
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, float("inf"))
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{k}="{v}"')
+    return "{" + ",".join(pairs) + "}"
+
+def render_family(name, kind, help_text, samples):
+    """Prometheus text lines for one metric; samples are (suffix, labels, value)."""
+    lines = [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} {kind}"]
+    for suffix, labels, value in samples:
+        lines.append(f"{PREFIX}{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return lines
+
+def histogram_samples(labels, bounds, counts, total, count):
+    """Samples for a histogram given per-bucket (not cumulative) counts."""
+    samples, cumulative = [], 0
+    for bound, n in zip(bounds, counts):
+        cumulative += n
+        samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+    samples.append(("_sum", labels, total))
+    samples.append(("_count", labels, count))
+    return samples
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [("_total", self._labels(key), value) for key, value in self._values.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        samples = []
+        for key, counts, total, count in items:
+            samples.extend(histogram_samples(self._labels(key), self.buckets, counts, total, count))
+        return samples
+
+class Registry:
+    """Process-local metrics plus collectors that read other components' stats at scrape time."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, f):
+        """Register f() -> iterable of (name, kind, help, samples); usable as a decorator."""
+        self.collectors.append(f)
+        return f
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            # Counters render with a _total suffix, so their family name drops it
+            name = metric.name[:-len("_total")] if metric.kind == "counter" else metric.name
+            lines += render_family(name, metric.kind, metric.help, metric.samples())
+        for collect in self.collectors:
+            try:
+                for name, kind, help_text, samples in collect():
+                    lines += render_family(name, kind, help_text, samples)
+            except Exception as e:
+                logger.warning(f"Metrics collector {collect.__name__} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+job_duration = registry.histogram("job_duration_seconds", "Duration of background jobs and tasks.", ["job"])
+job_failures = registry.counter("job_failures_total", "Jobs and tasks that raised.", ["job"])
+scheduler_lag = registry.histogram(
+    "scheduler_lag_seconds", "How late scheduled jobs started.", ["job"], buckets=LAG_BUCKETS
+)
+scheduler_missed = registry.counter("scheduler_missed_total", "Scheduled runs skipped past their grace time.", ["job"])
+db_queries = registry.counter("db_queries_total", "SQL statements by the request endpoint or job issuing them.", ["context"])
+request_queries = registry.histogram(
+    "http_request_db_queries", "SQL statements per HTTP request.", ["endpoint"], buckets=QUERY_BUCKETS
+)
+request_duration = registry.histogram("http_request_duration_seconds", "HTTP request duration.", ["endpoint"])
+cache_requests = registry.counter("cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"])
+
+_context = threading.local()
+
+def timed(job):
+    """Record duration and failures of the wrapped function under job."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            outer = getattr(_context, "job", None)
+            _context.job = outer or job
+            started = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            except Exception:
+                job_failures.inc(job=job)
+                raise
+            finally:
+                job_duration.observe(time.perf_counter() - started, job=job)
+                _context.job = outer
+        return wrapper
+    return decorator
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.db_queries = g.get("db_queries", 0) + 1
+        db_queries.inc(context=request.endpoint or "unknown")
+    else:
+        db_queries.inc(context=getattr(_context, "job", None) or "other")
+
+def instrument_app(app):
+    """Per-request duration and query count for every endpoint except /metrics itself."""
+    @app.before_request
+    def _start_request():
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+
+    @app.teardown_request
+    def _finish_request(exc):
+        endpoint = request.endpoint or "unknown"
+        if endpoint == "metrics" or "request_started" not in g:
+            return
+        request_duration.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+        request_queries.observe(g.db_queries, endpoint=endpoint)
+
+def instrument_scheduler(scheduler):
+    from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_MISSED
+
+    def on_event(e):
+        if e.code == EVENT_JOB_MISSED:
+            scheduler_missed.inc(job=e.job_id)
+            return
+        now = datetime.now(timezone.utc)
+        for scheduled in e.scheduled_run_times:
+            scheduler_lag.observe(max((now - scheduled).total_seconds(), 0), job=e.job_id)
+
+    scheduler.add_listener(on_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED)
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port):
+    """Expose /metrics on its own port, for processes that do not serve HTTP (worker.py).
+
+    Returns None, without metrics, when the port is taken (say by a standby worker on the same host).
+    """
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    except OSError as e:
+        logger.warning(f"Metrics not served: cannot bind :{port} ({e}).")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Metrics served on :{port}/metrics")
+    return server
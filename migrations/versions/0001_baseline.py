@@ -0,0 +1,95 @@
+"""Baseline schema as created by `flask init-db`
+
+Databases created before migrations existed already have these tables, so
+each one is only created when missing; `flask db upgrade` then works for
+both fresh and existing databases.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'played_games' not in existing:
+        op.create_table(
+            'played_games',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('appid', sa.Integer(), nullable=True),
+            sa.Column('name', sa.String(length=100), nullable=True),
+            sa.Column('play_time_2weeks', sa.Integer(), nullable=True),
+            sa.Column('playtime_forever', sa.Integer(), nullable=True),
+            sa.UniqueConstraint('appid', name='played_games_appid_key'),
+            sa.UniqueConstraint('name', name='played_games_name_key'),
+        )
+
+    if 'game_snapshots' not in existing:
+        op.create_table(
+            'game_snapshots',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('game_id', sa.Integer(), sa.ForeignKey('played_games.id', ondelete='RESTRICT'), nullable=False),
+            sa.Column('playtime_forever', sa.Integer(), nullable=True),
+            sa.Column('create_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_game_snapshots_game_id', 'game_snapshots', ['game_id'])
+        op.create_index('ix_game_snapshots_create_at', 'game_snapshots', ['create_at'])
+
+    if 'playtime_rollups' not in existing:
+        op.create_table(
+            'playtime_rollups',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('appid', sa.Integer(), nullable=True),
+            sa.Column('bucket_start', sa.DateTime(), nullable=False),
+            sa.Column('minutes', sa.Integer(), nullable=False),
+            sa.UniqueConstraint('name', 'bucket_start', name='uq_playtime_rollups_name_bucket'),
+        )
+        op.create_index('ix_playtime_rollups_bucket_start', 'playtime_rollups', ['bucket_start'])
+
+    if 'friends' not in existing:
+        op.create_table(
+            'friends',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('steamid', sa.String(length=50), nullable=False),
+            sa.Column('personaname', sa.String(length=100), nullable=False),
+            sa.Column('avatar', sa.String(length=255), nullable=True),
+            sa.UniqueConstraint('steamid', name='friends_steamid_key'),
+        )
+
+    if 'daily_stats' not in existing:
+        op.create_table(
+            'daily_stats',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('total_minutes', sa.Integer(), nullable=True),
+            sa.Column('message', sa.String(length=255), nullable=True),
+            sa.UniqueConstraint('date', name='daily_stats_date_key'),
+        )
+
+    if 'push_subscriptions' not in existing:
+        op.create_table(
+            'push_subscriptions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('endpoint', sa.Text(), nullable=False),
+            sa.Column('p256dh', sa.Text(), nullable=False),
+            sa.Column('auth', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('endpoint', name='push_subscriptions_endpoint_key'),
+        )
+
+
+def downgrade():
+    for table in ('push_subscriptions', 'daily_stats', 'friends', 'playtime_rollups', 'game_snapshots', 'played_games'):
+        op.drop_table(table)
@@ -0,0 +1,97 @@
+"""Tracked accounts; games and rollups become per account
+
+Existing rows are assigned to the STEAM_ID account, which is created here.
+
+Revision ID: 0002_tracked_accounts
+Revises: 0001_baseline
+Create Date: 2026-10-18 10:00:00
+
+"""
+import os
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_tracked_accounts'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tracked_accounts',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('steamid', sa.String(length=50), nullable=False),
+        sa.Column('enabled', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('next_poll_at', sa.DateTime(), nullable=False),
+        sa.Column('last_polled_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('steamid', name='tracked_accounts_steamid_key'),
+    )
+    op.create_index('ix_tracked_accounts_next_poll_at', 'tracked_accounts', ['next_poll_at'])
+
+    bind = op.get_bind()
+    has_rows = any(
+        bind.execute(sa.text(f"SELECT 1 FROM {table} LIMIT 1")).first()
+        for table in ('played_games', 'playtime_rollups')
+    )
+    account_id = None
+    if has_rows:
+        steamid = os.getenv("STEAM_ID")
+        if not steamid:
+            raise RuntimeError("STEAM_ID must be set to assign existing games to an account")
+        now = datetime.utcnow()
+        bind.execute(
+            sa.text(
+                "INSERT INTO tracked_accounts (steamid, enabled, next_poll_at, created_at) "
+                "VALUES (:steamid, :enabled, :now, :now)"
+            ),
+            {"steamid": steamid, "enabled": True, "now": now}
+        )
+        account_id = bind.execute(
+            sa.text("SELECT id FROM tracked_accounts WHERE steamid = :steamid"),
+            {"steamid": steamid}
+        ).scalar()
+
+    for table in ('played_games', 'playtime_rollups'):
+        op.add_column(table, sa.Column('account_id', sa.Integer(), nullable=True))
+        if account_id is not None:
+            bind.execute(sa.text(f"UPDATE {table} SET account_id = :id"), {"id": account_id})
+
+    with op.batch_alter_table('played_games') as batch:
+        batch.alter_column('account_id', existing_type=sa.Integer(), nullable=False)
+        batch.create_foreign_key('played_games_account_id_fkey', 'tracked_accounts', ['account_id'], ['id'])
+        batch.drop_constraint('played_games_name_key', type_='unique')
+        batch.drop_constraint('played_games_appid_key', type_='unique')
+        batch.create_unique_constraint('uq_played_games_account_name', ['account_id', 'name'])
+        batch.create_unique_constraint('uq_played_games_account_appid', ['account_id', 'appid'])
+
+    with op.batch_alter_table('playtime_rollups') as batch:
+        batch.alter_column('account_id', existing_type=sa.Integer(), nullable=False)
+        batch.create_foreign_key('playtime_rollups_account_id_fkey', 'tracked_accounts', ['account_id'], ['id'])
+        batch.drop_constraint('uq_playtime_rollups_name_bucket', type_='unique')
+        batch.create_unique_constraint(
+            'uq_playtime_rollups_account_name_bucket', ['account_id', 'name', 'bucket_start']
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('playtime_rollups') as batch:
+        batch.drop_constraint('uq_playtime_rollups_account_name_bucket', type_='unique')
+        batch.create_unique_constraint('uq_playtime_rollups_name_bucket', ['name', 'bucket_start'])
+        batch.drop_constraint('playtime_rollups_account_id_fkey', type_='foreignkey')
+        batch.drop_column('account_id')
+
+    with op.batch_alter_table('played_games') as batch:
+        batch.drop_constraint('uq_played_games_account_appid', type_='unique')
+        batch.drop_constraint('uq_played_games_account_name', type_='unique')
+        batch.create_unique_constraint('played_games_appid_key', ['appid'])
+        batch.create_unique_constraint('played_games_name_key', ['name'])
+        batch.drop_constraint('played_games_account_id_fkey', type_='foreignkey')
+        batch.drop_column('account_id')
+
+    op.drop_index('ix_tracked_accounts_next_poll_at', table_name='tracked_accounts')
+    op.drop_table('tracked_accounts')
@@ -0,0 +1,25 @@
+"""Fingerprint of each account's last synced games payload
+
+Revision ID: 0003_games_fingerprint
+Revises: 0002_tracked_accounts
+Create Date: 2026-10-18 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_games_fingerprint'
+down_revision = '0002_tracked_accounts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tracked_accounts', sa.Column('games_fingerprint', sa.String(length=40), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('tracked_accounts') as batch:
+        batch.drop_column('games_fingerprint')
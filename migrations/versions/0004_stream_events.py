@@ -0,0 +1,32 @@
+"""Events for the /api/stream SSE endpoint
+
+Revision ID: 0004_stream_events
+Revises: 0003_games_fingerprint
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_stream_events'
+down_revision = '0003_games_fingerprint'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stream_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_stream_events_created_at', 'stream_events', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_stream_events_created_at', table_name='stream_events')
+    op.drop_table('stream_events')
@@ -0,0 +1,50 @@
+"""Friend leaderboard: current hours on friends, daily history in friend_playtime
+
+Revision ID: 0005_friend_playtime
+Revises: 0004_stream_events
+Create Date: 2026-10-18 13:00:00
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_friend_playtime'
+down_revision = '0004_stream_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('friends', sa.Column('hours_2weeks', sa.Float(), nullable=True))
+    op.add_column('friends', sa.Column('playtime_updated_at', sa.DateTime(), nullable=True))
+    op.add_column('friends', sa.Column('next_playtime_at', sa.DateTime(), nullable=True))
+    # Existing friends are all due on the first run of the job
+    op.get_bind().execute(sa.text("UPDATE friends SET next_playtime_at = :now"), {"now": datetime.utcnow()})
+    with op.batch_alter_table('friends') as batch:
+        batch.alter_column('next_playtime_at', existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_friends_hours_2weeks', 'friends', ['hours_2weeks'])
+    op.create_index('ix_friends_next_playtime_at', 'friends', ['next_playtime_at'])
+
+    op.create_table(
+        'friend_playtime',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('steamid', sa.String(length=50), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('hours', sa.Float(), nullable=False),
+        sa.UniqueConstraint('steamid', 'day', name='uq_friend_playtime_steamid_day'),
+    )
+    op.create_index('ix_friend_playtime_day', 'friend_playtime', ['day'])
+
+
+def downgrade():
+    op.drop_index('ix_friend_playtime_day', table_name='friend_playtime')
+    op.drop_table('friend_playtime')
+    op.drop_index('ix_friends_next_playtime_at', table_name='friends')
+    op.drop_index('ix_friends_hours_2weeks', table_name='friends')
+    with op.batch_alter_table('friends') as batch:
+        batch.drop_column('next_playtime_at')
+        batch.drop_column('playtime_updated_at')
+        batch.drop_column('hours_2weeks')
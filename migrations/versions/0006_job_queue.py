@@ -0,0 +1,45 @@
+"""Durable job queue for on-demand syncs, friend updates and daily stats
+
+Revision ID: 0006_job_queue
+Revises: 0005_friend_playtime
+Create Date: 2026-10-18 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_job_queue'
+down_revision = '0005_friend_playtime'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job_queue',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(length=64), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_by', sa.String(length=128), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('dedupe_key', sa.String(length=128), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('dedupe_key'),
+    )
+    op.create_index('ix_job_queue_status_run_at', 'job_queue', ['status', 'run_at'])
+    op.create_index('ix_job_queue_finished_at', 'job_queue', ['finished_at'])
+
+
+def downgrade():
+    op.drop_index('ix_job_queue_finished_at', table_name='job_queue')
+    op.drop_index('ix_job_queue_status_run_at', table_name='job_queue')
+    op.drop_table('job_queue')
@@ -0,0 +1,35 @@
+"""Presence and activity timestamps for adaptive polling
+
+Revision ID: 0007_adaptive_polling
+Revises: 0006_job_queue
+Create Date: 2026-10-18 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_adaptive_polling'
+down_revision = '0006_job_queue'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tracked_accounts', sa.Column('presence', sa.String(length=16), nullable=True))
+    op.add_column('tracked_accounts', sa.Column('last_active_at', sa.DateTime(), nullable=True))
+    op.add_column('tracked_accounts', sa.Column('last_changed_at', sa.DateTime(), nullable=True))
+    op.add_column('tracked_accounts', sa.Column('last_synced_at', sa.DateTime(), nullable=True))
+    op.add_column('tracked_accounts', sa.Column('last_logoff', sa.BigInteger(), nullable=True))
+    # Until now every poll fetched the account's games
+    op.execute("UPDATE tracked_accounts SET last_synced_at = last_polled_at")
+
+
+def downgrade():
+    with op.batch_alter_table('tracked_accounts') as batch:
+        batch.drop_column('last_logoff')
+        batch.drop_column('last_synced_at')
+        batch.drop_column('last_changed_at')
+        batch.drop_column('last_active_at')
+        batch.drop_column('presence')
@@ -0,0 +1,131 @@
+"""Composite (game_id, create_at) snapshot index; monthly game_snapshots partitions on Postgres
+
+On Postgres game_snapshots becomes a table range-partitioned by month on
+create_at, with a BRIN index on create_at and (id, create_at) as primary
+key, since a partitioned table's keys must include the partition column.
+Partitions are named game_snapshots_pYYYY_MM; rows outside them land in
+game_snapshots_default. Retention creates upcoming months and drops expired
+ones (see retention.py). Other backends keep one table.
+
+Revision ID: 0008_snapshot_partitions
+Revises: 0007_adaptive_polling
+Create Date: 2026-10-18 19:00:00
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_snapshot_partitions'
+down_revision = '0007_adaptive_polling'
+branch_labels = None
+depends_on = None
+
+# Months created beyond the current one, as retention.SNAPSHOT_PARTITIONS_AHEAD
+PARTITIONS_AHEAD = 2
+# Snapshots from before create_at had a default; kept as the oldest rows
+UNKNOWN_CREATE_AT = "1970-01-01 00:00:00"
+
+
+def _next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def upgrade():
+    bind = op.get_bind()
+    unknown = {"at": datetime.fromisoformat(UNKNOWN_CREATE_AT)}
+    bind.execute(sa.text("UPDATE game_snapshots SET create_at = :at WHERE create_at IS NULL"), unknown)
+    # Those go to the default partition rather than starting a partition per month since 1970
+    first = bind.execute(sa.text("SELECT min(create_at) FROM game_snapshots WHERE create_at > :at"), unknown).scalar()
+
+    if bind.dialect.name != "postgresql":
+        op.drop_index('ix_game_snapshots_game_id', table_name='game_snapshots')
+        with op.batch_alter_table('game_snapshots') as batch:
+            batch.alter_column('create_at', existing_type=sa.DateTime(), nullable=False)
+        op.create_index('ix_game_snapshots_game_id_create_at', 'game_snapshots', ['game_id', 'create_at'])
+        return
+
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('game_snapshots', 'id')")).scalar()
+    # The sequence would go with the old table otherwise
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute("ALTER TABLE game_snapshots RENAME TO game_snapshots_unpartitioned")
+    op.execute("ALTER TABLE game_snapshots_unpartitioned DROP CONSTRAINT game_snapshots_pkey")
+    op.execute("ALTER TABLE game_snapshots_unpartitioned DROP CONSTRAINT IF EXISTS game_snapshots_game_id_fkey")
+    op.drop_index('ix_game_snapshots_game_id', table_name='game_snapshots_unpartitioned')
+    op.drop_index('ix_game_snapshots_create_at', table_name='game_snapshots_unpartitioned')
+
+    op.execute(f"""
+        CREATE TABLE game_snapshots (
+            id integer NOT NULL DEFAULT nextval('{sequence}'),
+            game_id integer NOT NULL,
+            playtime_forever integer,
+            create_at timestamp without time zone NOT NULL,
+            CONSTRAINT game_snapshots_pkey PRIMARY KEY (id, create_at),
+            CONSTRAINT game_snapshots_game_id_fkey FOREIGN KEY (game_id) REFERENCES played_games (id) ON DELETE RESTRICT
+        ) PARTITION BY RANGE (create_at)
+    """)
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY game_snapshots.id")
+    op.execute("CREATE TABLE game_snapshots_default PARTITION OF game_snapshots DEFAULT")
+
+    now = datetime.utcnow()
+    month = datetime((first or now).year, (first or now).month, 1)
+    last = datetime(now.year, now.month, 1)
+    for _ in range(PARTITIONS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        end = _next_month(month)
+        op.execute(
+            f"CREATE TABLE game_snapshots_p{month:%Y_%m} PARTITION OF game_snapshots "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+        month = end
+
+    op.execute("""
+        INSERT INTO game_snapshots (id, game_id, playtime_forever, create_at)
+        SELECT id, game_id, playtime_forever, create_at FROM game_snapshots_unpartitioned
+    """)
+    op.drop_table('game_snapshots_unpartitioned')
+    # Indexes after the copy, which is faster than maintaining them row by row
+    op.create_index('ix_game_snapshots_game_id_create_at', 'game_snapshots', ['game_id', 'create_at'])
+    # Snapshots arrive in create_at order, so a BRIN index stays small and selective
+    op.create_index('ix_game_snapshots_create_at', 'game_snapshots', ['create_at'], postgresql_using='brin')
+    op.execute("ANALYZE game_snapshots")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.drop_index('ix_game_snapshots_game_id_create_at', table_name='game_snapshots')
+        with op.batch_alter_table('game_snapshots') as batch:
+            batch.alter_column('create_at', existing_type=sa.DateTime(), nullable=True)
+        op.create_index('ix_game_snapshots_game_id', 'game_snapshots', ['game_id'])
+        return
+
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('game_snapshots', 'id')")).scalar()
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute("ALTER TABLE game_snapshots RENAME TO game_snapshots_partitioned")
+    op.execute("ALTER TABLE game_snapshots_partitioned DROP CONSTRAINT game_snapshots_pkey")
+    op.execute("ALTER TABLE game_snapshots_partitioned DROP CONSTRAINT IF EXISTS game_snapshots_game_id_fkey")
+    op.drop_index('ix_game_snapshots_game_id_create_at', table_name='game_snapshots_partitioned')
+    op.drop_index('ix_game_snapshots_create_at', table_name='game_snapshots_partitioned')
+    op.execute(f"""
+        CREATE TABLE game_snapshots (
+            id integer NOT NULL DEFAULT nextval('{sequence}'),
+            game_id integer NOT NULL,
+            playtime_forever integer,
+            create_at timestamp without time zone,
+            CONSTRAINT game_snapshots_pkey PRIMARY KEY (id),
+            CONSTRAINT game_snapshots_game_id_fkey FOREIGN KEY (game_id) REFERENCES played_games (id) ON DELETE RESTRICT
+        )
+    """)
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY game_snapshots.id")
+    op.execute("""
+        INSERT INTO game_snapshots (id, game_id, playtime_forever, create_at)
+        SELECT id, game_id, playtime_forever, create_at FROM game_snapshots_partitioned
+    """)
+    # Takes every partition with it
+    op.drop_table('game_snapshots_partitioned')
+    op.create_index('ix_game_snapshots_game_id', 'game_snapshots', ['game_id'])
+    op.create_index('ix_game_snapshots_create_at', 'game_snapshots', ['create_at'])
@@ -0,0 +1,58 @@
+"""Achievements: cached game schemas, unlocked achievements per account
+
+Revision ID: 0009_achievements
+Revises: 0008_snapshot_partitions
+Create Date: 2026-10-18 20:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_achievements'
+down_revision = '0008_snapshot_partitions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('played_games', sa.Column('achievements_playtime', sa.Integer(), nullable=True))
+    op.create_table(
+        'game_schemas',
+        sa.Column('appid', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('game_name', sa.String(length=255), nullable=True),
+        sa.Column('achievement_count', sa.Integer(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        'achievements',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('appid', sa.Integer(), sa.ForeignKey('game_schemas.appid'), nullable=False),
+        sa.Column('apiname', sa.String(length=255), nullable=False),
+        sa.Column('display_name', sa.String(length=255), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('icon', sa.String(length=255), nullable=True),
+        sa.Column('icon_gray', sa.String(length=255), nullable=True),
+        sa.Column('hidden', sa.Boolean(), nullable=False),
+        sa.UniqueConstraint('appid', 'apiname', name='uq_achievements_appid_apiname'),
+    )
+    op.create_table(
+        'player_achievements',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('account_id', sa.Integer(), sa.ForeignKey('tracked_accounts.id'), nullable=False),
+        sa.Column('appid', sa.Integer(), nullable=False),
+        sa.Column('apiname', sa.String(length=255), nullable=False),
+        sa.Column('unlocked_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('account_id', 'appid', 'apiname', name='uq_player_achievements_account_appid_apiname'),
+    )
+    op.create_index('ix_player_achievements_unlocked_at', 'player_achievements', ['unlocked_at'])
+
+
+def downgrade():
+    op.drop_index('ix_player_achievements_unlocked_at', table_name='player_achievements')
+    op.drop_table('player_achievements')
+    op.drop_table('achievements')
+    op.drop_table('game_schemas')
+    with op.batch_alter_table('played_games') as batch:
+        batch.drop_column('achievements_playtime')
@@ -0,0 +1,25 @@
+"""Last achievements refresh attempt per game
+
+Revision ID: 0010_achievements_checked_at
+Revises: 0009_achievements
+Create Date: 2026-10-18 22:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_achievements_checked_at'
+down_revision = '0009_achievements'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('played_games', sa.Column('achievements_checked_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('played_games') as batch:
+        batch.drop_column('achievements_checked_at')
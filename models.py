@@ -1,29 +1,183 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timedelta
+from zlib import crc32
+from sqlalchemy import func
 
 db = SQLAlchemy()
 
+UPSERT_CHUNK_SIZE = 1000
+
+def dialect_insert(model):
+    """INSERT construct with ON CONFLICT support for the current backend."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upsert is not supported for {dialect}")
+    return insert(model)
+
+def upsert(model, rows, index_elements, update_columns, increment_columns=()):
+    """Insert rows in one statement; on conflict overwrite update_columns and add to increment_columns."""
+    # Chunked to stay under SQLite's bound-parameter limit
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = dialect_insert(model).values(rows[i:i + UPSERT_CHUNK_SIZE])
+        set_ = {col: stmt.excluded[col] for col in update_columns}
+        set_.update({col: getattr(model, col) + stmt.excluded[col] for col in increment_columns})
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+        db.session.execute(stmt)
+
+class TrackedAccount(db.Model):
+    __tablename__ = 'tracked_accounts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    steamid = db.Column(db.String(50), unique=True, nullable=False)
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    next_poll_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_polled_at = db.Column(db.DateTime, nullable=True)
+    # Digest of the last synced GetRecentlyPlayedGames payload, see games_fingerprint()
+    games_fingerprint = db.Column(db.String(40), nullable=True)
+    # Adaptive polling state: in_game, online, offline, or hidden when presence proved unreliable
+    presence = db.Column(db.String(16), nullable=True)
+    # Last seen online or playing, last sync in which some game's playtime_forever went up, last
+    # GetRecentlyPlayedGames call
+    last_active_at = db.Column(db.DateTime, nullable=True)
+    last_changed_at = db.Column(db.DateTime, nullable=True)
+    last_synced_at = db.Column(db.DateTime, nullable=True)
+    # GetPlayerSummaries lastlogoff at the last presence check; moving on means it was online in between
+    last_logoff = db.Column(db.BigInteger, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    games = db.relationship("PlayedGame", backref="account", lazy=True)
+    
+    def __repr__(self):
+        return f"<TrackedAccount {self.steamid}>"
+
+def poll_offset(steamid, interval):
+    """Stable per-account offset that spreads polls evenly over the interval."""
+    return timedelta(seconds=crc32(steamid.encode()) % int(interval.total_seconds()))
+
+def ensure_accounts(steamids, interval=None):
+    """{steamid: account id}, creating missing accounts.
+
+    New accounts are first polled at their offset within interval, or right
+    away when no interval is given.
+    """
+    steamids = list(dict.fromkeys(steamids))
+    ids = dict(
+        db.session.query(TrackedAccount.steamid, TrackedAccount.id)
+        .filter(TrackedAccount.steamid.in_(steamids))
+        .all()
+    )
+    missing = [sid for sid in steamids if sid not in ids]
+    if missing:
+        now = datetime.utcnow()
+        stmt = dialect_insert(TrackedAccount).values([
+            {
+                "steamid": sid,
+                "enabled": True,
+                "next_poll_at": now + poll_offset(sid, interval) if interval else now,
+                "created_at": now
+            }
+            for sid in missing
+        ]).on_conflict_do_nothing(index_elements=["steamid"])
+        db.session.execute(stmt)
+        ids.update(
+            db.session.query(TrackedAccount.steamid, TrackedAccount.id)
+            .filter(TrackedAccount.steamid.in_(missing))
+            .all()
+        )
+    return ids
+
 class PlayedGame(db.Model):
     __tablename__ = 'played_games'
     
     id = db.Column(db.Integer, primary_key=True)
-    appid = db.Column(db.Integer, unique=True, nullable=True)
-    name = db.Column(db.String(100), unique=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('tracked_accounts.id'), nullable=False)
+    appid = db.Column(db.Integer, nullable=True)
+    name = db.Column(db.String(100))
     play_time_2weeks = db.Column(db.Integer)
     playtime_forever = db.Column(db.Integer)
+    # playtime_forever when its achievements were last refreshed; they are due again once it moves
+    achievements_playtime = db.Column(db.Integer, nullable=True)
+    # Last refresh attempt, failed or not; the longest-waiting pending games go first
+    achievements_checked_at = db.Column(db.DateTime, nullable=True)
     
     snapshots = db.relationship("GameSnapshot", backref="game", lazy=True)
     
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'name', name='uq_played_games_account_name'),
+        db.UniqueConstraint('account_id', 'appid', name='uq_played_games_account_appid'),
+    )
+    
     def __repr__(self):
         return f"<Game {self.name}>"
     
 class GameSnapshot(db.Model):
+    """On Postgres the table is partitioned by month on create_at (migration 0008), and its
+    primary key there is (id, create_at); retention.py creates and drops the partitions."""
     __tablename__ = 'game_snapshots'
     
     id = db.Column(db.Integer, primary_key=True)
-    game_id = db.Column(db.Integer, db.ForeignKey('played_games.id', ondelete="RESTRICT"), nullable=False, index=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('played_games.id', ondelete="RESTRICT"), nullable=False)
     playtime_forever = db.Column(db.Integer, default=0)
-    create_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    create_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        # Per-game history and the newest snapshot per game
+        db.Index('ix_game_snapshots_game_id_create_at', 'game_id', 'create_at'),
+        # Time windows (retention); BRIN on Postgres, where rows arrive in create_at order
+        db.Index('ix_game_snapshots_create_at', 'create_at', postgresql_using='brin'),
+    )
+
+def latest_snapshots(game_ids=None, before=None):
+    """{game_id: playtime_forever} of the newest snapshot per game (taken before `before`, if given), in one query.
+
+    One backward (game_id, create_at) index lookup per game, however long its history.
+    """
+    newest = db.session.query(GameSnapshot.playtime_forever).filter(GameSnapshot.game_id == PlayedGame.id)
+    if before is not None:
+        newest = newest.filter(GameSnapshot.create_at < before)
+    newest = (
+        newest
+        .order_by(GameSnapshot.create_at.desc(), GameSnapshot.id.desc())
+        .limit(1)
+        .correlate(PlayedGame)
+        .scalar_subquery()
+    )
+    rows = db.session.query(PlayedGame.id, newest)
+    if game_ids is not None:
+        rows = rows.filter(PlayedGame.id.in_(game_ids))
+    return {game_id: playtime for game_id, playtime in rows if playtime is not None}
+
+class PlaytimeRollup(db.Model):
+    """Minutes played per game per UTC hour, kept after raw snapshots are pruned."""
+    __tablename__ = 'playtime_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('tracked_accounts.id'), nullable=False)
+    # Keyed by name like PlayedGame, whose rows are deleted when a game leaves the recent list
+    name = db.Column(db.String(100), nullable=False)
+    appid = db.Column(db.Integer, nullable=True)
+    bucket_start = db.Column(db.DateTime, nullable=False, index=True)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'name', 'bucket_start', name='uq_playtime_rollups_account_name_bucket'),
+    )
+    
+    def __repr__(self):
+        return f"<PlaytimeRollup {self.name} {self.bucket_start} - {self.minutes} min>"
+
+def hour_bucket(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+def time_bucket(column, unit):
+    """SQL expression truncating a timestamp column to the 'hour' or 'day'."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(unit, column)
+    return func.strftime({"hour": "%Y-%m-%d %H", "day": "%Y-%m-%d"}[unit], column)
 
 class Friend(db.Model):
     __tablename__ = 'friends'
@@ -31,6 +185,25 @@ class Friend(db.Model):
     steamid = db.Column(db.String(50), unique=True, nullable=False)
     personaname = db.Column(db.String(100), nullable=False)
     avatar = db.Column(db.String(255), nullable=True)
+    # Latest two-week hours, kept current by the friend playtime job
+    hours_2weeks = db.Column(db.Float, nullable=True, index=True)
+    playtime_updated_at = db.Column(db.DateTime, nullable=True)
+    next_playtime_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class FriendPlaytime(db.Model):
+    """Two-week hours per friend per UTC day; the last refresh of the day wins."""
+    __tablename__ = 'friend_playtime'
+    __table_args__ = (
+        db.UniqueConstraint('steamid', 'day', name='uq_friend_playtime_steamid_day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    steamid = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.Date, nullable=False, index=True)
+    hours = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f"<FriendPlaytime {self.steamid} {self.day} {self.hours}h>"
     
 class DailyStat(db.Model):
     __tablename__ = 'daily_stats'
@@ -53,4 +226,88 @@ class PushSubscription(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f"<PushSub {self.endpoint[:50]}...>"
\ No newline at end of file
+        return f"<PushSub {self.endpoint[:50]}...>"
+
+class StreamEvent(db.Model):
+    __tablename__ = 'stream_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<StreamEvent {self.id} {self.kind}>"
+
+class QueuedJob(db.Model):
+    """A unit of background work; see job_queue.py."""
+    __tablename__ = 'job_queue'
+    __table_args__ = (
+        db.Index('ix_job_queue_status_run_at', 'status', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    # queued -> running -> succeeded, or back to queued for a retry, or failed
+    status = db.Column(db.String(16), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(128), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    # Jobs with the same key are only ever enqueued once, e.g. one daily stat per day
+    dedupe_key = db.Column(db.String(128), unique=True, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True, index=True)
+    
+    def __repr__(self):
+        return f"<QueuedJob {self.id} {self.kind} {self.status}>"
+
+class GameSchema(db.Model):
+    """GetSchemaForGame of an app, fetched once: achievement definitions practically never change."""
+    __tablename__ = 'game_schemas'
+    
+    appid = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    game_name = db.Column(db.String(255), nullable=True)
+    achievement_count = db.Column(db.Integer, nullable=False, default=0)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<GameSchema {self.appid} {self.achievement_count} achievements>"
+
+class Achievement(db.Model):
+    __tablename__ = 'achievements'
+    __table_args__ = (
+        db.UniqueConstraint('appid', 'apiname', name='uq_achievements_appid_apiname'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    appid = db.Column(db.Integer, db.ForeignKey('game_schemas.appid'), nullable=False)
+    apiname = db.Column(db.String(255), nullable=False)
+    display_name = db.Column(db.String(255), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    icon = db.Column(db.String(255), nullable=True)
+    icon_gray = db.Column(db.String(255), nullable=True)
+    hidden = db.Column(db.Boolean, nullable=False, default=False)
+    
+    def __repr__(self):
+        return f"<Achievement {self.appid} {self.apiname}>"
+
+class PlayerAchievement(db.Model):
+    """An achievement an account has unlocked. Keyed by appid, so it outlives the game's PlayedGame row."""
+    __tablename__ = 'player_achievements'
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'appid', 'apiname', name='uq_player_achievements_account_appid_apiname'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('tracked_accounts.id'), nullable=False)
+    appid = db.Column(db.Integer, nullable=False)
+    apiname = db.Column(db.String(255), nullable=False)
+    unlocked_at = db.Column(db.DateTime, nullable=True, index=True)
+    
+    def __repr__(self):
+        return f"<PlayerAchievement {self.account_id} {self.appid} {self.apiname}>"
@@ -0,0 +1,216 @@
+import logging, pytz
+from datetime import datetime, timedelta
+from collections import defaultdict
+from sqlalchemy import func, select, cast, Numeric
+from core import swr, STEAM_ID, tz_Minsk
+from models import db, PlayedGame, PlaytimeRollup, Friend, FriendPlaytime, GameSchema, Achievement, PlayerAchievement, hour_bucket
+from tasks import FRIEND_TREND_DAYS, primary_account_id
+from steam_client import steam
+from images import image_path
+
+# The cached dashboard payloads. Both the web app (main.py, which serves them)
+# and worker.py import this module, so warming after a sync recomputes them
+# wherever the sync ran; with a shared cache backend (see core.py) the web
+# app then serves what the worker computed.
+
+logger = logging.getLogger(__name__)
+
+@swr.payload("recent-games", fresh_for=600)
+def recent_games():
+    try:
+        return steam.recently_played_games(STEAM_ID)
+    except Exception as e:
+        logger.error(f"Error fetching recent games: {e}")
+        return []
+
+def compact_week_activity(payload):
+    # labels and values are the stats' names and hours again
+    return {key: value for key, value in payload.items() if key not in ("labels", "values")}
+
+@swr.payload("week-activity", fresh_for=600, compact=compact_week_activity)
+def week_activity():
+    week_ago_Minsk = datetime.now(tz_Minsk) - timedelta(days=7)
+    week_ago = week_ago_Minsk.astimezone(pytz.utc).replace(tzinfo=None)
+    
+    rollups = (
+            db.session.query(
+                PlaytimeRollup.name,
+                func.max(PlaytimeRollup.appid),
+                func.sum(PlaytimeRollup.minutes)
+            )
+            .filter(
+                PlaytimeRollup.account_id == primary_account_id(),
+                PlaytimeRollup.bucket_start >= hour_bucket(week_ago)
+            )
+            .group_by(PlaytimeRollup.name)
+            .all()
+        )
+    
+    stats_data = []
+    for name, appid, minutes in rollups:
+        hours = round(minutes / 60, 1)
+        if hours >= 0.1:
+            stats_data.append({"name": name, "hours": hours, "appid": appid})
+
+    stats_data.sort(key=lambda x: x["hours"], reverse=True)
+
+    labels = [row["name"] for row in stats_data]
+    values = [row["hours"] for row in stats_data]
+    
+    single_game_cover = None
+    if len(stats_data) == 1 and stats_data[0]["appid"]:
+        single_game_cover = image_path("cover", stats_data[0]["appid"])
+            
+    games = (
+        PlayedGame.query
+        .filter_by(account_id=primary_account_id())
+        .order_by(PlayedGame.id.desc())
+        .all()
+    )
+
+    games_list = [
+        {
+            "id": g.id,
+            "name": g.name,
+            "play_time_2weeks": g.play_time_2weeks,
+            "playtime_forever": g.playtime_forever
+        } for g in games
+    ]
+
+    return {
+        "stats": stats_data,
+        "labels": labels,
+        "values": values,
+        "single_game_cover": single_game_cover,
+        "games": games_list
+    }
+
+@swr.payload("achievements", fresh_for=600)
+def achievement_progress():
+    """The owner's unlocked and total achievements per game, and the latest unlocks; read from the database only."""
+    account_id = primary_account_id()
+    unlocked = (
+        db.session.query(
+            PlayerAchievement.appid,
+            func.count().label("unlocked"),
+            func.max(PlayerAchievement.unlocked_at).label("last_unlocked_at")
+        )
+        .filter(PlayerAchievement.account_id == account_id)
+        .group_by(PlayerAchievement.appid)
+        .subquery()
+    )
+    # Steam's schema names are often internal ones, so prefer the name the game was synced under
+    names = dict(
+        db.session.query(PlayedGame.appid, PlayedGame.name)
+        .filter(PlayedGame.account_id == account_id, PlayedGame.appid.isnot(None))
+    )
+    refreshed = select(PlayedGame.appid).where(
+        PlayedGame.account_id == account_id, PlayedGame.achievements_playtime.isnot(None)
+    )
+    games = (
+        db.session.query(
+            GameSchema.appid,
+            GameSchema.game_name,
+            GameSchema.achievement_count,
+            func.coalesce(unlocked.c.unlocked, 0).label("unlocked"),
+            unlocked.c.last_unlocked_at
+        )
+        .outerjoin(unlocked, unlocked.c.appid == GameSchema.appid)
+        .filter(GameSchema.achievement_count > 0, unlocked.c.appid.isnot(None) | GameSchema.appid.in_(refreshed))
+        .order_by(unlocked.c.last_unlocked_at.desc().nullslast(), GameSchema.appid)
+        .all()
+    )
+    recent = (
+        db.session.query(
+            PlayerAchievement.appid,
+            Achievement.display_name,
+            Achievement.description,
+            Achievement.icon,
+            PlayerAchievement.unlocked_at
+        )
+        .join(
+            Achievement,
+            (Achievement.appid == PlayerAchievement.appid) & (Achievement.apiname == PlayerAchievement.apiname)
+        )
+        .filter(PlayerAchievement.account_id == account_id, PlayerAchievement.unlocked_at.isnot(None))
+        .order_by(PlayerAchievement.unlocked_at.desc())
+        .limit(10)
+        .all()
+    )
+    game_names = {g.appid: names.get(g.appid) or g.game_name for g in games}
+    
+    return {
+        "unlocked": sum(g.unlocked for g in games),
+        "total": sum(g.achievement_count for g in games),
+        "games": [
+            {
+                "appid": g.appid,
+                "name": game_names[g.appid],
+                "unlocked": g.unlocked,
+                "total": g.achievement_count,
+                "percent": round(100 * g.unlocked / g.achievement_count, 1),
+                "last_unlocked_at": g.last_unlocked_at.isoformat() + "Z" if g.last_unlocked_at else None
+            }
+            for g in games
+        ],
+        "recent": [
+            {
+                "appid": r.appid,
+                "game": game_names.get(r.appid) or names.get(r.appid),
+                "name": r.display_name,
+                "description": r.description,
+                "icon": r.icon,
+                "unlocked_at": r.unlocked_at.isoformat() + "Z"
+            }
+            for r in recent
+        ]
+    }
+
+@swr.payload("friends-activity", fresh_for=600)
+def friend_leaderboard():
+    """Friends ranked by two-week hours, with rank and diff to the owner computed by the database."""
+    my_hours = (
+        select(func.coalesce(func.sum(PlayedGame.play_time_2weeks), 0) / 60.0)
+        .where(PlayedGame.account_id == primary_account_id())
+        .scalar_subquery()
+    )
+    friend_hours = func.coalesce(Friend.hours_2weeks, 0.0)
+    rows = (
+        db.session.query(
+            Friend.steamid,
+            Friend.personaname,
+            Friend.avatar,
+            friend_hours.label("friend_hours"),
+            func.rank().over(order_by=friend_hours.desc()).label("rank"),
+            func.round(cast(my_hours - friend_hours, Numeric), 1).label("diff"),
+            func.round(cast(my_hours, Numeric), 1).label("me")
+        )
+        .order_by(Friend.hours_2weeks.desc().nullslast(), Friend.id)
+        .all()
+    )
+    me = rows[0].me if rows else db.session.query(func.round(cast(my_hours, Numeric), 1)).scalar()
+    
+    since = datetime.utcnow().date() - timedelta(days=FRIEND_TREND_DAYS)
+    trends = defaultdict(list)
+    for steamid, day, hours in (
+        db.session.query(FriendPlaytime.steamid, FriendPlaytime.day, FriendPlaytime.hours)
+        .filter(FriendPlaytime.day >= since)
+        .order_by(FriendPlaytime.day)
+    ):
+        trends[steamid].append([day.isoformat(), hours])
+    
+    return {
+        "me": float(me or 0),
+        "comparisons": [
+            {
+                "steamid": r.steamid,
+                "name": r.personaname,
+                "avatar": image_path("avatar", r.steamid) if r.avatar else None,
+                "friend_hours": float(r.friend_hours),
+                "diff": float(r.diff),
+                "rank": r.rank,
+                "trend": trends.get(r.steamid, [])
+            }
+            for r in rows
+        ]
+    }
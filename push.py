@@ -0,0 +1,110 @@
+import os, json, logging, threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from models import db, PushSubscription
+
+logger = logging.getLogger(__name__)
+
+PUSH_ICON = "/static/pics/icon0.png"
+PUSH_MAX_WORKERS = int(os.getenv("PUSH_MAX_WORKERS", 8))
+PUSH_TIMEOUT = float(os.getenv("PUSH_TIMEOUT", 10))
+
+# Push services answer these for subscriptions that will never work again
+GONE_STATUSES = (404, 410)
+
+class PushDispatcher:
+    """Collects messages during a run and delivers them in one payload per subscriber."""
+
+    def __init__(self, max_workers=PUSH_MAX_WORKERS, timeout=PUSH_TIMEOUT):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.stats = {"sent": 0, "failed": 0, "pruned": 0}
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def queue(self, body):
+        with self._lock:
+            self._pending.append(body)
+
+    def discard(self):
+        with self._lock:
+            self._pending = []
+
+    def send(self, body):
+        self.queue(body)
+        return self.flush()
+
+    def flush(self):
+        with self._lock:
+            messages, self._pending = self._pending, []
+        if not messages:
+            return {"sent": 0, "failed": 0, "pruned": 0}
+
+        subscriptions = (
+            db.session.query(PushSubscription.id, PushSubscription.endpoint, PushSubscription.p256dh, PushSubscription.auth)
+            .all()
+        )
+        if not subscriptions:
+            logger.info("No active push subscriptions found.")
+            return {"sent": 0, "failed": 0, "pruned": 0}
+
+        payload = json.dumps({
+            "body": "\n".join(messages),
+            "icon": PUSH_ICON
+        })
+
+        workers = min(self.max_workers, len(subscriptions))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(lambda sub: self._deliver(sub, payload), subscriptions))
+
+        gone = [sub.id for sub, outcome in zip(subscriptions, outcomes) if outcome == "gone"]
+        if gone:
+            PushSubscription.query.filter(PushSubscription.id.in_(gone)).delete(synchronize_session=False)
+            db.session.commit()
+            logger.info(f"Pruned {len(gone)} expired push subscriptions.")
+
+        result = {
+            "sent": outcomes.count("sent"),
+            "failed": outcomes.count("failed"),
+            "pruned": len(gone)
+        }
+        with self._lock:
+            for key, value in result.items():
+                self.stats[key] += value
+        return result
+
+    def _deliver(self, sub, payload):
+        # Imported on first delivery: pywebpush pulls in cryptography, which most processes never need
+        from pywebpush import webpush, WebPushException
+        try:
+            webpush(
+                subscription_info={
+                    "endpoint": sub.endpoint,
+                    "keys": {
+                        "p256dh": sub.p256dh,
+                        "auth": sub.auth
+                    }
+                },
+                data=payload,
+                vapid_private_key=os.getenv("VAPID_PRIVATE_KEY"),
+                vapid_claims={
+                    "sub": f"mailto:{os.getenv('VAPID_ADMIN_EMAIL')}"
+                },
+                timeout=self.timeout,
+                requests_session=self.session
+            )
+            logger.debug(f"Push successfully sent to endpoint: {sub.endpoint[:60]}.")
+            return "sent"
+        except WebPushException as e:
+            status = e.response.status_code if e.response is not None else None
+            if status in GONE_STATUSES:
+                logger.info(f"Push subscription gone ({status}) for endpoint {sub.endpoint[:60]}.")
+                return "gone"
+            logger.warning(f"Push notification failed for endpoint {sub.endpoint[:60]}.")
+            return "failed"
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Push notification failed for endpoint {sub.endpoint[:60]}: {e}")
+            return "failed"
+
+pusher = PushDispatcher()
@@ -0,0 +1,203 @@
+import os, re, time, logging
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from models import db, GameSnapshot, time_bucket
+
+logger = logging.getLogger(__name__)
+
+# Every snapshot is kept for SNAPSHOT_FULL_DAYS, then the last one per game per
+# hour until SNAPSHOT_HOURLY_DAYS, then the last one per game per day.
+# SNAPSHOT_MAX_DAYS > 0 drops anything older outright.
+SNAPSHOT_FULL_DAYS = int(os.getenv("SNAPSHOT_FULL_DAYS", 8))
+SNAPSHOT_HOURLY_DAYS = int(os.getenv("SNAPSHOT_HOURLY_DAYS", 90))
+SNAPSHOT_MAX_DAYS = int(os.getenv("SNAPSHOT_MAX_DAYS", 0))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 5000))
+# On Postgres snapshots live in monthly partitions (migration 0008); this many
+# months past the current one are created ahead of time.
+SNAPSHOT_PARTITIONS_AHEAD = int(os.getenv("SNAPSHOT_PARTITIONS_AHEAD", 2))
+
+PARTITION_NAME = re.compile(r"^game_snapshots_p(\d{4})_(\d{2})$")
+
+def _month(at):
+    return datetime(at.year, at.month, 1)
+
+def _next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def exclude_snapshot_partitions(obj, name, type_, reflected, compare_to):
+    """Alembic include_object hook: the monthly partitions are managed here, not by migrations."""
+    return not (type_ == "table" and (name == "game_snapshots_default" or PARTITION_NAME.match(name)))
+
+def snapshots_partitioned():
+    """Whether game_snapshots is the partitioned table migration 0008 creates on Postgres."""
+    if db.engine.dialect.name != "postgresql":
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('game_snapshots')"
+    )).first() is not None
+
+def snapshot_partitions():
+    """{month start: partition name} of the monthly game_snapshots partitions."""
+    names = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'game_snapshots'::regclass"
+    )).scalars()
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[datetime(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+def ensure_snapshot_partitions(now=None):
+    """Create the partitions for this month and the next SNAPSHOT_PARTITIONS_AHEAD; returns their names.
+
+    Rows already in the default partition for a new month are moved into it,
+    as Postgres refuses to create a partition the default holds rows for.
+    """
+    month = _month(now or datetime.utcnow())
+    existing = snapshot_partitions()
+    created = []
+    for _ in range(SNAPSHOT_PARTITIONS_AHEAD + 1):
+        end = _next_month(month)
+        if month not in existing:
+            name = f"game_snapshots_p{month:%Y_%m}"
+            bounds = {"start": month, "end": end}
+            in_default = "FROM game_snapshots_default WHERE create_at >= :start AND create_at < :end"
+            moved = db.session.execute(text(f"SELECT 1 {in_default} LIMIT 1"), bounds).first() is not None
+            if moved:
+                db.session.execute(text(f"CREATE TEMPORARY TABLE moved_snapshots ON COMMIT DROP AS SELECT * {in_default}"), bounds)
+                db.session.execute(text(f"DELETE {in_default}"), bounds)
+            db.session.execute(text(
+                f"CREATE TABLE {name} PARTITION OF game_snapshots "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            ))
+            if moved:
+                db.session.execute(text("INSERT INTO game_snapshots SELECT * FROM moved_snapshots"))
+            db.session.commit()
+            created.append(name)
+        month = end
+    if created:
+        logger.info(f"Created snapshot partitions {', '.join(created)}")
+    return created
+
+def _drop_partitions_before(cutoff):
+    """Drop every monthly partition that ends at or before cutoff; returns their names."""
+    dropped = [
+        name for month, name in sorted(snapshot_partitions().items())
+        if _next_month(month) <= cutoff
+    ]
+    for name in dropped:
+        db.session.execute(text(f"DROP TABLE {name}"))
+    db.session.commit()
+    return dropped
+
+def _redundant_ids(start, end, unit, keep_ids):
+    """Ids in [start, end) that are neither the last snapshot of their game in a unit bucket
+    nor the first snapshot of their game overall.
+
+    playtime_forever only grows, so keeping the last row per bucket leaves every
+    difference between bucket boundaries (and so every derived total) unchanged.
+    """
+    bucket = time_bucket(GameSnapshot.create_at, unit)
+    newest_in_bucket = func.row_number().over(
+        partition_by=(GameSnapshot.game_id, bucket),
+        order_by=(GameSnapshot.create_at.desc(), GameSnapshot.id.desc())
+    ).label("newest_in_bucket")
+    ranked = (
+        db.session.query(GameSnapshot.id, GameSnapshot.game_id, newest_in_bucket)
+        .filter(GameSnapshot.create_at >= start, GameSnapshot.create_at < end)
+        .subquery()
+    )
+    return [
+        row_id for (row_id,) in
+        db.session.query(ranked.c.id)
+        .filter(ranked.c.newest_in_bucket > 1)
+        .all()
+        if row_id not in keep_ids
+    ]
+
+def _delete_ids(ids, batch_size):
+    deleted = 0
+    for i in range(0, len(ids), batch_size):
+        chunk = ids[i:i + batch_size]
+        deleted += GameSnapshot.query.filter(GameSnapshot.id.in_(chunk)).delete(synchronize_session=False)
+        db.session.commit()
+    return deleted
+
+def _compact(start, end, unit, batch_size):
+    """Compact one tier a day at a time so each window query stays small."""
+    first_ids = {
+        row_id for (row_id,) in
+        db.session.query(func.min(GameSnapshot.id)).group_by(GameSnapshot.game_id)
+    }
+    compacted = 0
+    day = datetime.combine(start.date(), datetime.min.time())
+    while day < end:
+        next_day = day + timedelta(days=1)
+        ids = _redundant_ids(max(day, start), min(next_day, end), unit, first_ids)
+        compacted += _delete_ids(ids, batch_size)
+        day = next_day
+    return compacted
+
+def _delete_older_than(cutoff, batch_size):
+    deleted = 0
+    while True:
+        ids = [
+            row_id for (row_id,) in
+            db.session.query(GameSnapshot.id)
+            .filter(GameSnapshot.create_at < cutoff)
+            .order_by(GameSnapshot.id)
+            .limit(batch_size)
+            .all()
+        ]
+        if not ids:
+            return deleted
+        deleted += _delete_ids(ids, batch_size)
+
+def expire_snapshots(cutoff, batch_size=RETENTION_BATCH_SIZE, partitioned=None):
+    """Remove snapshots older than cutoff; returns (rows deleted, partitions dropped).
+
+    Whole months go by dropping their partition, so only the rows of the
+    month the cutoff falls in are deleted one batch at a time.
+    """
+    if partitioned is None:
+        partitioned = snapshots_partitioned()
+    dropped = _drop_partitions_before(cutoff) if partitioned else []
+    return _delete_older_than(cutoff, batch_size), dropped
+
+def run_retention(now=None, batch_size=RETENTION_BATCH_SIZE):
+    """Apply the snapshot retention tiers; returns counts of rows compacted and deleted."""
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    full_cutoff = now - timedelta(days=SNAPSHOT_FULL_DAYS)
+    hourly_cutoff = now - timedelta(days=max(SNAPSHOT_HOURLY_DAYS, SNAPSHOT_FULL_DAYS))
+
+    partitioned = snapshots_partitioned()
+    if partitioned:
+        ensure_snapshot_partitions(now)
+
+    deleted, dropped = 0, []
+    oldest = db.session.query(func.min(GameSnapshot.create_at)).scalar()
+    if SNAPSHOT_MAX_DAYS > 0:
+        max_cutoff = now - timedelta(days=SNAPSHOT_MAX_DAYS)
+        deleted, dropped = expire_snapshots(max_cutoff, batch_size, partitioned)
+        if oldest is not None:
+            oldest = max(oldest, max_cutoff)
+
+    compacted_hourly = compacted_daily = 0
+    if oldest is not None:
+        if oldest < full_cutoff:
+            compacted_hourly = _compact(max(oldest, hourly_cutoff), full_cutoff, "hour", batch_size)
+        if oldest < hourly_cutoff:
+            compacted_daily = _compact(oldest, hourly_cutoff, "day", batch_size)
+
+    result = {
+        "compacted_hourly": compacted_hourly,
+        "compacted_daily": compacted_daily,
+        "deleted": deleted,
+        "dropped_partitions": len(dropped),
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+    logger.info(f"Snapshot retention: {result}")
+    return result
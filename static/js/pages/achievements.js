@@ -0,0 +1,93 @@
+const CACHE_KEY = 'achievementsCache';
+
+const loadingIndicator = document.getElementById("loadingIndicator");
+const totalPlaceholder = document.getElementById("totalPlaceholder");
+const achievementsContainer = document.getElementById("achievementsContainer");
+const recentContainer = document.getElementById("recentContainer");
+const gamesContainer = document.getElementById("gamesContainer");
+
+document.addEventListener("DOMContentLoaded", () => {
+    const cachedRaw = localStorage.getItem(CACHE_KEY);
+    if (cachedRaw) {
+        try {
+            const cached = JSON.parse(cachedRaw);
+            renderData(cached.data);
+            console.log('Data taken from cache');
+        } catch (e) {
+            console.error('Failed to parse cache: ', e);
+        }
+    }
+
+    updateAchievementsData();
+});
+
+async function updateAchievementsData() {
+    if (!localStorage.getItem(CACHE_KEY)) {
+        achievementsContainer.style.display = "none";
+        loadingIndicator.style.display = "block";
+    }
+
+    try {
+        const response = await fetch("/api/achievements");
+        if (!response.ok) throw new Error("Network error");
+
+        const data = await response.json();
+        renderData(data);
+
+        localStorage.setItem(CACHE_KEY, JSON.stringify({ data: data, timestamp: Date.now() }));
+        console.log('Data updated');
+    } catch (err) {
+        console.error("Achievements API error:", err);
+
+        if (!localStorage.getItem(CACHE_KEY)) {
+            loadingIndicator.innerHTML = `
+                <p class="text-red-400 text-lg">Failed to load :(</p>
+                <button onclick="location.reload()" class="mt-4 px-5 py-2 bg-cyan-500/20 rounded-xl hover:bg-cyan-500/30 transition">
+                    Try again
+                </button>
+            `;
+        }
+    }
+}
+
+function renderRecentItem(achievement) {
+    const unlocked = new Date(achievement.unlocked_at).toLocaleDateString();
+    return `
+        <div class="flex items-center gap-4 p-3 rounded-2xl bg-white/5 hover:bg-cyan-500/10 transition-all">
+            <img src="${achievement.icon}" alt="${achievement.name}" class="w-12 h-12 rounded-lg ring-2 ring-cyan-400/30 object-cover">
+            <div class="flex-1 min-w-0">
+                <div class="font-medium text-cyan-200 truncate">${achievement.name}</div>
+                <div class="text-sm opacity-70 truncate">${achievement.game || ''}</div>
+            </div>
+            <div class="text-xs opacity-75 text-right">${unlocked}</div>
+        </div>
+    `;
+}
+
+function renderGameItem(game) {
+    return `
+        <div class="p-4 rounded-2xl bg-white/5 hover:bg-cyan-500/10 transition-all">
+            <div class="flex items-center justify-between gap-4 mb-2">
+                <div class="font-medium text-cyan-200 truncate">${game.name || game.appid}</div>
+                <div class="text-sm opacity-80 whitespace-nowrap">${game.unlocked} / ${game.total}</div>
+            </div>
+            <div class="h-2 rounded-full bg-white/10 overflow-hidden">
+                <div class="h-full bg-gradient-to-r from-cyan-400 to-purple-500" style="width: ${game.percent}%"></div>
+            </div>
+        </div>
+    `;
+}
+
+function renderData(data) {
+    totalPlaceholder.textContent = `${data.unlocked.toLocaleString()} / ${data.total.toLocaleString()}`;
+
+    recentContainer.innerHTML = data.recent.length
+        ? data.recent.map(achievement => renderRecentItem(achievement)).join("")
+        : `<p class="opacity-70">Nothing unlocked yet</p>`;
+    gamesContainer.innerHTML = data.games
+        .map(game => renderGameItem(game))
+        .join("");
+
+    loadingIndicator.style.display = "none";
+    achievementsContainer.style.display = "block";
+}
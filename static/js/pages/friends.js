@@ -27,18 +27,39 @@ async function updateFriendsData() {
     }
 
     try {
-        const response = await fetch("/api/friends/activity");
-        if (!response.ok) throw new Error("Network error");
+        // Cached hours arrive in the first line; fresher ones follow per friend
+        const response = await fetch("/api/friends/activity/stream");
+        if (!response.ok || !response.body) throw new Error("Network error");
 
-        const data = await response.json();
-
-        const newCache = {
-            data: data,
-            timestamp: Date.now()
+        let data = null;
+        let renderQueued = false;
+        const scheduleRender = () => {
+            if (renderQueued) return;
+            renderQueued = true;
+            requestAnimationFrame(() => {
+                renderQueued = false;
+                renderData(data);
+            });
         };
-        localStorage.setItem(CACHE_KEY, JSON.stringify(newCache));
 
-        renderData(data);
+        for await (const message of readLines(response.body)) {
+            if (message.type === "snapshot") {
+                data = { me: message.me, comparisons: message.comparisons };
+            } else if (message.type === "friend") {
+                const friend = data.comparisons.find(f => f.steamid === message.steamid);
+                if (friend) friend.friend_hours = message.friend_hours;
+            } else if (message.type === "done") {
+                break;
+            }
+            data.comparisons.forEach(f => { f.diff = Math.round((data.me - f.friend_hours) * 10) / 10; });
+            data.comparisons.sort((a, b) => b.friend_hours - a.friend_hours);
+            data.comparisons.forEach((f, i, all) => {
+                f.rank = i > 0 && all[i - 1].friend_hours === f.friend_hours ? all[i - 1].rank : i + 1;
+            });
+            scheduleRender();
+        }
+
+        localStorage.setItem(CACHE_KEY, JSON.stringify({ data: data, timestamp: Date.now() }));
         console.log('Data updated');
     } catch (err) {
         console.error("Friends API error:", err);
@@ -54,6 +75,22 @@ async function updateFriendsData() {
     }
 }
 
+async function* readLines(body) {
+    const reader = body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = "";
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (line.trim()) yield JSON.parse(line);
+        }
+    }
+    if (buffer.trim()) yield JSON.parse(buffer);
+}
+
 function renderFriendItem(friend) {
     let diffHtml;
     if (friend.diff > 0) {
@@ -66,9 +103,9 @@ function renderFriendItem(friend) {
 
     return `
         <div class="flex items-center gap-4 p-4 rounded-2xl bg-white/5 hover:bg-cyan-500/10 transition-all group">
-            <img src="${friend.avatar}" alt="${friend.name}" class="w-12 h-12 rounded-full ring-2 ring-cyan-400/30 object-cover">
+            <img src="${friend.avatar || '/static/pics/icon0.png'}" alt="${friend.name}" class="w-12 h-12 rounded-full ring-2 ring-cyan-400/30 object-cover">
             <div class="flex-1 min-w-0">
-                <div class="font-medium text-cyan-200 truncate">${friend.name}</div>
+                <div class="font-medium text-cyan-200 truncate">#${friend.rank} ${friend.name}</div>
                 <div class="text-sm opacity-70">${friend.friend_hours.toLocaleString()} h played</div>
             </div>
             <div class="text-right">
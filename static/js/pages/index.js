@@ -6,6 +6,9 @@ document.addEventListener("DOMContentLoaded", () => {
         chartCanvas: document.getElementById('twoWeeksChart')
     };
 
+    let games = [];
+    let chart = null;
+
     fetchGames();
 
     function fetchGames() {
@@ -15,7 +18,8 @@ document.addEventListener("DOMContentLoaded", () => {
             .catch(handleDataError);
     }
 
-    function handleDataSuccess(games) {
+    function handleDataSuccess(data) {
+        games = data;
         ui.loading.style.display = 'none';
         ui.content.classList.remove('hidden');
         
@@ -23,6 +27,26 @@ document.addEventListener("DOMContentLoaded", () => {
 
         renderTable(games);
         renderChart(games);
+        subscribeToUpdates();
+    }
+
+    function subscribeToUpdates() {
+        if (!window.EventSource) return;
+
+        const source = new EventSource('/api/stream');
+        source.addEventListener('playtime', event => {
+            const update = JSON.parse(event.data);
+            const changed = new Map(update.games.map(game => [game.name, game]));
+
+            games = games
+                .filter(game => !update.removed.includes(game.name))
+                .map(game => changed.has(game.name) ? { ...game, ...changed.get(game.name) } : game);
+            const known = new Set(games.map(game => game.name));
+            update.games.filter(game => !known.has(game.name)).forEach(game => games.push(game));
+
+            renderTable(games);
+            renderChart(games);
+        });
     }
 
     function handleDataError(err) {
@@ -76,7 +100,8 @@ document.addEventListener("DOMContentLoaded", () => {
             ? hours.map((_, i) => `hsla(${((i * 137.508) + offset) % 360}, 80%, 65%, 0.8)`)
             : ['#1a1a2e'];
 
-        new Chart(ui.chartCanvas, {
+        if (chart) chart.destroy();
+        chart = new Chart(ui.chartCanvas, {
             type: 'doughnut',
             data: {
                 labels: labels,
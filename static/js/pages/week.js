@@ -11,7 +11,7 @@ async function fetchWeekActivity() {
     const rawDataTable = document.getElementById('rawDataTable');
 
     try {
-        const response = await fetch('/api/week-activity');
+        const response = await fetch('/api/week-activity?compact=1');
         const data = await response.json();
 
         loadingIndicator.style.display = 'none';
@@ -19,8 +19,8 @@ async function fetchWeekActivity() {
         statsListContainer.style.display = 'block';
 
         const stats = data.stats;
-        const labels = data.labels;
-        const values = data.values;
+        const labels = stats.map(row => row.name);
+        const values = stats.map(row => row.hours);
         const singleGameCover = data.single_game_cover;
 
         if (singleGameCover && stats.length === 1) {
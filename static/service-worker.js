@@ -1,4 +1,4 @@
-const CACHE_VERSION = 'core-v5';
+const CACHE_VERSION = 'core-v7';
 const STATIC_CACHE_NAME = CACHE_VERSION + '_static';
 const API_CACHE_NAME = CACHE_VERSION + '_api';
 
@@ -16,6 +16,7 @@ const coreAssets = [
     '/static/js/pages/friends.js',
     '/static/js/pages/week.js',
     '/static/js/pages/index.js',
+    '/static/js/pages/achievements.js',
 ];
 
 self.addEventListener('install', event => {
@@ -0,0 +1,111 @@
+import os, time, queue, random, asyncio, logging, threading
+import aiohttp
+from steam_client import steam, RECENTLY_PLAYED_GAMES, RETRY_STATUSES, BACKOFF_BASE, BACKOFF_CAP
+
+logger = logging.getLogger(__name__)
+
+# In-flight Steam requests across every caller in the process
+STEAM_ASYNC_CONCURRENCY = int(os.getenv("STEAM_ASYNC_CONCURRENCY", 32))
+# Per attempt, and for a whole fan-out; friends not back by then are left out
+STEAM_ASYNC_REQUEST_TIMEOUT = float(os.getenv("STEAM_ASYNC_REQUEST_TIMEOUT", 5))
+FRIENDS_FETCH_DEADLINE = float(os.getenv("FRIENDS_FETCH_DEADLINE", 8))
+ASYNC_MAX_RETRIES = 2
+
+_DONE = object()
+
+class AsyncSteamFetcher:
+    """Fetches many accounts' recent playtime over one long-lived aiohttp session.
+
+    The event loop runs in a daemon thread so Flask's sync views can use it.
+    Requests share the sync client's API key, rate limiter and latency stats.
+    """
+
+    def __init__(self, client=steam, concurrency=STEAM_ASYNC_CONCURRENCY, request_timeout=STEAM_ASYNC_REQUEST_TIMEOUT):
+        self.client = client
+        self.concurrency = concurrency
+        self.request_timeout = request_timeout
+        self._loop = None
+        self._session = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="steam-async", daemon=True).start()
+
+            async def setup():
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+                self._session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60),
+                    timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+                )
+
+            asyncio.run_coroutine_threadsafe(setup(), loop).result()
+            self._loop = loop
+            return loop
+
+    async def _get(self, endpoint, params):
+        stats = self.client.endpoint_stats(endpoint)
+        params = {"key": self.client.api_key or "", "format": "json", **params}
+        for attempt in range(ASYNC_MAX_RETRIES + 1):
+            wait = self.client.limiter.reserve()
+            if wait is None:
+                stats.record_error()
+                return None
+            if wait:
+                await asyncio.sleep(wait)
+
+            started = time.perf_counter()
+            async with self._semaphore:
+                try:
+                    async with self._session.get(self.client.base + endpoint, params=params) as r:
+                        stats.observe(time.perf_counter() - started)
+                        if r.status == 200:
+                            return await r.json(content_type=None)
+                        if r.status not in RETRY_STATUSES:
+                            break
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    stats.observe(time.perf_counter() - started)
+                    logger.debug(f"{endpoint} failed: {e}")
+            if attempt < ASYNC_MAX_RETRIES:
+                stats.record_retry()
+                await asyncio.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+        stats.record_error()
+        return None
+
+    async def _playtime(self, steamid):
+        data = await self._get(RECENTLY_PLAYED_GAMES, {"steamid": steamid})
+        if data is None:
+            return steamid, None
+        games = data.get("response", {}).get("games", [])
+        return steamid, round(sum(g.get("playtime_2weeks", 0) for g in games) / 60, 1)
+
+    async def _fan_out(self, steamids, deadline, results):
+        tasks = [asyncio.ensure_future(self._playtime(sid)) for sid in steamids]
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=deadline):
+                results.put(await next_done)
+        except asyncio.TimeoutError:
+            logger.info(f"Playtime fan-out hit its {deadline}s deadline")
+        finally:
+            for task in tasks:
+                task.cancel()
+            results.put(_DONE)
+
+    def iter_playtimes(self, steamids, deadline=FRIENDS_FETCH_DEADLINE):
+        """Yield (steamid, hours or None) as each fetch finishes; stops at the deadline."""
+        steamids = list(dict.fromkeys(steamids))
+        if not steamids:
+            return
+        results = queue.Queue()
+        asyncio.run_coroutine_threadsafe(self._fan_out(steamids, deadline, results), self._ensure_loop())
+        while True:
+            item = results.get()
+            if item is _DONE:
+                return
+            yield item
+
+fetcher = AsyncSteamFetcher()
@@ -0,0 +1,221 @@
+import os, time, random, logging, threading
+import requests
+from bisect import bisect_left
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RECENTLY_PLAYED_GAMES = "IPlayerService/GetRecentlyPlayedGames/v0001/"
+FRIEND_LIST = "ISteamUser/GetFriendList/v0001/"
+PLAYER_SUMMARIES = "ISteamUser/GetPlayerSummaries/v0002/"
+PLAYER_ACHIEVEMENTS = "ISteamUserStats/GetPlayerAchievements/v0001/"
+SCHEMA_FOR_GAME = "ISteamUserStats/GetSchemaForGame/v2/"
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+TIMEOUTS = {
+    RECENTLY_PLAYED_GAMES: (3.05, 10),
+    FRIEND_LIST: (3.05, 10),
+    PLAYER_SUMMARIES: (3.05, 15),
+    PLAYER_ACHIEVEMENTS: (3.05, 10),
+    SCHEMA_FOR_GAME: (3.05, 15),
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = int(os.getenv("STEAM_MAX_RETRIES", 3))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8
+
+# Steam Web API keys are limited to 100k calls per day
+DAILY_QUOTA = int(os.getenv("STEAM_DAILY_QUOTA", 100_000))
+RATE_BURST = int(os.getenv("STEAM_RATE_BURST", 100))
+RATE_MAX_WAIT = float(os.getenv("STEAM_RATE_MAX_WAIT", 30))
+
+POOL_SIZE = int(os.getenv("STEAM_POOL_SIZE", 20))
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+# GetPlayerSummaries accepts at most 100 comma-separated steamids
+SUMMARIES_CHUNK_SIZE = 100
+
+class SteamAPIError(Exception):
+    def __init__(self, endpoint, message, status=None):
+        super().__init__(f"{endpoint}: {message}")
+        self.endpoint = endpoint
+        self.status = status
+
+class RateLimiter:
+    """Token bucket shared by every thread of the process."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=RATE_MAX_WAIT):
+        """Take a token; returns seconds to wait before using it, or None if that exceeds max_wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the token now, even if it has to be waited for
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+            if wait > max_wait:
+                self.tokens += 1
+                return None
+        return wait
+
+    def acquire(self, max_wait=RATE_MAX_WAIT):
+        wait = self.reserve(max_wait)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+class EndpointStats:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": round(self.total, 4),
+                "errors": self.errors,
+                "retries": self.retries,
+                "buckets": {str(le): n for le, n in zip(LATENCY_BUCKETS, self.buckets)},
+            }
+
+class SteamClient:
+    def __init__(self, api_key=None, base=None):
+        self._api_key = api_key
+        self._base = base
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.limiter = RateLimiter(rate=DAILY_QUOTA / 86400, burst=RATE_BURST)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @property
+    def api_key(self):
+        return self._api_key or os.getenv("STEAM_API_KEY")
+
+    @property
+    def base(self):
+        return self._base or os.getenv("STEAM_API_BASE", "http://api.steampowered.com/")
+
+    def endpoint_stats(self, endpoint):
+        with self._lock:
+            return self._stats.setdefault(endpoint, EndpointStats())
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: s.as_dict() for endpoint, s in self._stats.items()}
+
+    def get(self, endpoint, params):
+        """GET an endpoint and return its decoded JSON, retrying 429/5xx with jittered backoff."""
+        stats = self.endpoint_stats(endpoint)
+        params = {"key": self.api_key, "format": "json", **params}
+        timeout = TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+
+        for attempt in range(MAX_RETRIES + 1):
+            if not self.limiter.acquire():
+                stats.record_error()
+                raise SteamAPIError(endpoint, "local rate limit exceeded")
+
+            started = time.perf_counter()
+            retry_after = None
+            try:
+                r = self.session.get(self.base + endpoint, params=params, timeout=timeout)
+                stats.observe(time.perf_counter() - started)
+                if r.status_code == 200:
+                    return r.json()
+                if r.status_code not in RETRY_STATUSES:
+                    stats.record_error()
+                    raise SteamAPIError(endpoint, f"HTTP {r.status_code}", status=r.status_code)
+                error = SteamAPIError(endpoint, f"HTTP {r.status_code}", status=r.status_code)
+                retry_after = r.headers.get("Retry-After")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                stats.observe(time.perf_counter() - started)
+                error = SteamAPIError(endpoint, str(e))
+            except ValueError as e:
+                stats.record_error()
+                raise SteamAPIError(endpoint, f"invalid JSON: {e}")
+
+            if attempt == MAX_RETRIES:
+                break
+            stats.record_retry()
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, min(BACKOFF_CAP, int(retry_after)))
+            logger.debug(f"Retrying {endpoint} in {delay:.2f}s after: {error}")
+            time.sleep(delay)
+
+        stats.record_error()
+        raise error
+
+    def recently_played_games(self, steamid):
+        data = self.get(RECENTLY_PLAYED_GAMES, {"steamid": steamid})
+        return data.get("response", {}).get("games", [])
+
+    def friend_list(self, steamid):
+        """Friend steamids, or None when Steam does not return a friend list."""
+        data = self.get(FRIEND_LIST, {"steamid": steamid, "relationship": "friend"})
+        if "friendslist" not in data:
+            return None
+        return [f["steamid"] for f in data["friendslist"].get("friends", [])]
+
+    def player_summaries(self, steamids):
+        players = {}
+        for i in range(0, len(steamids), SUMMARIES_CHUNK_SIZE):
+            chunk = steamids[i:i + SUMMARIES_CHUNK_SIZE]
+            data = self.get(PLAYER_SUMMARIES, {"steamids": ",".join(chunk)})
+            for player in data.get("response", {}).get("players", []):
+                players[player["steamid"]] = player
+        return players
+
+    def player_achievements(self, steamid, appid):
+        """{apiname: unlock unix time} of the unlocked achievements, or None when Steam has none to show.
+
+        Steam answers 400 for a game without stats and 403 for a private profile.
+        """
+        try:
+            data = self.get(PLAYER_ACHIEVEMENTS, {"steamid": steamid, "appid": appid})
+        except SteamAPIError as e:
+            if e.status in (400, 403):
+                return None
+            raise
+        achievements = data.get("playerstats", {}).get("achievements", [])
+        return {a["apiname"]: a.get("unlocktime", 0) for a in achievements if a.get("achieved")}
+
+    def game_schema(self, appid):
+        """(game name, achievement definitions) of an app; the list is empty for games without achievements."""
+        game = self.get(SCHEMA_FOR_GAME, {"appid": appid, "l": "english"}).get("game", {})
+        return game.get("gameName"), game.get("availableGameStats", {}).get("achievements", [])
+
+steam = SteamClient()
@@ -0,0 +1,138 @@
+import os, json, time, queue, logging, threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from models import db, StreamEvent
+
+logger = logging.getLogger(__name__)
+
+# How often each web process looks for new events while clients are connected
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", 2))
+# Comment lines keep proxies from closing idle connections and reveal dead clients
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", 15))
+# Every client holds a server thread, so keep some for ordinary requests
+STREAM_MAX_CLIENTS = int(os.getenv("STREAM_MAX_CLIENTS", 48))
+STREAM_EVENT_TTL = timedelta(minutes=int(os.getenv("STREAM_EVENT_TTL_MINUTES", 60)))
+# A client this far behind is disconnected; it resumes from Last-Event-ID
+STREAM_BACKLOG = 100
+
+class StreamFull(Exception):
+    pass
+
+class EventStream:
+    """Fans sync events out to Server-Sent Events clients.
+
+    Events are rows in stream_events written in the publisher's transaction,
+    so the worker process reaches every web process through the database.
+    One thread per web process reads new rows and hands them to the
+    in-process subscriber queues.
+    """
+
+    def __init__(self, max_clients=STREAM_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0}
+        self._subscribers = set()
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def publish(self, kind, data):
+        """Add an event to the current transaction; clients see it once committed."""
+        now = datetime.utcnow()
+        db.session.execute(
+            StreamEvent.__table__.insert(),
+            {"kind": kind, "data": json.dumps(data), "created_at": now}
+        )
+        StreamEvent.query.filter(StreamEvent.created_at < now - STREAM_EVENT_TTL).delete(synchronize_session=False)
+        self.stats["published"] += 1
+
+    def subscribe(self, last_event_id=None):
+        """Register a client and return a generator of (id, kind, data) tuples.
+
+        The generator yields None every heartbeat interval and stops when the
+        client falls too far behind. Retained events after last_event_id are
+        replayed first.
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                raise StreamFull()
+            if not self._subscribers:
+                # Nobody was listening, so skip what arrived in the meantime
+                self._cursor = db.session.query(func.max(StreamEvent.id)).scalar() or 0
+            cursor = self._cursor
+            inbox = queue.Queue()
+            self._subscribers.add(inbox)
+        self._start(current_app._get_current_object())
+
+        backlog = []
+        if last_event_id is not None and last_event_id < cursor:
+            backlog = [
+                (e.id, e.kind, e.data) for e in
+                StreamEvent.query
+                .filter(StreamEvent.id > last_event_id, StreamEvent.id <= cursor)
+                .order_by(StreamEvent.id)
+            ]
+        # The generator outlives this request's database use
+        db.session.close()
+        return self._listen(inbox, backlog)
+
+    def _listen(self, inbox, backlog):
+        try:
+            yield from backlog
+            while True:
+                try:
+                    event = inbox.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                yield event
+        finally:
+            with self._lock:
+                self._subscribers.discard(inbox)
+
+    def _start(self, app):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, args=(app,), name="event-stream", daemon=True)
+            self._thread.start()
+
+    def _run(self, app):
+        while True:
+            time.sleep(STREAM_POLL_SECONDS)
+            if not self._subscribers:
+                continue
+            try:
+                with app.app_context():
+                    events = [
+                        (e.id, e.kind, e.data) for e in
+                        StreamEvent.query
+                        .filter(StreamEvent.id > self._cursor)
+                        .order_by(StreamEvent.id)
+                        .limit(STREAM_BACKLOG)
+                    ]
+            except Exception as e:
+                logger.warning(f"Reading stream events failed: {e}")
+                continue
+            if events:
+                self._dispatch(events)
+
+    def _dispatch(self, events):
+        with self._lock:
+            self._cursor = events[-1][0]
+            for inbox in list(self._subscribers):
+                if inbox.qsize() >= STREAM_BACKLOG:
+                    self._subscribers.discard(inbox)
+                    inbox.put(None)
+                    self.stats["dropped"] += 1
+                    continue
+                for event in events:
+                    inbox.put(event)
+                self.stats["delivered"] += len(events)
+
+    def clients(self):
+        return len(self._subscribers)
+
+stream = EventStream()
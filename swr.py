@@ -0,0 +1,150 @@
+import time, gzip, hashlib, logging, threading
+from flask import current_app, request, Response
+from metrics import cache_requests
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# How long an entry may be served stale while a refresh runs
+DEFAULT_STALE_FOR = 24 * 60 * 60
+# A refresh that takes longer than this is assumed dead and may be retried
+REFRESH_LOCK_TIMEOUT = 120
+# Smaller bodies are sent as is; compression would not pay for its headers
+COMPRESS_MIN_SIZE = 512
+
+def _encode(value):
+    """Serialized body of a payload, its strong ETag and its compressed forms."""
+    body = current_app.json.dumps(value).encode()
+    encoded = {"etag": hashlib.sha1(body).hexdigest(), "identity": body}
+    if len(body) >= COMPRESS_MIN_SIZE:
+        encoded["gzip"] = gzip.compress(body, compresslevel=6)
+        if brotli is not None:
+            encoded["br"] = brotli.compress(body, quality=5)
+    return encoded
+
+class StaleWhileRevalidate:
+    """Serve cached JSON payloads immediately and refresh expired ones in the background.
+
+    Entries are stored in the Flask-Caching backend as {"value", "created",
+    "bodies"}. Past fresh_for seconds the stale value is still returned while
+    a single refresh runs; the lock lives in the cache too, so with a shared
+    backend only one process refreshes a given key.
+
+    Bodies are serialized and compressed once per refresh and carry a strong
+    ETag, so requests with a matching If-None-Match get a bare 304. Endpoints
+    given a compact function also serve that shape for ?compact=1.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.endpoints = {}
+
+    @staticmethod
+    def _key(name):
+        return f"swr:{name}"
+
+    def payload(self, name, fresh_for=600, stale_for=DEFAULT_STALE_FOR, compact=None):
+        """Register f as the function computing payload name, without serving it; see serve()."""
+        def decorator(f):
+            self.endpoints[name] = (f, fresh_for, stale_for, compact)
+            return f
+        return decorator
+
+    def serve(self, name):
+        """Response for a registered payload in the shape the request asks for (?compact=1)."""
+        shape = "compact" if request.args.get("compact") in ("1", "true") else "full"
+        return self.respond(name, shape)
+
+    def _entry(self, name):
+        entry = self.cache.get(self._key(name))
+        # Entries written before bodies were cached are treated as misses
+        if entry is None or "bodies" not in entry:
+            cache_requests.inc(cache=name, result="miss")
+            return self._store(name)
+
+        _, fresh_for, _, _ = self.endpoints[name]
+        if time.time() - entry["created"] > fresh_for:
+            cache_requests.inc(cache=name, result="stale")
+            self._refresh_in_background(name)
+        else:
+            cache_requests.inc(cache=name, result="fresh")
+        return entry
+
+    def get(self, name):
+        return self._entry(name)["value"]
+
+    def respond(self, name, shape="full"):
+        bodies = self._entry(name)["bodies"]
+        encoded = bodies.get(shape, bodies["full"])
+        headers = {
+            "ETag": f'"{encoded["etag"]}"',
+            "Vary": "Accept-Encoding",
+            # Browsers may keep the body but must revalidate before using it
+            "Cache-Control": "no-cache"
+        }
+        if request.if_none_match.contains(encoded["etag"]):
+            cache_requests.inc(cache=name, result="not_modified")
+            return Response(status=304, headers=headers)
+
+        encoding = request.accept_encodings.best_match(
+            [e for e in ("br", "gzip") if e in encoded]
+        )
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(encoded[encoding or "identity"], mimetype="application/json", headers=headers)
+
+    def refresh(self, name):
+        return self._store(name)["value"]
+
+    def _store(self, name):
+        compute, fresh_for, stale_for, compact = self.endpoints[name]
+        value = compute()
+        bodies = {"full": _encode(value)}
+        if compact is not None:
+            bodies["compact"] = _encode(compact(value))
+        entry = {"value": value, "created": time.time(), "bodies": bodies}
+        self.cache.set(self._key(name), entry, timeout=fresh_for + stale_for)
+        return entry
+
+    def _refresh_in_background(self, name):
+        lock = self._key(name) + ":lock"
+        if not self.cache.add(lock, True, timeout=REFRESH_LOCK_TIMEOUT):
+            return
+
+        app = current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                try:
+                    self.refresh(name)
+                except Exception as e:
+                    logger.warning(f"Background refresh of {name} failed: {e}")
+                finally:
+                    self.cache.delete(lock)
+
+        threading.Thread(target=run, name=f"swr-{name}", daemon=True).start()
+
+    def expire(self, name):
+        """Mark a cached payload stale, so the next request serves it once and refreshes it."""
+        entry = self.cache.get(self._key(name))
+        if entry is not None:
+            self.cache.set(self._key(name), {**entry, "created": 0}, timeout=DEFAULT_STALE_FOR)
+
+    def warm(self, *names):
+        """Recompute payloads ahead of user requests; meant to run right after a sync.
+
+        Payloads not registered in this process are expired instead, so the
+        next request refreshes them.
+        """
+        for name in names or list(self.endpoints):
+            try:
+                if name in self.endpoints:
+                    self.refresh(name)
+                else:
+                    self.expire(name)
+            except Exception as e:
+                logger.warning(f"Cache warming of {name} failed: {e}")
@@ -0,0 +1,899 @@
+import os, random, logging, hashlib, pytz
+from core import app, swr, STEAM_ID, tz_Minsk
+from models import (
+    db, PlayedGame, GameSnapshot, Friend, FriendPlaytime, DailyStat, PlaytimeRollup, TrackedAccount,
+    GameSchema, Achievement, PlayerAchievement, upsert, latest_snapshots, hour_bucket, ensure_accounts, poll_offset
+)
+from push import pusher
+from steam_client import steam, SteamAPIError
+from steam_async import fetcher
+from stream import stream
+from metrics import registry, timed, job_failures, histogram_samples
+from retention import run_retention
+from images import image_cache, cover_url, VARIANTS
+from job_queue import handler, enqueue, prune as prune_jobs
+from datetime import datetime, date, timedelta
+from collections import defaultdict, Counter
+from sqlalchemy import func, update, bindparam, or_
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Syncs and scheduled jobs. Kept apart from main.py so the worker can run
+# them without importing the web app's routes.
+
+logger = logging.getLogger(__name__)
+
+# Each tracked account is polled once per POLL_INTERVAL at its own offset;
+# the scheduler ticks every POLL_TICK_SECONDS and syncs whoever is due.
+POLL_INTERVAL = timedelta(minutes=int(os.getenv("POLL_INTERVAL_MINUTES", 15)))
+POLL_TICK_SECONDS = int(os.getenv("POLL_TICK_SECONDS", 60))
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", 8))
+POLL_BATCH_LIMIT = int(os.getenv("POLL_BATCH_LIMIT", 500))
+# Adaptive polling: every account's presence (GetPlayerSummaries, 100 accounts a call) is
+# checked every POLL_PRESENCE_INTERVAL; it decides how soon its games are fetched again
+POLL_ADAPTIVE = os.getenv("POLL_ADAPTIVE", "true").lower() in ("1", "true", "yes")
+POLL_PRESENCE_INTERVAL = timedelta(minutes=int(os.getenv("POLL_PRESENCE_MINUTES", 2)))
+POLL_ACTIVE_INTERVAL = timedelta(minutes=int(os.getenv("POLL_ACTIVE_MINUTES", 2)))
+POLL_ONLINE_INTERVAL = timedelta(minutes=int(os.getenv("POLL_ONLINE_MINUTES", 10)))
+POLL_OFFLINE_INTERVAL = timedelta(minutes=int(os.getenv("POLL_OFFLINE_MINUTES", 30)))
+POLL_OFFLINE_MAX_INTERVAL = timedelta(minutes=int(os.getenv("POLL_OFFLINE_MAX_MINUTES", 60)))
+POLL_OFFLINE_BACKOFF_AFTER = timedelta(hours=int(os.getenv("POLL_OFFLINE_BACKOFF_HOURS", 2)))
+# An account that played without showing it stays on the fixed POLL_INTERVAL this long after its last change
+POLL_HIDDEN_INTERVAL = timedelta(days=int(os.getenv("POLL_HIDDEN_DAYS", 7)))
+EPOCH = datetime(1970, 1, 1)
+# Account syncs by outcome since this process started
+poll_runs = Counter()
+
+# Each friend's two-week hours are refreshed once per FRIEND_REFRESH_INTERVAL, staggered like accounts
+FRIEND_REFRESH_INTERVAL = timedelta(minutes=int(os.getenv("FRIEND_REFRESH_MINUTES", 30)))
+FRIEND_REFRESH_BATCH = int(os.getenv("FRIEND_REFRESH_BATCH", 500))
+FRIEND_TREND_DAYS = int(os.getenv("FRIEND_TREND_DAYS", 14))
+
+# Games whose achievements are refreshed per run, out of those whose playtime moved since their last refresh
+ACHIEVEMENTS_BATCH = int(os.getenv("ACHIEVEMENTS_BATCH", 50))
+
+# Missed daily stats are caught up this many days back
+DAILY_STAT_CATCHUP_DAYS = int(os.getenv("DAILY_STAT_CATCHUP_DAYS", 7))
+
+# Cached dashboard payloads that change when the owner's account syncs
+DASHBOARD_PAYLOADS = ("recent-games", "week-activity", "friends-activity")
+
+def games_fingerprint(games_list):
+    """Digest of everything save_games_to_db writes for a payload, independent of order."""
+    games = sorted(
+        (g.get("appid") or 0, g.get("playtime_forever", 0), g.get("playtime_2weeks", 0), g.get("name"))
+        for g in games_list if g.get("name")
+    )
+    return hashlib.sha1(repr(games).encode()).hexdigest()
+
+def save_games_to_db(games_list, account_id=None, now=None):
+    saved, updated, deleted = 0, 0, 0
+    
+    primary_id = primary_account_id()
+    account_id = account_id or primary_id
+    # Only the owner's own games produce notifications
+    notify = pusher.queue if account_id == primary_id else (lambda message: None)
+    
+    phrases_for_deleted = [
+        "\"{}\" has dropped out of the recent",
+        "\"{}\" did not start for more than two weeks",
+        "Goodbye, \"{}\""
+    ]
+    
+    phrases_for_saved = [
+        "You started playing \"{}\"",
+        "Welcome aboard, \"{}\"",
+        "\"{}\" added to statistics"
+    ]
+    
+    # Last entry wins if Steam ever repeats a name
+    current = {}
+    for g in games_list:
+        name = g.get("name")
+        if not name:
+            continue
+        current[name] = {
+            "account_id": account_id,
+            "name": name,
+            "appid": g.get("appid"),
+            "play_time_2weeks": g.get("playtime_2weeks", 0),
+            "playtime_forever": g.get("playtime_forever", 0)
+        }
+    
+    stored = {
+        name: (game_id, appid, play_time_2weeks, playtime_forever)
+        for name, game_id, appid, play_time_2weeks, playtime_forever in
+        db.session.query(
+            PlayedGame.name, PlayedGame.id, PlayedGame.appid,
+            PlayedGame.play_time_2weeks, PlayedGame.playtime_forever
+        )
+        .filter(PlayedGame.account_id == account_id)
+        .all()
+    }
+    existing = {name: values[0] for name, values in stored.items()}
+    
+    old_games = {
+        name: game_id for name, game_id in existing.items()
+        if name is not None and name not in current
+    }
+    if old_games:
+        old_ids = list(old_games.values())
+        GameSnapshot.query.filter(GameSnapshot.game_id.in_(old_ids)).delete(synchronize_session=False)
+        PlayedGame.query.filter(PlayedGame.id.in_(old_ids)).delete(synchronize_session=False)
+        deleted = len(old_games)
+        
+        for name in old_games:
+            message = random.choice(phrases_for_deleted).format(name)
+            notify(message)
+    
+    new_names = [name for name in current if name not in existing]
+    saved = len(new_names)
+    
+    # Only rows whose values differ from what is stored are written
+    changed = [
+        row for name, row in current.items()
+        if name not in stored
+        or stored[name][1:] != (row["appid"], row["play_time_2weeks"], row["playtime_forever"])
+    ]
+    updated = len(changed) - saved
+    upsert(
+        PlayedGame,
+        changed,
+        index_elements=["account_id", "name"],
+        update_columns=["appid", "play_time_2weeks", "playtime_forever"]
+    )
+    
+    game_ids = {name: existing[name] for name in current if name in existing}
+    # The stored row always carries the last synced playtime, so only games
+    # whose playtime moved can need a snapshot
+    moved_ids = [
+        game_ids[name] for name in game_ids
+        if stored[name][3] != current[name]["playtime_forever"]
+    ]
+    if new_names:
+        game_ids.update(
+            db.session.query(PlayedGame.name, PlayedGame.id)
+            .filter(PlayedGame.account_id == account_id, PlayedGame.name.in_(new_names))
+            .all()
+        )
+        for name in new_names:
+            message = random.choice(phrases_for_saved).format(name)
+            notify(message)
+    
+    # New games have no snapshots yet, so only moved ids need a lookup
+    last_playtime = latest_snapshots(moved_ids) if moved_ids else {}
+    moved_ids = set(moved_ids)
+    
+    now = now or datetime.utcnow()
+    snapshots_to_add = [
+        {"game_id": game_ids[name], "playtime_forever": row["playtime_forever"], "create_at": now}
+        for name, row in current.items()
+        if (name not in stored or game_ids[name] in moved_ids)
+        and last_playtime.get(game_ids[name]) != row["playtime_forever"]
+    ]
+    if snapshots_to_add:
+        db.session.execute(GameSnapshot.__table__.insert(), snapshots_to_add)
+    
+    bucket = hour_bucket(now)
+    # Minutes since the last sync, from the stored row: a game without a snapshot still counts
+    rollups = [
+        {
+            "account_id": account_id,
+            "name": name,
+            "appid": row["appid"],
+            "bucket_start": bucket,
+            "minutes": row["playtime_forever"] - stored[name][3]
+        }
+        for name, row in current.items()
+        if name in stored and stored[name][3] is not None and row["playtime_forever"] > stored[name][3]
+    ]
+    upsert(
+        PlaytimeRollup,
+        rollups,
+        index_elements=["account_id", "name", "bucket_start"],
+        update_columns=["appid"],
+        increment_columns=["minutes"]
+    )
+    
+    if account_id == primary_id and (changed or old_games):
+        stream.publish("playtime", {
+            "games": [
+                {
+                    "name": row["name"],
+                    "appid": row["appid"],
+                    "playtime_2weeks": row["play_time_2weeks"],
+                    "playtime_forever": row["playtime_forever"],
+                    "delta": row["playtime_forever"] - stored[row["name"]][3] if row["name"] in stored else 0
+                }
+                for row in changed
+            ],
+            "removed": list(old_games),
+            "at": now.isoformat() + "Z"
+        })
+    
+    # Only the owner's covers are shown, so only theirs are worth fetching early
+    if account_id == primary_id:
+        prefetch_covers({current[name]["appid"] for name in new_names if current[name]["appid"]})
+    db.session.commit()
+    # Deliver after commit so a slow push service never holds the transaction open
+    pusher.flush()
+    return {"saved": saved, "updated": updated, "deleted": deleted, "played": len(rollups)}
+
+def minsk_day_bounds(first_day, last_day=None):
+    """Naive UTC [start, end) covering the Minsk calendar days first_day..last_day."""
+    last_day = last_day or first_day
+    # localize() rather than tzinfo=: pytz would otherwise use Minsk LMT (+01:50)
+    start_Minsk = tz_Minsk.localize(datetime.combine(first_day, datetime.min.time()))
+    end_Minsk = tz_Minsk.localize(datetime.combine(last_day + timedelta(days=1), datetime.min.time()))
+    return (
+        start_Minsk.astimezone(pytz.utc).replace(tzinfo=None),
+        end_Minsk.astimezone(pytz.utc).replace(tzinfo=None)
+    )
+
+def minsk_day(column):
+    """SQL expression for the Minsk calendar date of a naive UTC timestamp column."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone(tz_Minsk.zone, func.timezone("UTC", column)))
+    # SQLite has no time zone database; Minsk has kept a fixed offset since 2011
+    offset = datetime.now(tz_Minsk).utcoffset()
+    return func.date(column, f"{int(offset.total_seconds())} seconds")
+
+def daily_totals(first_day, last_day=None):
+    """{date: {game name: minutes}} of the owner's account for Minsk days first_day..last_day, in one grouped query."""
+    start, end = minsk_day_bounds(first_day, last_day)
+    day = minsk_day(PlaytimeRollup.bucket_start).label("day")
+    rows = (
+        db.session.query(day, PlaytimeRollup.name, func.sum(PlaytimeRollup.minutes))
+        .filter(
+            PlaytimeRollup.account_id == primary_account_id(),
+            PlaytimeRollup.bucket_start >= start,
+            PlaytimeRollup.bucket_start < end
+        )
+        .group_by(day, PlaytimeRollup.name)
+        .all()
+    )
+    
+    totals = defaultdict(dict)
+    for day, name, minutes in rows:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        totals[day][name] = int(minutes)
+    return totals
+
+def daily_message(total_hours):
+    phrases = (
+                [
+                    f"Come on! {total_hours}h! Really? Go touch the grass today!",
+                    f"{total_hours}h! You can't live yesterday again",
+                    f"If you spent {total_hours} hours every day learning programming, you would have been on the Forbes list a long time ago.",
+                    f"You played for {total_hours} hours yesterday. 🥴",
+                    f"{total_hours} hours! 🖕"
+                ]
+                if total_hours > 2 else
+                [
+                    f"{total_hours}h! I hope yesterday was a really great day!",
+                    f"Just {total_hours}h. Life really is beautiful, isn't it?",
+                    f"Well... {total_hours}h. This is truly a success.",
+                    f"You played for {total_hours} hours yesterday. 😎",
+                    f"{total_hours} hours! 🤘"
+                ]
+            )
+    return random.choice(phrases)
+
+@timed("daily_stat")
+def update_daily_stat(day=None):
+    """Store the owner's total for a Minsk day (default yesterday) and push it.
+
+    Days caught up later than the morning after are stored without a push.
+    """
+    with app.app_context():
+        yesterday = datetime.now(tz_Minsk).date() - timedelta(days=1)
+        day = date.fromisoformat(day) if isinstance(day, str) else day or yesterday
+        notify = day == yesterday
+        logger.info(f"Starting daily statistics update for {day}.")
+        
+        stats_dict = daily_totals(day).get(day, {})
+        
+        if not stats_dict:
+            logger.info(f"No playtime recorded on {day}")
+            if notify:
+                send_push("Are you alive? 🙂‍")
+            return {"day": day.isoformat(), "total_minutes": 0}
+                
+        total_minutes = sum(stats_dict.values())
+        total_hours = round(total_minutes / 60, 1)
+        
+        message = daily_message(total_hours)
+        
+        if notify and total_minutes > 0:
+            pusher.queue(message)
+        elif notify:
+            pusher.queue("0h! Need to fix a bug.")
+            logger.info("Total playtime was 0 hours.")
+            logger.debug(f"Debug stats dictionary for {day}: {stats_dict}")
+        
+        upsert(
+            DailyStat,
+            [{"date": day, "total_minutes": int(total_minutes), "message": message}],
+            index_elements=["date"],
+            update_columns=["total_minutes", "message"]
+        )
+        db.session.commit()
+        pusher.flush()
+        
+        logger.info(f"Daily stat updated for {day}. Total hours: {total_hours}")
+        return {"day": day.isoformat(), "total_minutes": int(total_minutes)}
+
+def enqueue_daily_stats():
+    """Queue a daily stat job for yesterday and every earlier day in DAILY_STAT_CATCHUP_DAYS still missing one.
+
+    Each day is queued at most once, so this is safe to call from every
+    scheduler start and every cron run.
+    """
+    yesterday = datetime.now(tz_Minsk).date() - timedelta(days=1)
+    first_day = yesterday - timedelta(days=DAILY_STAT_CATCHUP_DAYS - 1)
+    stored = {d for (d,) in db.session.query(DailyStat.date).filter(DailyStat.date >= first_day)}
+    queued = []
+    day = first_day
+    while day <= yesterday:
+        if day not in stored and enqueue("daily_stat", {"day": day.isoformat()}, dedupe_key=f"daily_stat:{day}"):
+            queued.append(day.isoformat())
+        day += timedelta(days=1)
+    db.session.commit()
+    if queued:
+        logger.info(f"Queued daily stats for {', '.join(queued)}")
+    return queued
+
+def daily_stat_job():
+    with app.app_context():
+        enqueue_daily_stats()
+
+@timed("snapshot_retention")
+def snapshot_retention():
+    with app.app_context():
+        try:
+            run_retention()
+            prune_jobs()
+        except Exception as e:
+            db.session.rollback()
+            job_failures.inc(job="snapshot_retention")
+            logger.error(f"An error occurred during snapshot retention: {e}", exc_info=True)
+
+def primary_account_id():
+    """Id of the STEAM_ID account, which the dashboard and notifications are about."""
+    return ensure_accounts([STEAM_ID])[STEAM_ID]
+
+def next_poll_time(previous, now, interval=POLL_INTERVAL):
+    """Advance by whole intervals so every account keeps its slot in the cycle."""
+    if previous > now:
+        return previous
+    missed = (now - previous) // interval + 1
+    return previous + missed * interval
+
+def presence_state(player):
+    """in_game, online or offline from a GetPlayerSummaries entry.
+
+    gameid is only shown for profiles whose game details are public.
+    """
+    if player.get("gameid"):
+        return "in_game"
+    return "online" if player.get("personastate", 0) else "offline"
+
+def account_presence(steamids):
+    """{steamid: (presence state, lastlogoff)}; empty if Steam could not be asked."""
+    try:
+        players = steam.player_summaries(steamids)
+    except SteamAPIError as e:
+        logger.warning(f"Presence check failed, syncing every due account: {e}")
+        return {}
+    return {steamid: (presence_state(player), player.get("lastlogoff")) for steamid, player in players.items()}
+
+def needs_sync(account, state, last_logoff, now):
+    """Whether an account's games must be fetched this tick, given its presence right now."""
+    if account.next_poll_at <= now:
+        return True
+    if state is None:
+        return False
+    if (state == "in_game") != (account.presence == "in_game"):
+        # A session started, or ended and its last sync records where
+        return True
+    # Came online and left again between two checks; it may have played meanwhile
+    return last_logoff is not None and account.last_logoff is not None and last_logoff > account.last_logoff
+
+def next_adaptive_poll(account, state, now, last_active_at, fetched):
+    """When the account's games are fetched next, backing off while it is idle."""
+    if state is None or state == "hidden":
+        return next_poll_time(account.next_poll_at, now)
+    if state == "in_game":
+        interval = POLL_ACTIVE_INTERVAL
+    elif state == "online":
+        interval = POLL_ONLINE_INTERVAL
+    elif last_active_at is not None and now - last_active_at < POLL_OFFLINE_BACKOFF_AFTER:
+        interval = POLL_OFFLINE_INTERVAL
+    else:
+        interval = POLL_OFFLINE_MAX_INTERVAL
+    # A shorter interval for a new state applies at once, a longer one from this fetch on
+    return now + interval if fetched else min(account.next_poll_at, now + interval)
+
+def fixed_slot_passed(steamid, since, now):
+    """Whether the account's slot on the fixed POLL_INTERVAL schedule came up in (since, now]."""
+    base = EPOCH + poll_offset(steamid, POLL_INTERVAL)
+    return since is None or (now - base) // POLL_INTERVAL > (since - base) // POLL_INTERVAL
+
+def poll_due_accounts(now=None):
+    """Sync every enabled account whose slot has come up; returns per-run counts.
+
+    With POLL_ADAPTIVE, every enabled account's presence is checked each
+    POLL_PRESENCE_INTERVAL, one GetPlayerSummaries call per 100 accounts,
+    and only the game fetches back off: accounts in a game are synced every
+    POLL_ACTIVE_INTERVAL, online ones every POLL_ONLINE_INTERVAL and offline
+    ones every POLL_OFFLINE_INTERVAL, then POLL_OFFLINE_MAX_INTERVAL. An
+    account is synced at once when a game starts or stops, or when its
+    lastlogoff moved since the last check. An account whose playtime goes
+    up while it does not show as in game (invisible, or private game
+    details) is marked hidden and synced on the fixed POLL_INTERVAL until it
+    has not played for POLL_HIDDEN_INTERVAL. Other payload changes, such as
+    playtime_2weeks shrinking as the two-week window moves on, do not count.
+
+    Accounts whose payload matches the fingerprint of their last sync are
+    skipped without touching their games.
+    """
+    now = now or datetime.utcnow()
+    columns = (
+        TrackedAccount.id, TrackedAccount.steamid, TrackedAccount.next_poll_at, TrackedAccount.games_fingerprint,
+        TrackedAccount.presence, TrackedAccount.last_active_at, TrackedAccount.last_changed_at,
+        TrackedAccount.last_polled_at, TrackedAccount.last_synced_at, TrackedAccount.last_logoff
+    )
+    # Presence checks fall on one grid for every account, so each check is as few calls as possible
+    check_slot = EPOCH + (now - EPOCH) // POLL_PRESENCE_INTERVAL * POLL_PRESENCE_INTERVAL
+    query = db.session.query(*columns).filter(TrackedAccount.enabled.is_(True))
+    if POLL_ADAPTIVE:
+        query = query.filter(or_(
+            TrackedAccount.next_poll_at <= now,
+            TrackedAccount.last_polled_at.is_(None),
+            TrackedAccount.last_polled_at < check_slot
+        )).order_by(TrackedAccount.last_polled_at.nulls_first())
+    else:
+        query = query.filter(TrackedAccount.next_poll_at <= now).order_by(TrackedAccount.next_poll_at)
+    due = query.limit(POLL_BATCH_LIMIT).all()
+    if not due:
+        return {"due": 0, "synced": 0, "skipped": 0, "failed": 0, "avoided": 0}
+    
+    checked = [a for a in due if POLL_ADAPTIVE and (a.last_polled_at is None or a.last_polled_at < check_slot)]
+    checked_ids = {a.id for a in checked}
+    presence = account_presence([a.steamid for a in checked]) if checked else {}
+    # Accounts only due for their games between checks go by the presence seen at the last one
+    presence.update({a.steamid: (a.presence, None) for a in due if POLL_ADAPTIVE and a.id not in checked_ids})
+    to_sync = [a for a in due if needs_sync(a, *presence.get(a.steamid, (None, None)), now)]
+    fetched_ids = {a.id for a in to_sync}
+    # Fixed-schedule polls that presence made unnecessary
+    avoided = sum(
+        1 for a in due
+        if a.id not in fetched_ids and fixed_slot_passed(a.steamid, a.last_polled_at, now)
+    )
+    
+    primary_id = primary_account_id()
+    synced, skipped, failed = 0, 0, 0
+    fingerprints = {a.id: a.games_fingerprint for a in due}
+    played_ids, synced_ids = set(), set()
+    primary_changed = False
+    # Steam calls run in parallel (bounded, and paced by the client's rate limiter);
+    # DB writes stay on this thread because the session is not thread-safe.
+    with ThreadPoolExecutor(max_workers=POLL_CONCURRENCY) as executor:
+        futures = {executor.submit(steam.recently_played_games, a.steamid): a for a in to_sync}
+        for future in as_completed(futures):
+            account = futures[future]
+            try:
+                games = future.result()
+                synced_ids.add(account.id)
+                fingerprint = games_fingerprint(games)
+                if fingerprint == account.games_fingerprint:
+                    skipped += 1
+                    continue
+                if save_games_to_db(games, account_id=account.id, now=now)["played"]:
+                    played_ids.add(account.id)
+                fingerprints[account.id] = fingerprint
+                primary_changed = primary_changed or account.id == primary_id
+                synced += 1
+            except Exception as e:
+                db.session.rollback()
+                if account.id == primary_id:
+                    pusher.discard()
+                failed += 1
+                logger.warning(f"Sync failed for account {account.steamid}: {e}")
+    
+    rows = []
+    for a in due:
+        state, last_logoff = presence.get(a.steamid, (None, None))
+        played = a.id in played_ids
+        last_active_at = now if state in ("in_game", "online") or played else a.last_active_at
+        last_changed_at = now if played else a.last_changed_at
+        if state is not None and (
+            # Played without showing it; presence cannot be trusted for this account for a while
+            (played and state != "in_game" and a.presence != "in_game")
+            or (
+                a.presence == "hidden" and last_changed_at is not None
+                and now - last_changed_at < POLL_HIDDEN_INTERVAL
+            )
+        ):
+            state = "hidden"
+        rows.append({
+            "id": a.id,
+            "next_poll_at": (
+                next_adaptive_poll(a, state, now, last_active_at, a.id in fetched_ids) if POLL_ADAPTIVE
+                else next_poll_time(a.next_poll_at, now)
+            ),
+            "last_polled_at": now if a.id in checked_ids or not POLL_ADAPTIVE else a.last_polled_at,
+            "last_synced_at": now if a.id in synced_ids else a.last_synced_at,
+            "games_fingerprint": fingerprints[a.id],
+            "presence": state if state is not None else a.presence,
+            "last_active_at": last_active_at,
+            "last_changed_at": last_changed_at,
+            "last_logoff": last_logoff if last_logoff is not None else a.last_logoff
+        })
+    db.session.execute(update(TrackedAccount), rows)
+    db.session.commit()
+    
+    poll_runs.update(applied=synced, skipped=skipped, failed=failed, avoided=avoided)
+    if primary_changed:
+        swr.warm(*DASHBOARD_PAYLOADS)
+    return {"due": len(due), "synced": synced, "skipped": skipped, "failed": failed, "avoided": avoided}
+
+@timed("steam_update")
+def scheduled_update():
+    with app.app_context():
+        try:
+            # Make sure the owner's account exists before the first tick
+            primary_account_id()
+            db.session.commit()
+            result = poll_due_accounts()
+            if result["due"]:
+                logger.info(
+                    f"Updated: {result}; since start {poll_runs['applied']} applied, "
+                    f"{poll_runs['skipped']} skipped, {poll_runs['failed']} failed, "
+                    f"{poll_runs['avoided']} avoided by presence"
+                )
+        except Exception as e:
+            db.session.rollback()
+            pusher.discard()
+            job_failures.inc(job="steam_update")
+            logger.error(f"An error occurred during scheduled update: {e}", exc_info=True)
+            
+@timed("update_friends")
+def update_friends():
+    try:
+        friend_ids = steam.friend_list(STEAM_ID)
+    except SteamAPIError as e:
+        logger.warning(f"Could not fetch friend list: {e}")
+        friend_ids = None
+    if friend_ids is None:
+        # Private or unavailable friend list: keep what we have
+        logger.warning("Friend list unavailable, skipping friends update.")
+        return "Updated 0 friends"
+    
+    friend_ids = list(dict.fromkeys(friend_ids))
+    players = steam.player_summaries(friend_ids)
+    now = datetime.utcnow()
+    
+    existing = {
+        f.steamid: (f.personaname, f.avatar)
+        for f in Friend.query.with_entities(Friend.steamid, Friend.personaname, Friend.avatar)
+    }
+    
+    rows = []
+    count = 0
+    for friend_id in friend_ids:
+        player = players.get(friend_id)
+        if not player:
+            continue
+        
+        count += 1
+        name = player.get("personaname", "Unknown")
+        avatar = player.get("avatar", "")
+        if existing.get(friend_id) != (name, avatar):
+            rows.append({
+                "steamid": friend_id,
+                "personaname": name,
+                "avatar": avatar,
+                # Only used for new friends: spreads their playtime refreshes over the interval
+                "next_playtime_at": now + poll_offset(friend_id, FRIEND_REFRESH_INTERVAL)
+            })
+    
+    upsert(Friend, rows, index_elements=["steamid"], update_columns=["personaname", "avatar"])
+    
+    removed = 0
+    current_ids = set(friend_ids)
+    dropped = [steamid for steamid in existing if steamid not in current_ids]
+    if dropped:
+        removed = Friend.query.filter(Friend.steamid.in_(dropped)).delete(synchronize_session=False)
+        FriendPlaytime.query.filter(FriendPlaytime.steamid.in_(dropped)).delete(synchronize_session=False)
+        logger.info(f"Removed {removed} friends no longer on the list")
+        
+    db.session.commit()
+    return f"Updated {count} friends"
+
+def store_friend_playtime(hours_by_steamid, now):
+    """Record fresh two-week hours as each friend's current value and today's history point."""
+    if not hours_by_steamid:
+        return
+    db.session.execute(
+        Friend.__table__.update().where(Friend.__table__.c.steamid == bindparam("sid")).values(
+            hours_2weeks=bindparam("hours"), playtime_updated_at=bindparam("at")
+        ),
+        [{"sid": sid, "hours": hours, "at": now} for sid, hours in hours_by_steamid.items()]
+    )
+    upsert(
+        FriendPlaytime,
+        [{"steamid": sid, "day": now.date(), "hours": hours} for sid, hours in hours_by_steamid.items()],
+        index_elements=["steamid", "day"],
+        update_columns=["hours"]
+    )
+
+@timed("friend_playtime")
+def refresh_friend_playtime():
+    """Refresh the friends whose slot has come up; returns per-run counts."""
+    now = datetime.utcnow()
+    due = (
+        db.session.query(Friend.id, Friend.steamid, Friend.next_playtime_at)
+        .filter(Friend.next_playtime_at <= now)
+        .order_by(Friend.next_playtime_at)
+        .limit(FRIEND_REFRESH_BATCH)
+        .all()
+    )
+    if not due:
+        return {"due": 0, "refreshed": 0}
+    # Release the connection while Steam is being asked
+    db.session.commit()
+    
+    hours = get_steam_playtime_batch([f.steamid for f in due])
+    store_friend_playtime(hours, now)
+    # Failed friends wait for their next slot too, so one bad profile cannot hog the batch
+    db.session.execute(
+        update(Friend),
+        [
+            {"id": f.id, "next_playtime_at": next_poll_time(f.next_playtime_at, now, FRIEND_REFRESH_INTERVAL)}
+            for f in due
+        ]
+    )
+    db.session.commit()
+    
+    if hours:
+        swr.warm("friends-activity")
+    return {"due": len(due), "refreshed": len(hours)}
+
+def friend_playtime_job():
+    with app.app_context():
+        try:
+            result = refresh_friend_playtime()
+            if result["due"]:
+                logger.info(f"Friend playtime: {result}")
+        except Exception as e:
+            db.session.rollback()
+            job_failures.inc(job="friend_playtime")
+            logger.error(f"An error occurred during friend playtime refresh: {e}", exc_info=True)
+
+def store_game_schemas(schemas):
+    """Keep GetSchemaForGame results, {appid: (game name, achievement definitions)}, for good."""
+    now = datetime.utcnow()
+    upsert(
+        GameSchema,
+        [
+            {"appid": appid, "game_name": name, "achievement_count": len(achievements), "fetched_at": now}
+            for appid, (name, achievements) in schemas.items()
+        ],
+        index_elements=["appid"],
+        update_columns=["game_name", "achievement_count", "fetched_at"]
+    )
+    upsert(
+        Achievement,
+        [
+            {
+                "appid": appid,
+                "apiname": a["name"],
+                "display_name": a.get("displayName"),
+                "description": a.get("description"),
+                "icon": a.get("icon"),
+                "icon_gray": a.get("icongray"),
+                "hidden": bool(a.get("hidden"))
+            }
+            for appid, (name, achievements) in schemas.items()
+            for a in achievements
+        ],
+        index_elements=["appid", "apiname"],
+        update_columns=["display_name", "description", "icon", "icon_gray", "hidden"]
+    )
+
+@timed("achievements")
+def refresh_achievements():
+    """Refresh unlocked achievements of the games whose playtime moved since their last refresh; returns per-run counts.
+
+    An app's schema is fetched the first time one of its games comes up and
+    kept; apps without achievements are never asked about again. With no
+    playtime change since the last run this makes no Steam calls at all.
+    Pending games are taken least recently attempted first, so games whose
+    fetch keeps failing do not hold back the rest.
+    """
+    pending = (
+        db.session.query(
+            PlayedGame.id, PlayedGame.account_id, PlayedGame.appid, PlayedGame.playtime_forever, TrackedAccount.steamid
+        )
+        .join(TrackedAccount, PlayedGame.account_id == TrackedAccount.id)
+        .filter(
+            TrackedAccount.enabled.is_(True),
+            PlayedGame.appid.isnot(None),
+            PlayedGame.achievements_playtime.is_(None)
+            | (PlayedGame.achievements_playtime != PlayedGame.playtime_forever)
+        )
+        .order_by(PlayedGame.achievements_checked_at.nulls_first(), PlayedGame.id)
+        .limit(ACHIEVEMENTS_BATCH)
+        .all()
+    )
+    if not pending:
+        return {"pending": 0, "schemas": 0, "refreshed": 0, "unlocked": 0, "failed": 0}
+    
+    appids = {g.appid for g in pending}
+    counts = dict(
+        db.session.query(GameSchema.appid, GameSchema.achievement_count).filter(GameSchema.appid.in_(appids))
+    )
+    # Release the connection while Steam is being asked
+    db.session.commit()
+    
+    schemas, progress, failed = {}, {}, 0
+    with ThreadPoolExecutor(max_workers=POLL_CONCURRENCY) as executor:
+        futures = {executor.submit(steam.game_schema, appid): appid for appid in appids - counts.keys()}
+        for future in as_completed(futures):
+            try:
+                schemas[futures[future]] = future.result()
+            except SteamAPIError as e:
+                logger.warning(f"Achievement schema of app {futures[future]} failed: {e}")
+        counts.update({appid: len(achievements) for appid, (name, achievements) in schemas.items()})
+        
+        futures = {
+            executor.submit(steam.player_achievements, g.steamid, g.appid): g
+            for g in pending if counts.get(g.appid)
+        }
+        for future in as_completed(futures):
+            game = futures[future]
+            try:
+                progress[game.id] = future.result() or {}
+            except SteamAPIError as e:
+                failed += 1
+                logger.warning(f"Achievements of app {game.appid} for account {game.steamid} failed: {e}")
+    
+    store_game_schemas(schemas)
+    
+    by_game = {g.id: g for g in pending}
+    known = {
+        (account_id, appid, apiname) for account_id, appid, apiname in
+        db.session.query(PlayerAchievement.account_id, PlayerAchievement.appid, PlayerAchievement.apiname)
+        .filter(
+            PlayerAchievement.account_id.in_({g.account_id for g in pending}),
+            PlayerAchievement.appid.in_(appids)
+        )
+    }
+    unlocked = [
+        {
+            "account_id": by_game[game_id].account_id,
+            "appid": by_game[game_id].appid,
+            "apiname": apiname,
+            "unlocked_at": datetime.utcfromtimestamp(unlocktime) if unlocktime else None
+        }
+        for game_id, achievements in progress.items()
+        for apiname, unlocktime in achievements.items()
+        if (by_game[game_id].account_id, by_game[game_id].appid, apiname) not in known
+    ]
+    upsert(
+        PlayerAchievement,
+        unlocked,
+        index_elements=["account_id", "appid", "apiname"],
+        update_columns=["unlocked_at"]
+    )
+    
+    # Games whose app has no achievements count as refreshed too; failed ones stay
+    # pending, behind every game not attempted since
+    refreshed = [g for g in pending if g.id in progress or counts.get(g.appid) == 0]
+    refreshed_ids = {g.id for g in refreshed}
+    now = datetime.utcnow()
+    db.session.execute(
+        update(PlayedGame),
+        [
+            {"id": g.id, "achievements_checked_at": now}
+            | ({"achievements_playtime": g.playtime_forever} if g.id in refreshed_ids else {})
+            for g in pending
+        ]
+    )
+    db.session.commit()
+    
+    primary_id = primary_account_id()
+    if schemas or any(row["account_id"] == primary_id for row in unlocked):
+        swr.warm("achievements")
+    return {
+        "pending": len(pending), "schemas": len(schemas), "refreshed": len(refreshed),
+        "unlocked": len(unlocked), "failed": failed
+    }
+
+def achievements_job():
+    with app.app_context():
+        try:
+            result = refresh_achievements()
+            if result["pending"]:
+                logger.info(f"Achievements: {result}")
+        except Exception as e:
+            db.session.rollback()
+            job_failures.inc(job="achievements")
+            logger.error(f"An error occurred during achievements refresh: {e}", exc_info=True)
+
+@timed("send_push")
+def send_push(body):
+    return pusher.send(body)
+
+# Work queued by the web app (see job_queue.py); retried with backoff on failure
+
+@handler("sync_recent")
+def sync_recent_job():
+    """The owner's games on demand, recorded like a poll so the next poll does not diff them again."""
+    account = db.session.get(TrackedAccount, primary_account_id())
+    games = steam.recently_played_games(account.steamid)
+    now = datetime.utcnow()
+    fingerprint = games_fingerprint(games)
+    result = {"saved": 0, "updated": 0, "deleted": 0, "played": 0}
+    if fingerprint != account.games_fingerprint:
+        result = save_games_to_db(games, account_id=account.id, now=now)
+        account.games_fingerprint = fingerprint
+        if result["played"]:
+            account.last_changed_at = account.last_active_at = now
+    account.last_synced_at = now
+    db.session.commit()
+    return result
+
+@handler("update_friends")
+def update_friends_job():
+    return update_friends()
+
+@handler("daily_stat")
+def daily_stat_queue_job(day):
+    return update_daily_stat(day)
+
+# Queued the other way, by syncs for the web process: /img serves from the web
+# service's IMAGE_CACHE_DIR, which the worker's disk is not
+
+def prefetch_covers(appids):
+    """Queue the default cover variant of appids for the web process to fetch; joins the current transaction."""
+    if appids:
+        enqueue("prefetch_covers", {"appids": sorted(appids)})
+
+@handler("prefetch_covers")
+def prefetch_covers_job(appids):
+    return {"fetched": image_cache.prefetch([cover_url(appid) for appid in appids], VARIANTS["cover"][0])}
+
+@timed("steam_playtime_batch")
+def get_steam_playtime_batch(steamids):
+    """{steamid: hours} for the accounts Steam answered for before the fan-out deadline."""
+    return {sid: hours for sid, hours in fetcher.iter_playtimes(steamids) if hours is not None}
+
+@registry.collector
+def component_metrics():
+    steam_stats = steam.stats()
+    yield "steam_api_request_duration_seconds", "histogram", "Steam Web API request latency by endpoint.", [
+        sample
+        for endpoint, s in steam_stats.items()
+        for sample in histogram_samples(
+            {"endpoint": endpoint},
+            [float(le) for le in s["buckets"]],
+            list(s["buckets"].values()),
+            s["sum"],
+            s["count"]
+        )
+    ]
+    yield "steam_api_errors", "counter", "Steam Web API requests that failed.", [
+        ("_total", {"endpoint": endpoint}, s["errors"]) for endpoint, s in steam_stats.items()
+    ]
+    yield "steam_api_retries", "counter", "Steam Web API requests retried.", [
+        ("_total", {"endpoint": endpoint}, s["retries"]) for endpoint, s in steam_stats.items()
+    ]
+    yield "account_syncs", "counter", "Tracked account polls by outcome.", [
+        ("_total", {"outcome": outcome}, n) for outcome, n in poll_runs.items()
+    ]
+    yield "push_deliveries", "counter", "Web push deliveries by outcome.", [
+        ("_total", {"outcome": outcome}, n) for outcome, n in pusher.stats.items()
+    ]
+    yield "stream_clients", "gauge", "Connected /api/stream clients.", [("", {}, stream.clients())]
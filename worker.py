@@ -1,16 +1,41 @@
-from main import app, scheduler, scheduled_update
-import time
+"""Runs the scheduled and queued jobs. Imports the jobs and their data layer, not the web app's routes.
+
+    python worker.py
+
+Several workers may run at once: all of them run queued jobs (bar the
+web process's own, see job_queue.WEB_KINDS), one holds the
+scheduler lock and runs the scheduled jobs, the others wait to take over.
+"""
+import os, sys, time, logging
+import metrics
+from core import app
+from jobs import start_scheduler
+from job_queue import QueueWorker, WEB_KINDS
+# Registers the cached dashboard payloads, so warming after a sync recomputes them here
+import payloads  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+LOCK_CHECK_SECONDS = 60
+
+def main():
+    # No web server here, so metrics get a port of their own; a second worker on the same host goes without
+    metrics.serve(int(os.getenv("METRICS_PORT", 9100)))
+    # Cover prefetches are left for the web process, whose disk serves them
+    queue_worker = QueueWorker(app, exclude=WEB_KINDS).start()
+    logger.info("Worker waiting for the scheduler lock...")
+    scheduler, lock = start_scheduler(wait=True)
+    logger.info("Worker holds the scheduler lock; jobs started.")
+    try:
+        while lock.alive():
+            time.sleep(LOCK_CHECK_SECONDS)
+        # Another worker may already have taken over; exit and let the platform restart us as a standby
+        sys.exit(1)
+    except (KeyboardInterrupt, SystemExit):
+        scheduler.shutdown()
+        queue_worker.stop(timeout=30)
+        lock.release()
+        raise
 
 if __name__ == "__main__":
-    with app.app_context():
-        print("Starting worker + scheduler...")
-        scheduler.start()
-        
-        print("Running initial scheduled_update job manually...")
-        scheduled_update()
-        
-        try:
-            while True:
-                time.sleep(60)
-        except (KeyboardInterrupt, SystemExit):
-            scheduler.shutdown()
\ No newline at end of file
+    main()